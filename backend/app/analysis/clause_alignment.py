@@ -0,0 +1,172 @@
+from __future__ import annotations
+
+import difflib
+import re
+import zlib
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Any
+
+import numpy as np
+
+WORD_RE = re.compile(r"\S+")
+SHINGLE_SIZE = 3
+NUM_PERM = 64
+BANDS = 16
+MATCH_THRESHOLD = 0.5
+MAX_BUCKET = 64
+_PRIME = np.uint64(4294967291)
+
+
+@dataclass
+class Alignment:
+    change_type: str
+    old_id: str | None
+    new_id: str | None
+    old_text: str
+    new_text: str
+    similarity: float
+    word_diff: list[dict[str, Any]] = field(default_factory=list)
+
+
+def _words(text: str) -> list[str]:
+    return WORD_RE.findall(text)
+
+
+def _shingles(text: str, size: int = SHINGLE_SIZE) -> set[str]:
+    words = [w.lower().strip(".,;:()") for w in _words(text)]
+    if len(words) < size:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i : i + size]) for i in range(len(words) - size + 1)}
+
+
+def jaccard(a: set[str], b: set[str]) -> float:
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+def word_diff(old_text: str, new_text: str) -> list[dict[str, Any]]:
+    old_words, new_words = _words(old_text), _words(new_text)
+    ops = difflib.SequenceMatcher(a=old_words, b=new_words, autojunk=False).get_opcodes()
+    return [
+        {"op": tag, "old_start": i1, "old": " ".join(old_words[i1:i2]), "new_start": j1, "new": " ".join(new_words[j1:j2])}
+        for tag, i1, i2, j1, j2 in ops
+        if tag != "equal"
+    ]
+
+
+class MinHasher:
+    # Universal hashing h(x) = (a * x + b) mod p over 32-bit shingle hashes; a * x + b stays below 2**64.
+    def __init__(self, num_perm: int = NUM_PERM, seed: int = 1) -> None:
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(1, 2**32 - 1, size=(num_perm, 1), dtype=np.uint64)
+        self.b = rng.integers(0, 2**32 - 1, size=(num_perm, 1), dtype=np.uint64)
+        self.num_perm = num_perm
+
+    def signature(self, shingles: set[str]) -> np.ndarray:
+        if not shingles:
+            return np.full(self.num_perm, np.iinfo(np.uint64).max, dtype=np.uint64)
+        hashes = np.fromiter((zlib.crc32(s.encode()) for s in shingles), dtype=np.uint64, count=len(shingles))
+        return ((self.a * hashes + self.b) % _PRIME).min(axis=1)
+
+
+def _candidate_pairs(
+    old_sigs: dict[str, np.ndarray], new_sigs: dict[str, np.ndarray], bands: int, max_bucket: int
+) -> set[tuple[str, str]]:
+    # LSH banding: clauses sharing any band hash are candidates. Oversized buckets (boilerplate such as
+    # "Reserved.") are skipped so matching stays near-linear in the number of clauses.
+    rows = next(iter(old_sigs.values())).shape[0] // bands if old_sigs else 0
+    pairs: set[tuple[str, str]] = set()
+    for band in range(bands):
+        buckets: dict[bytes, tuple[list[str], list[str]]] = defaultdict(lambda: ([], []))
+        for side, sigs in ((0, old_sigs), (1, new_sigs)):
+            for clause_id, sig in sigs.items():
+                buckets[sig[band * rows : (band + 1) * rows].tobytes()][side].append(clause_id)
+        for olds, news in buckets.values():
+            if olds and news and len(olds) + len(news) <= max_bucket:
+                pairs.update((o, n) for o in olds for n in news)
+    return pairs
+
+
+def align_clauses(
+    old_sections: dict[str, str],
+    new_sections: dict[str, str],
+    threshold: float = MATCH_THRESHOLD,
+    num_perm: int = NUM_PERM,
+    bands: int = BANDS,
+    max_bucket: int = MAX_BUCKET,
+) -> list[Alignment]:
+    # 1. exact text matches (unchanged or moved), 2. same id with similar text (modified),
+    # 3. MinHash/LSH candidates verified by exact shingle Jaccard (moved_modified), greedily by
+    # similarity, 4. leftovers are added/removed. Unchanged clauses are not reported.
+    matched: dict[str, tuple[str, float]] = {}
+    used_old: set[str] = set()
+
+    by_text: dict[str, list[str]] = defaultdict(list)
+    for old_id, text in old_sections.items():
+        by_text[text].append(old_id)
+    for new_id, text in new_sections.items():
+        if old_sections.get(new_id) == text:
+            matched[new_id] = (new_id, 1.0)
+            used_old.add(new_id)
+    for new_id, text in new_sections.items():
+        if new_id in matched:
+            continue
+        old_id = next((o for o in by_text.get(text, ()) if o not in used_old), None)
+        if old_id is not None:
+            matched[new_id] = (old_id, 1.0)
+            used_old.add(old_id)
+
+    shingles_old = {k: _shingles(v) for k, v in old_sections.items() if k not in used_old}
+    shingles_new = {k: _shingles(v) for k, v in new_sections.items() if k not in matched}
+    for new_id in list(shingles_new):
+        if new_id in shingles_old:
+            similarity = jaccard(shingles_old[new_id], shingles_new[new_id])
+            if similarity >= threshold:
+                matched[new_id] = (new_id, similarity)
+                used_old.add(new_id)
+                del shingles_old[new_id], shingles_new[new_id]
+
+    if shingles_old and shingles_new:
+        hasher = MinHasher(num_perm)
+        old_sigs = {k: hasher.signature(v) for k, v in shingles_old.items()}
+        new_sigs = {k: hasher.signature(v) for k, v in shingles_new.items()}
+        scored = sorted(
+            ((jaccard(shingles_old[o], shingles_new[n]), o, n) for o, n in _candidate_pairs(old_sigs, new_sigs, bands, max_bucket)),
+            reverse=True,
+        )
+        for similarity, old_id, new_id in scored:
+            if similarity < threshold:
+                break
+            if old_id in used_old or new_id in matched:
+                continue
+            matched[new_id] = (old_id, similarity)
+            used_old.add(old_id)
+    # A clause that kept its number but was rewritten beyond the threshold is still a modification.
+    for new_id in shingles_new:
+        if new_id not in matched and new_id in shingles_old and new_id not in used_old:
+            matched[new_id] = (new_id, jaccard(shingles_old[new_id], shingles_new[new_id]))
+            used_old.add(new_id)
+
+    alignments: list[Alignment] = []
+    for new_id, new_text in new_sections.items():
+        if new_id not in matched:
+            alignments.append(Alignment("added", None, new_id, "", new_text, 0.0))
+            continue
+        old_id, similarity = matched[new_id]
+        old_text = old_sections[old_id]
+        if old_id == new_id and old_text == new_text:
+            continue
+        if old_text == new_text:
+            change_type = "moved"
+        elif old_id == new_id:
+            change_type = "modified"
+        else:
+            change_type = "moved_modified"
+        diff = word_diff(old_text, new_text) if old_text != new_text else []
+        alignments.append(Alignment(change_type, old_id, new_id, old_text, new_text, round(similarity, 4), diff))
+    for old_id, old_text in old_sections.items():
+        if old_id not in used_old:
+            alignments.append(Alignment("removed", old_id, None, old_text, "", 0.0))
+    return alignments
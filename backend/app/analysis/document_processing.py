@@ -1,7 +1,24 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
+import bisect
 import re
+from dataclasses import dataclass
+from typing import Iterable, Iterator
+
+CHUNK_CHARS = 1000
+CHUNK_OVERLAP = 200
+BOUNDARY_RE = re.compile(r"(?<=[.!?;:])[\"')\]]*\s+|\n[ \t]*\n\s*")
+NEWLINE_RE = re.compile(r"\n")
+
+
+@dataclass
+class TextChunk:
+    page: int
+    line_start: int
+    line_end: int
+    char_start: int
+    char_end: int
+    text: str
 
 
 @dataclass
@@ -12,11 +29,100 @@ class ExtractedDocument:
     citations: list[dict]
 
 
-def process_document_text(text: str, chunk_size: int = 400) -> ExtractedDocument:
-    chunks = [text[i : i + chunk_size] for i in range(0, len(text), chunk_size)]
+def process_document_text(text: str, chunk_size: int = 400, overlap: int = 0) -> ExtractedDocument:
+    # Form feeds separate pages in text exported from PDFs, so citations name the real page.
+    pages = list(enumerate(text.split("\f"), start=1))
+    chunks = list(iter_chunks(pages, chunk_size, overlap))
     table_rows = _extract_pipe_tables(text)
-    citations = [{"page": 1, "line_start": 1, "line_end": min(30, len(text.splitlines()) or 1)}]
-    return ExtractedDocument(text=text, chunks=chunks, table_json=table_rows, citations=citations)
+    citations = page_citations(chunks) or [{"page": 1, "line_start": 1, "line_end": 1}]
+    return ExtractedDocument(text=text, chunks=[c.text for c in chunks], table_json=table_rows, citations=citations)
+
+
+def chunk_pages(pages: Iterable[tuple[int, str]], chunk_chars: int = CHUNK_CHARS, overlap_chars: int = 0) -> tuple[str, list[TextChunk]]:
+    parts: list[str] = []
+
+    def kept() -> Iterator[tuple[int, str]]:
+        for page_no, content in pages:
+            if content.strip():
+                parts.append(content)
+            yield page_no, content
+
+    chunks = list(iter_chunks(kept(), chunk_chars, overlap_chars))
+    return "\n\n".join(parts), chunks
+
+
+def iter_chunks(pages: Iterable[tuple[int, str]], chunk_chars: int = CHUNK_CHARS, overlap_chars: int = CHUNK_OVERLAP) -> Iterator[TextChunk]:
+    # Pages are consumed one at a time and only the current page is held, so memory does not grow
+    # with the document. Blank pages are dropped and the rest count as joined by a blank line, so
+    # char offsets index that text (the one chunk_pages returns). Chunks never cross a page; they
+    # pack whole sentences, prefer to end at a paragraph, and repeat up to overlap_chars of
+    # trailing sentences from the previous chunk. Lines are 1-based per page.
+    offset = -2
+    for page_no, content in pages:
+        if not content.strip():
+            continue
+        offset += 2
+        newlines = [m.start() for m in NEWLINE_RE.finditer(content)]
+        for start, end in _pack(_units(content, chunk_chars), chunk_chars, overlap_chars):
+            text = content[start:end]
+            lead = len(text) - len(text.lstrip())
+            start, end = start + lead, start + len(text.rstrip())
+            if end > start:
+                yield TextChunk(
+                    page=page_no,
+                    line_start=bisect.bisect_right(newlines, start - 1) + 1,
+                    line_end=bisect.bisect_right(newlines, end - 1) + 1,
+                    char_start=offset + start,
+                    char_end=offset + end,
+                    text=content[start:end],
+                )
+        offset += len(content)
+
+
+def _units(content: str, chunk_chars: int) -> Iterator[tuple[int, int, bool]]:
+    # (start, end, ends_paragraph) spans covering the page: sentences and paragraphs, with any
+    # span longer than a chunk cut at line breaks, then whitespace, then hard.
+    start = 0
+    for match in BOUNDARY_RE.finditer(content):
+        if match.end() > start:
+            yield from _split_long(content, start, match.end(), chunk_chars, match.group().count("\n") >= 2)
+            start = match.end()
+    if start < len(content):
+        yield from _split_long(content, start, len(content), chunk_chars, True)
+
+
+def _split_long(content: str, start: int, end: int, chunk_chars: int, paragraph: bool) -> Iterator[tuple[int, int, bool]]:
+    while end - start > chunk_chars:
+        window = content[start : start + chunk_chars]
+        cut = window.rfind("\n") + 1 or max(window.rfind(" "), window.rfind("\t")) + 1 or chunk_chars
+        yield start, start + cut, False
+        start += cut
+    yield start, end, paragraph
+
+
+def _pack(units: Iterable[tuple[int, int, bool]], chunk_chars: int, overlap_chars: int) -> Iterator[tuple[int, int]]:
+    current: list[tuple[int, int, bool]] = []
+    for unit in units:
+        if current and (unit[1] - current[0][0] > chunk_chars or (current[-1][2] and current[-1][1] - current[0][0] >= chunk_chars // 2)):
+            yield current[0][0], current[-1][1]
+            # Carry whole trailing units (never the entire chunk) that fit the overlap and leave room for this unit.
+            budget = min(overlap_chars, chunk_chars - (unit[1] - unit[0]))
+            keep = len(current)
+            while keep > 1 and current[-1][1] - current[keep - 1][0] <= budget:
+                keep -= 1
+            current = current[keep:]
+        current.append(unit)
+    if current:
+        yield current[0][0], current[-1][1]
+
+
+def page_citations(chunks: list[TextChunk]) -> list[dict]:
+    pages: dict[int, dict] = {}
+    for chunk in chunks:
+        cite = pages.setdefault(chunk.page, {"page": chunk.page, "line_start": chunk.line_start, "line_end": chunk.line_end})
+        cite["line_start"] = min(cite["line_start"], chunk.line_start)
+        cite["line_end"] = max(cite["line_end"], chunk.line_end)
+    return list(pages.values())
 
 
 def _extract_pipe_tables(text: str) -> list[dict]:
@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+import re
+from dataclasses import asdict, dataclass
+from typing import Any
+
+HEADING_RE = re.compile(
+    r"^\s*(?:(?:section|sec\.)\s+(?P<section>[0-9][0-9A-Za-z.\-]*)|§+\s*(?P<code>[0-9][0-9A-Za-z.\-]*)|(?P<number>\d+(?:\.\d+)*)[.)])\s",
+    re.IGNORECASE,
+)
+
+
+@dataclass(frozen=True)
+class Section:
+    id: str
+    text: str
+    line_start: int
+    line_end: int
+
+    def to_dict(self) -> dict[str, Any]:
+        return asdict(self)
+
+
+def parse_sections(text: str) -> list[Section]:
+    # Ordinance text is split at "Section 2.", "Sec. 2.04", "§ 2.04.010" or "2.1)" style headings;
+    # anything before the first heading is the preamble. Text without headings falls back to
+    # blank-line separated paragraphs (p1, p2, ...). Whitespace is collapsed so reflowed text compares equal.
+    lines = text.splitlines()
+    sections: list[Section] = []
+    seen: dict[str, int] = {}
+    current, start, buffer = "preamble", 1, []
+
+    def close(end: int) -> None:
+        body = " ".join(" ".join(buffer).split())
+        if body:
+            seen[current] = seen.get(current, 0) + 1
+            section_id = current if seen[current] == 1 else f"{current}#{seen[current]}"
+            sections.append(Section(section_id, body, start, end))
+
+    for line_no, line in enumerate(lines, start=1):
+        match = HEADING_RE.match(line + " ")
+        if match:
+            close(line_no - 1)
+            current, start, buffer = (match.group("section") or match.group("code") or match.group("number")).rstrip(".-"), line_no, []
+            # The number is the section id, not content: renumbered clauses must still compare equal.
+            line = (line + " ")[match.end():]
+        buffer.append(line)
+    close(len(lines))
+
+    if len(sections) == 1 and sections[0].id == "preamble":
+        return _paragraphs(lines)
+    return sections
+
+
+def _paragraphs(lines: list[str]) -> list[Section]:
+    sections: list[Section] = []
+    buffer: list[str] = []
+    start = 1
+    for line_no, line in enumerate(lines + [""], start=1):
+        if line.strip():
+            if not buffer:
+                start = line_no
+            buffer.append(line)
+        elif buffer:
+            sections.append(Section(f"p{len(sections) + 1}", " ".join(" ".join(buffer).split()), start, line_no - 1))
+            buffer = []
+    return sections
@@ -1,6 +1,9 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from typing import Any
+
+from app.analysis.clause_alignment import align_clauses
 
 
 @dataclass
@@ -10,21 +13,24 @@ class ClauseChange:
     old_text: str
     new_text: str
     citation: dict
+    old_clause_id: str | None = None
+    similarity: float = 0.0
+    word_diff: list[dict[str, Any]] = field(default_factory=list)
 
 
 def semantic_diff(old_sections: dict[str, str], new_sections: dict[str, str]) -> list[ClauseChange]:
-    changes: list[ClauseChange] = []
-    old_by_text = {v: k for k, v in old_sections.items()}
-    for new_id, new_text in new_sections.items():
-        if new_id in old_sections:
-            if old_sections[new_id] != new_text:
-                changes.append(ClauseChange(new_id, "modified", old_sections[new_id], new_text, {"page": 1, "line_start": 1, "line_end": 8}))
-        elif new_text in old_by_text:
-            old_id = old_by_text[new_text]
-            changes.append(ClauseChange(new_id, "moved", old_sections[old_id], new_text, {"page": 1, "line_start": 1, "line_end": 8}))
-        else:
-            changes.append(ClauseChange(new_id, "added", "", new_text, {"page": 1, "line_start": 1, "line_end": 8}))
-    for old_id, old_text in old_sections.items():
-        if old_id not in new_sections and old_text not in new_sections.values():
-            changes.append(ClauseChange(old_id, "removed", old_text, "", {"page": 1, "line_start": 1, "line_end": 8}))
-    return changes
+    # change_type is added, removed, modified (same id), moved (same text, new id) or
+    # moved_modified (similar text, new id); clause_id is the new id except for removals.
+    return [
+        ClauseChange(
+            a.new_id if a.new_id is not None else a.old_id,
+            a.change_type,
+            a.old_text,
+            a.new_text,
+            {"old_clause_id": a.old_id, "new_clause_id": a.new_id},
+            old_clause_id=a.old_id,
+            similarity=a.similarity,
+            word_diff=a.word_diff,
+        )
+        for a in align_clauses(old_sections, new_sections)
+    ]
@@ -0,0 +1,161 @@
+from __future__ import annotations
+
+import re
+from collections import Counter
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from typing import Any, Iterable
+
+ROW_TOLERANCE = 2.0
+MIN_TABLE_ROWS = 3
+MIN_COLUMNS = 2
+
+CURRENCY_RE = re.compile(r"^\(?-?\$\s?-?[\d,]+(?:\.\d+)?\)?$")
+NUMBER_RE = re.compile(r"^\(?-?(?:\d{1,3}(?:,\d{3})+|\d+)(?:\.\d+)?\)?$")
+PERCENT_RE = re.compile(r"^-?\d+(?:\.\d+)?\s?%$")
+DATE_FORMATS = ("%m/%d/%Y", "%m/%d/%y", "%Y-%m-%d", "%B %d, %Y", "%b %d, %Y", "%b. %d, %Y")
+
+
+@dataclass(frozen=True)
+class Fragment:
+    # One text-showing operation: baseline start (x, y) in page space, estimated width and font size.
+    x: float
+    y: float
+    width: float
+    size: float
+    text: str
+
+
+@dataclass
+class Cell:
+    x0: float
+    x1: float
+    text: str
+
+
+@dataclass
+class ExtractedTable:
+    page: int
+    line_start: int
+    line_end: int
+    headers: list[str]
+    column_types: list[str]
+    rows: list[dict[str, Any]] = field(default_factory=list)
+
+    def to_dict(self) -> dict[str, Any]:
+        return asdict(self)
+
+
+def parse_cell(text: str) -> tuple[str, Any]:
+    # -> (type, value): currency and number values are floats ("(1,250.00)" is negative), percents
+    # are floats in percent units, dates are ISO strings; anything else is ("text", text).
+    value = text.strip()
+    if not value:
+        return "empty", None
+    negative = value.startswith("(") and value.endswith(")")
+    if CURRENCY_RE.match(value) or NUMBER_RE.match(value):
+        amount = float(value.strip("()").replace("$", "").replace(",", "").replace(" ", ""))
+        return ("currency" if "$" in value else "number"), -amount if negative else amount
+    if PERCENT_RE.match(value):
+        return "percent", float(value.rstrip("%").strip())
+    for fmt in DATE_FORMATS:
+        try:
+            return "date", datetime.strptime(value, fmt).date().isoformat()
+        except ValueError:
+            continue
+    return "text", value
+
+
+def layout_rows(fragments: Iterable[Fragment], tolerance: float = ROW_TOLERANCE) -> list[list[Cell]]:
+    # Fragments on the same baseline (within tolerance) form a row, top to bottom; fragments closer
+    # than about one em are joined into a single cell, wider gaps separate columns.
+    rows: list[list[Fragment]] = []
+    for fragment in sorted((f for f in fragments if f.text.strip()), key=lambda f: (-f.y, f.x)):
+        if rows and abs(rows[-1][0].y - fragment.y) <= tolerance:
+            rows[-1].append(fragment)
+        else:
+            rows.append([fragment])
+    cells: list[list[Cell]] = []
+    for row in rows:
+        merged: list[Cell] = []
+        for fragment in sorted(row, key=lambda f: f.x):
+            text = fragment.text.strip()
+            if merged and fragment.x - merged[-1].x1 < fragment.size:
+                merged[-1].text += ("" if fragment.x - merged[-1].x1 < fragment.size * 0.15 else " ") + text
+                merged[-1].x1 = max(merged[-1].x1, fragment.x + fragment.width)
+            else:
+                merged.append(Cell(fragment.x, fragment.x + fragment.width, text))
+        cells.append(merged)
+    return cells
+
+
+def _assign(columns: list[list[float]], row: list[Cell]) -> list[int] | None:
+    # Column index for each cell by horizontal overlap with the column spans seen so far, so left-
+    # and right-aligned columns both line up. None when fewer than two cells match.
+    assigned = []
+    for cell in row:
+        index = next((i for i, (x0, x1) in enumerate(columns) if cell.x0 <= x1 and cell.x1 >= x0), -1)
+        assigned.append(index)
+    matched = [i for i in assigned if i >= 0]
+    if len(matched) < MIN_COLUMNS or len(set(matched)) < len(matched):
+        return None
+    return assigned
+
+
+def find_tables(rows: list[list[Cell]], page: int) -> list[ExtractedTable]:
+    # A table is a run of at least MIN_TABLE_ROWS consecutive rows with two or more cells that line
+    # up in columns. Line numbers count layout rows on the page, 1-based.
+    tables: list[ExtractedTable] = []
+    start = 0
+    while start < len(rows):
+        if len(rows[start]) < MIN_COLUMNS:
+            start += 1
+            continue
+        columns = [[c.x0, c.x1] for c in rows[start]]
+        placed: list[dict[int, str]] = [{i: c.text for i, c in enumerate(rows[start])}]
+        end = start + 1
+        while end < len(rows) and len(rows[end]) >= MIN_COLUMNS:
+            assigned = _assign(columns, rows[end])
+            if assigned is None:
+                break
+            row: dict[int, str] = {}
+            for cell, index in zip(rows[end], assigned):
+                if index < 0:
+                    columns.append([cell.x0, cell.x1])
+                    index = len(columns) - 1
+                else:
+                    columns[index] = [min(columns[index][0], cell.x0), max(columns[index][1], cell.x1)]
+                row[index] = cell.text
+            placed.append(row)
+            end += 1
+        if end - start >= MIN_TABLE_ROWS:
+            tables.append(_build_table(page, start + 1, end, columns, placed))
+            start = end
+        else:
+            start += 1
+    return tables
+
+
+def _build_table(page: int, line_start: int, line_end: int, columns: list[list[float]], placed: list[dict[int, str]]) -> ExtractedTable:
+    order = sorted(range(len(columns)), key=lambda i: columns[i][0])
+    typed = [{i: parse_cell(text) for i, text in row.items()} for row in placed]
+    header_row = typed[0]
+    has_header = all(kind == "text" for kind, _ in header_row.values()) and any(
+        kind not in ("text", "empty") for row in typed[1:] for kind, _ in row.values()
+    )
+    headers: list[str] = []
+    for position, index in enumerate(order, start=1):
+        name = placed[0].get(index, "").strip() if has_header else ""
+        name = name or f"column_{position}"
+        headers.append(name if name not in headers else f"{name}_{position}")
+    body = typed[1:] if has_header else typed
+    column_types = []
+    for index in order:
+        kinds = Counter(row[index][0] for row in body if index in row and row[index][0] != "empty")
+        column_types.append(kinds.most_common(1)[0][0] if kinds else "empty")
+    rows = [{headers[p]: row[index][1] if index in row else None for p, index in enumerate(order)} for row in body]
+    return ExtractedTable(page, line_start, line_end, headers, column_types, rows)
+
+
+def extract_tables(fragments: Iterable[Fragment], page: int) -> list[ExtractedTable]:
+    return find_tables(layout_rows(fragments), page)
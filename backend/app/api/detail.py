@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+from fastapi import HTTPException
+
+INCLUDE_OPTIONS = frozenset({"raw", "text", "tables"})
+
+MEETING_COLUMNS = ("id", "title", "body", "meeting_date", "location", "status", "agenda_file", "minutes_file")
+AGENDA_COLUMNS = ("id", "meeting_id", "matter_id", "title", "description", "agenda_sequence")
+MATTER_COLUMNS = ("id", "file_no", "matter_type", "title", "status", "intro_date", "passed_date")
+DOCUMENT_COLUMNS = ("id", "source_type", "source_id", "title", "file_url", "citations")
+VOTE_COLUMNS = ("id", "matter_id", "meeting_id", "person_name", "vote_value")
+TABLE_COLUMNS = "table_index, page, line_start, line_end, headers, column_types, rows"
+
+
+def parse_include(include: str | None) -> frozenset[str]:
+    options = frozenset(part.strip() for part in (include or "").split(",") if part.strip())
+    unknown = options - INCLUDE_OPTIONS
+    if unknown:
+        raise HTTPException(400, f"Unknown include: {', '.join(sorted(unknown))}")
+    return options
+
+
+def _columns(columns: tuple[str, ...], include: frozenset[str], text: bool = False) -> str:
+    extra = (("raw",) if "raw" in include else ()) + (("text_content",) if text and "text" in include else ())
+    return ", ".join(columns + extra)
+
+
+def _one(table: str, columns: str, where: str) -> str:
+    return f"(select row_to_json(x) from (select {columns} from {table} where {where}) x)"
+
+
+def _many(table: str, columns: str, where: str, order: str) -> str:
+    return f"coalesce((select json_agg(x order by {order}) from (select {columns} from {table} where {where}) x), '[]'::json)"
+
+
+# Each detail payload is one statement: the entity plus json_agg subqueries for its children.
+def meeting_detail_sql(include: frozenset[str]) -> str:
+    return f"""
+        select
+          {_one('meetings', _columns(MEETING_COLUMNS, include), 'id = %(id)s')} as meeting,
+          {_many('agenda_items', _columns(AGENDA_COLUMNS, include), 'meeting_id = %(id)s', 'x.agenda_sequence nulls last, x.id')} as agenda_items,
+          {_many('documents', _columns(DOCUMENT_COLUMNS, include, text=True), "source_type = 'meeting' and source_id = %(id)s", 'x.id')} as documents,
+          {_many('votes', _columns(VOTE_COLUMNS, include), 'meeting_id = %(id)s', 'x.id')} as votes
+    """
+
+
+# The diff between the two latest text versions, precomputed at ingest into change_events. A newest
+# pair without change events (identical text) still reports its versions, with no changes.
+LATEST_DIFF_SQL = """
+    (select json_build_object(
+       'old_version', v.old_version,
+       'new_version', v.new_version,
+       'changes', coalesce((
+         select json_agg(json_build_object(
+           'clause_id', ce.clause_id, 'change_type', ce.change_type, 'summary', ce.summary,
+           'old_text', ce.old_text, 'new_text', ce.new_text, 'citations', ce.citations
+         ) order by split_part(ce.id, ':', 4)::int)
+         from change_events ce
+         where ce.matter_id = %(id)s and ce.version_seq = v.seq
+       ), '[]'::json)
+     )
+     from (
+       select seq, version_label as new_version, lag(version_label) over (order by seq) as old_version
+       from matter_versions
+       where matter_id = %(id)s
+       order by seq desc
+       limit 1
+     ) v
+     where v.old_version is not null)
+"""
+
+
+def ordinance_detail_sql(include: frozenset[str]) -> str:
+    return f"""
+        select
+          {_one('matters', _columns(MATTER_COLUMNS, include), 'id = %(id)s')} as ordinance,
+          {_many('agenda_items', _columns(AGENDA_COLUMNS, include), 'matter_id = %(id)s', 'x.id')} as versions,
+          {_many('matter_versions', 'version_key, version_label, seq', 'matter_id = %(id)s', 'x.seq')} as text_versions,
+          {_many('votes', _columns(VOTE_COLUMNS, include), 'matter_id = %(id)s', 'x.id')} as votes,
+          {LATEST_DIFF_SQL.strip()} as diff
+    """
+
+
+def document_detail_sql(include: frozenset[str]) -> str:
+    tables = f", {_many('document_tables', TABLE_COLUMNS, 'document_id = %(id)s', 'x.table_index')} as tables" if "tables" in include else ""
+    return f"select {_one('documents', _columns(DOCUMENT_COLUMNS, include, text=True), 'id = %(id)s')} as document{tables}"
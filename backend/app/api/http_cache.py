@@ -0,0 +1,33 @@
+from __future__ import annotations
+
+import hashlib
+
+from fastapi import Request, Response
+
+from app.db import current_generation
+
+CACHE_CONTROL = "no-cache"
+
+
+def generation_etag(*parts: object) -> str:
+    # Strong validator: every committed ingest/extraction bumps the generation, so the tag changes
+    # whenever any row behind a read endpoint can have changed.
+    digest = hashlib.sha256(":".join(str(p) for p in parts).encode()).hexdigest()[:16]
+    return f'"g{current_generation()}-{digest}"'
+
+
+def matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    tags = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return "*" in tags or etag in tags
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
+
+
+def set_validators(response: Response, etag: str) -> None:
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
@@ -0,0 +1,39 @@
+from __future__ import annotations
+
+import base64
+import json
+from typing import Any
+
+from fastapi import HTTPException
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def encode_cursor(values: list[Any]) -> str:
+    return base64.urlsafe_b64encode(json.dumps(values, separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str | None, size: int) -> list[Any] | None:
+    if not cursor:
+        return None
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(400, 'Invalid cursor')
+    if not isinstance(values, list) or len(values) != size:
+        raise HTTPException(400, 'Invalid cursor')
+    return values
+
+
+def page(rows: list[dict[str, Any]], limit: int, key: tuple[str, ...]) -> tuple[list[dict[str, Any]], str | None]:
+    # Callers fetch limit + 1 rows; the extra row only tells us whether another page exists.
+    # Key columns are selected for the cursor and stripped from the returned rows.
+    more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = encode_cursor([rows[-1][k] for k in key]) if more and rows else None
+    for row in rows:
+        for k in key:
+            if k.startswith('_'):
+                row.pop(k, None)
+    return rows, next_cursor
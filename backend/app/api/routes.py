@@ -1,14 +1,26 @@
 from __future__ import annotations
 
+import re
+import tempfile
 from datetime import datetime
+from typing import Any
 
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
 
-from app.analysis.budget_delta import budget_delta
+from app.analysis.budget_delta import budget_delta, compare_budgets, iter_book
 from app.analysis.semantic_diff import semantic_diff
-from app.db import get_conn, init_db, list_jobs
+from app.api.detail import document_detail_sql, meeting_detail_sql, ordinance_detail_sql, parse_include
+from app.api.http_cache import generation_etag, matches, not_modified, set_validators
+from app.api.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, decode_cursor, page
+from app.db import DB_STATEMENT_TIMEOUT_MS, current_generation, estimate_rows, get_conn, init_db, list_jobs, pool_stats
 from app.ingestion.legistar_ingest import run_legistar_ingest
 from app.ragg.briefs import generate_organizer_brief
+from app.search.cache import search_cache, search_cache_key
+from app.search.hybrid import LEXICAL_BUDGET_MS, SEMANTIC_BUDGET_MS, hybrid_search, lexical_retriever, semantic_retriever
+from app.search.postgres import SEARCH_CURSOR_KEYS, estimate_search, unified_search
+from app.search.semantic import hydrate, semantic_hits
+from app.storage.objects import BUDGET_BOOK_PATH, ObjectStore
 
 router = APIRouter()
 
@@ -25,150 +37,135 @@ def search(
     types: str | None = None,
     from_date: str | None = Query(None, alias='from'),
     to_date: str | None = Query(None, alias='to'),
+    cursor: str | None = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
 ) -> dict:
     type_list = set((types or 'meetings,agenda_items,ordinances,documents,news').split(','))
     from_dt = datetime.fromisoformat(from_date) if from_date else None
     to_dt = datetime.fromisoformat(to_date) if to_date else None
+    after = decode_cursor(cursor, len(SEARCH_CURSOR_KEYS))
 
-    results: list[dict] = []
-    with get_conn() as conn, conn.cursor() as cur:
-        if 'meetings' in type_list:
-            cur.execute(
-                """
-                select id, title, meeting_date as date,
-                  ts_rank(search, plainto_tsquery('english', %s)) as score,
-                  ts_headline('english', coalesce(title,'') || ' ' || coalesce(body,''), plainto_tsquery('english', %s)) as snippet
-                from meetings
-                where search @@ plainto_tsquery('english', %s)
-                  and (%s::timestamptz is null or meeting_date >= %s)
-                  and (%s::timestamptz is null or meeting_date <= %s)
-                order by score desc, meeting_date desc
-                limit 40
-                """,
-                (q, q, q, from_dt, from_dt, to_dt, to_dt),
-            )
-            results.extend({
-                'id': f"meeting:{r['id']}", 'title': r['title'], 'type': 'meeting', 'date': r['date'],
-                'snippet': r['snippet'], 'citations': [{'source': 'meeting record'}], 'score': float(r['score'])
-            } for r in cur.fetchall())
-
-        if 'agenda_items' in type_list:
-            cur.execute(
-                """
-                select ai.id, ai.title, m.meeting_date as date,
-                  ts_rank(ai.search, plainto_tsquery('english', %s)) as score,
-                  ts_headline('english', coalesce(ai.title,'') || ' ' || coalesce(ai.description,''), plainto_tsquery('english', %s)) as snippet
-                from agenda_items ai
-                left join meetings m on m.id = ai.meeting_id
-                where ai.search @@ plainto_tsquery('english', %s)
-                order by score desc
-                limit 40
-                """,
-                (q, q, q),
-            )
-            results.extend({
-                'id': f"agenda_item:{r['id']}", 'title': r['title'], 'type': 'agenda_item', 'date': r['date'],
-                'snippet': r['snippet'], 'citations': [{'source': 'agenda', 'line': 1}], 'score': float(r['score'])
-            } for r in cur.fetchall())
-
-        if 'ordinances' in type_list:
-            cur.execute(
-                """
-                select id, title, passed_date as date,
-                  ts_rank(search, plainto_tsquery('english', %s)) as score,
-                  ts_headline('english', coalesce(title,'') || ' ' || coalesce(status,''), plainto_tsquery('english', %s)) as snippet
-                from matters
-                where search @@ plainto_tsquery('english', %s)
-                order by score desc, passed_date desc
-                limit 40
-                """,
-                (q, q, q),
-            )
-            results.extend({
-                'id': f"ordinance:{r['id']}", 'title': r['title'], 'type': 'ordinance', 'date': r['date'],
-                'snippet': r['snippet'], 'citations': [{'source': 'matter'}], 'score': float(r['score'])
-            } for r in cur.fetchall())
-
-        if 'documents' in type_list:
-            cur.execute(
-                """
-                select id, title,
-                  ts_rank(search, plainto_tsquery('english', %s)) as score,
-                  ts_headline('english', coalesce(text_content,''), plainto_tsquery('english', %s)) as snippet,
-                  citations
-                from documents
-                where search @@ plainto_tsquery('english', %s)
-                order by score desc
-                limit 40
-                """,
-                (q, q, q),
-            )
-            results.extend({
-                'id': r['id'], 'title': r['title'], 'type': 'document', 'date': None,
-                'snippet': r['snippet'], 'citations': r['citations'] or [], 'score': float(r['score'])
-            } for r in cur.fetchall())
-
-    results = sorted(results, key=lambda x: x['score'], reverse=True)
-    return {'results': results[:120]}
+    key = search_cache_key(q, type_list, from_dt, to_dt, cursor=cursor, limit=limit)
+    # The generation is normally served from the in-process copy, so a cache hit needs no connection.
+    generation = current_generation()
+    cached = search_cache.get(key, generation)
+    if cached is not None:
+        return cached
+    with get_conn(DB_STATEMENT_TIMEOUT_MS) as conn, conn.cursor() as cur:
+        rows = unified_search(cur, q, type_list, from_dt, to_dt, limit + 1, after)
+        results, next_cursor = page(rows, limit, SEARCH_CURSOR_KEYS)
+        total = estimate_search(cur, q, type_list, from_dt, to_dt)
+    response = {'results': results, 'next_cursor': next_cursor, 'estimated_total': total}
+    search_cache.set(key, generation, response)
+    return response
+
+
+@router.get('/search/semantic')
+def search_semantic(q: str = Query(...), k: int = Query(20, ge=1, le=MAX_PAGE_SIZE)) -> dict:
+    hits = semantic_hits(q, k)
+    with get_conn(DB_STATEMENT_TIMEOUT_MS) as conn, conn.cursor() as cur:
+        return {'results': hydrate(cur, hits)[:k]}
+
+
+@router.get('/search/hybrid')
+def search_hybrid(
+    q: str = Query(...),
+    types: str | None = None,
+    from_date: str | None = Query(None, alias='from'),
+    to_date: str | None = Query(None, alias='to'),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+) -> dict:
+    type_list = set((types or 'meetings,agenda_items,ordinances,documents,news').split(','))
+    from_dt = datetime.fromisoformat(from_date) if from_date else None
+    to_dt = datetime.fromisoformat(to_date) if to_date else None
+    return hybrid_search(
+        {
+            'lexical': (lexical_retriever(q, type_list, from_dt, to_dt, limit, LEXICAL_BUDGET_MS), LEXICAL_BUDGET_MS),
+            'semantic': (semantic_retriever(q, type_list, from_dt, to_dt, limit, SEMANTIC_BUDGET_MS), SEMANTIC_BUDGET_MS),
+        },
+        limit,
+    )
 
 
 @router.get('/meetings')
-def meetings(from_date: str | None = Query(None, alias='from'), to_date: str | None = Query(None, alias='to'), keyword: str | None = None) -> dict:
-    with get_conn() as conn, conn.cursor() as cur:
+def meetings(
+    from_date: str | None = Query(None, alias='from'),
+    to_date: str | None = Query(None, alias='to'),
+    keyword: str | None = None,
+    cursor: str | None = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+) -> dict:
+    after = decode_cursor(cursor, 2)
+    filters = """
+        from meetings
+        where (%(from)s::timestamptz is null or meeting_date >= %(from)s)
+          and (%(to)s::timestamptz is null or meeting_date <= %(to)s)
+          and (%(keyword)s::text is null or search @@ plainto_tsquery('english', %(keyword)s))
+    """
+    params = {'from': from_date, 'to': to_date, 'keyword': keyword, 'limit': limit + 1}
+    keyset = ''
+    if after:
+        keyset = "and (coalesce(meeting_date, '-infinity'::timestamptz), id) < (%(after_date)s::timestamptz, %(after_id)s)"
+        params.update(after_date=after[0], after_id=after[1])
+    with get_conn(DB_STATEMENT_TIMEOUT_MS) as conn, conn.cursor() as cur:
         cur.execute(
-            """
-            select id, title, body, meeting_date, location, status
-            from meetings
-            where (%s::timestamptz is null or meeting_date >= %s)
-              and (%s::timestamptz is null or meeting_date <= %s)
-              and (%s::text is null or search @@ plainto_tsquery('english', %s))
-            order by meeting_date desc
-            limit 200
+            f"""
+            select id, title, body, meeting_date, location, status,
+              coalesce(meeting_date, '-infinity'::timestamptz)::text as _date_key
+            {filters} {keyset}
+            order by coalesce(meeting_date, '-infinity'::timestamptz) desc, id desc
+            limit %(limit)s
             """,
-            (from_date, from_date, to_date, to_date, keyword, keyword),
+            params,
         )
-        rows = list(cur.fetchall())
-    return {'items': rows}
+        rows, next_cursor = page(list(cur.fetchall()), limit, ('_date_key', 'id'))
+        total = estimate_rows(cur, f'select 1 {filters}', params)
+    return {'items': rows, 'next_cursor': next_cursor, 'estimated_total': total}
 
 
 @router.get('/meetings/{meeting_id}')
-def meeting_detail(meeting_id: int) -> dict:
-    with get_conn() as conn, conn.cursor() as cur:
-        cur.execute('select * from meetings where id = %s', (meeting_id,))
-        meeting = cur.fetchone()
-        if not meeting:
-            raise HTTPException(404, 'Meeting not found')
-        cur.execute('select * from agenda_items where meeting_id=%s order by agenda_sequence nulls last, id', (meeting_id,))
-        agenda = list(cur.fetchall())
-        cur.execute("select * from documents where source_type='meeting' and source_id=%s", (meeting_id,))
-        docs = list(cur.fetchall())
-        cur.execute('select v.* from votes v where meeting_id=%s', (meeting_id,))
-        vote_rows = list(cur.fetchall())
-    return {'meeting': meeting, 'agenda_items': agenda, 'documents': docs, 'votes': vote_rows}
+def meeting_detail(meeting_id: int, request: Request, response: Response, include: str | None = None) -> Any:
+    options = parse_include(include)
+    etag = generation_etag('meeting', meeting_id, *sorted(options))
+    if matches(request, etag):
+        return not_modified(etag)
+    with get_conn(DB_STATEMENT_TIMEOUT_MS) as conn, conn.cursor() as cur:
+        cur.execute(meeting_detail_sql(options), {'id': meeting_id})
+        row = cur.fetchone()
+    if not row or not row['meeting']:
+        raise HTTPException(404, 'Meeting not found')
+    set_validators(response, etag)
+    return row
 
 
 @router.get('/documents/{doc_id:path}')
-def document_detail(doc_id: str) -> dict:
-    with get_conn() as conn, conn.cursor() as cur:
-        cur.execute('select * from documents where id=%s', (doc_id,))
-        doc = cur.fetchone()
-        if not doc:
-            raise HTTPException(404, 'Document not found')
-    return {'document': doc}
+def document_detail(doc_id: str, request: Request, response: Response, include: str | None = None) -> Any:
+    options = parse_include(include)
+    etag = generation_etag('document', doc_id, *sorted(options))
+    if matches(request, etag):
+        return not_modified(etag)
+    with get_conn(DB_STATEMENT_TIMEOUT_MS) as conn, conn.cursor() as cur:
+        cur.execute(document_detail_sql(options), {'id': doc_id})
+        row = cur.fetchone()
+    if not row or not row['document']:
+        raise HTTPException(404, 'Document not found')
+    set_validators(response, etag)
+    return row
 
 
 @router.get('/ordinances/{matter_id}')
-def ordinance_detail(matter_id: int) -> dict:
-    with get_conn() as conn, conn.cursor() as cur:
-        cur.execute('select * from matters where id=%s', (matter_id,))
-        matter = cur.fetchone()
-        if not matter:
-            raise HTTPException(404, 'Ordinance not found')
-        cur.execute('select * from agenda_items where matter_id=%s order by id', (matter_id,))
-        versions = list(cur.fetchall())
-        cur.execute('select * from votes where matter_id=%s', (matter_id,))
-        vote_rows = list(cur.fetchall())
-    return {'ordinance': matter, 'versions': versions, 'votes': vote_rows, 'diff': None}
+def ordinance_detail(matter_id: int, request: Request, response: Response, include: str | None = None) -> Any:
+    options = parse_include(include)
+    etag = generation_etag('ordinance', matter_id, *sorted(options))
+    if matches(request, etag):
+        return not_modified(etag)
+    with get_conn(DB_STATEMENT_TIMEOUT_MS) as conn, conn.cursor() as cur:
+        cur.execute(ordinance_detail_sql(options), {'id': matter_id})
+        row = cur.fetchone()
+    if not row or not row['ordinance']:
+        raise HTTPException(404, 'Ordinance not found')
+    set_validators(response, etag)
+    return row
 
 
 @router.post('/admin/ingest')
@@ -181,12 +178,97 @@ def admin_ingest(mode: str = 'incremental', source: str = 'whatcom_legistar_api'
 def jobs() -> dict:
     return {'items': list_jobs()}
 
+
+@router.get('/metrics')
+def metrics() -> dict:
+    return {'db_pool': pool_stats(), 'search_cache': search_cache.stats()}
+
 # preserve analysis endpoints
 @router.post('/analysis/budget-delta')
 def budget(req: dict) -> dict:
     return budget_delta(req['old_rows'], req['new_rows'])
 
 
+BOOK_SPOOL_BYTES = 8 * 1024 * 1024
+BOOK_MAX_BYTES = 256 * 1024 * 1024
+BOOK_LINE_LIMIT = 1000
+
+
+# Budget books are streamed (CSV or NDJSON body) into their own object store and compared by id,
+# so a full budget never has to fit in one JSON request. Object GC never touches them.
+@router.put('/analysis/budget-books')
+async def upload_budget_book(request: Request) -> dict:
+    too_large = HTTPException(413, f'Budget book exceeds {BOOK_MAX_BYTES} bytes')
+    if int(request.headers.get('content-length') or 0) > BOOK_MAX_BYTES:
+        raise too_large
+    with tempfile.SpooledTemporaryFile(max_size=BOOK_SPOOL_BYTES) as spool:
+        received = 0
+        async for chunk in request.stream():
+            received += len(chunk)
+            if received > BOOK_MAX_BYTES:
+                raise too_large
+            spool.write(chunk)
+        spool.seek(0)
+        blob = await run_in_threadpool(ObjectStore(BUDGET_BOOK_PATH).put_stream, iter(lambda: spool.read(1 << 20), b''))
+    return {'book': blob.sha256, 'size': blob.size}
+
+
+def _book_path(store: ObjectStore, book: str) -> Any:
+    if not re.fullmatch(r'[0-9a-f]{64}', book or ''):
+        raise HTTPException(400, f'Invalid budget book id: {book!r}')
+    if not store.exists(book):
+        raise HTTPException(404, f'Budget book not found: {book}')
+    return store.path_for(book)
+
+
+def _budget_comparison(req: dict, old_rows: Any, new_rows: Any) -> dict:
+    # Column names differ between books and extracted tables (whose headers come from the PDF),
+    # so callers name the key columns.
+    keys = tuple(req.get('keys') or ())
+    if not keys:
+        raise HTTPException(400, 'keys is required, e.g. ["fund", "department", "account"]')
+    try:
+        comparison = compare_budgets(old_rows, new_rows, keys=keys, amount_field=req.get('amount_field', 'amount'))
+        rollups = {str(depth): comparison.rollup(int(depth)) for depth in req.get('rollups', [1])}
+    except ValueError as exc:
+        raise HTTPException(400, str(exc)) from exc
+    statuses = req.get('statuses') or ['added', 'removed', 'changed']
+    limit = min(int(req.get('limit', BOOK_LINE_LIMIT)), BOOK_LINE_LIMIT)
+    return {'keys': list(keys), 'summary': comparison.summary(), 'rollups': rollups, 'lines': comparison.lines(statuses, limit)}
+
+
+@router.post('/analysis/budget-delta/books')
+def budget_books_delta(req: dict) -> dict:
+    store = ObjectStore(BUDGET_BOOK_PATH)
+    old_path, new_path = _book_path(store, req.get('old')), _book_path(store, req.get('new'))
+    return _budget_comparison(req, iter_book(old_path), iter_book(new_path))
+
+
+def _table_ref(ref: Any) -> tuple[str, int]:
+    document_id = ref.get('document_id') if isinstance(ref, dict) else None
+    if not isinstance(document_id, str) or not document_id:
+        raise HTTPException(400, f'Invalid table reference: {ref!r}')
+    try:
+        return document_id, int(ref.get('table_index', 0))
+    except (TypeError, ValueError) as exc:
+        raise HTTPException(400, f'Invalid table index: {ref.get("table_index")!r}') from exc
+
+
+# Tables extracted from budget PDFs (document_tables), referenced as {"document_id", "table_index"}.
+@router.post('/analysis/budget-delta/tables')
+def budget_tables_delta(req: dict) -> dict:
+    refs = [_table_ref(req.get(side)) for side in ('old', 'new')]
+    tables = []
+    with get_conn(DB_STATEMENT_TIMEOUT_MS) as conn, conn.cursor() as cur:
+        for ref in refs:
+            cur.execute('select rows from document_tables where document_id = %s and table_index = %s', ref)
+            row = cur.fetchone()
+            if not row:
+                raise HTTPException(404, f'Table not found: {ref}')
+            tables.append(row['rows'])
+    return _budget_comparison(req, tables[0], tables[1])
+
+
 @router.post('/analysis/semantic-diff')
 def sem_diff(req: dict) -> dict:
     changes = semantic_diff(req['old_sections'], req['new_sections'])
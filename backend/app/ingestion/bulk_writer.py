@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+import os
+from dataclasses import dataclass
+from typing import Any
+
+import psycopg
+from psycopg.types.json import Jsonb
+
+BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "500"))
+
+
+@dataclass(frozen=True)
+class TableSpec:
+    table: str
+    columns: tuple[str, ...]
+    key: str = "id"
+    json_columns: tuple[str, ...] = ("raw",)
+    # An existing row is only rewritten when one of these differs, so unchanged records don't
+    # regenerate their search tsvector or churn the GIN index.
+    change_columns: tuple[str, ...] = ("raw",)
+    # (column, expression) pairs that replace the default "column=excluded.column" on conflict.
+    conflict_updates: tuple[tuple[str, str], ...] = ()
+
+    @property
+    def staging(self) -> str:
+        return f"stage_{self.table}"
+
+
+# Listed in foreign-key order; batches are always merged in this order.
+TABLES: dict[str, TableSpec] = {
+    spec.table: spec
+    for spec in (
+        TableSpec("meetings", ("id", "title", "body", "meeting_date", "location", "status", "agenda_file", "minutes_file", "raw")),
+        TableSpec("matters", ("id", "file_no", "matter_type", "title", "status", "intro_date", "passed_date", "raw")),
+        TableSpec("agenda_items", ("id", "meeting_id", "matter_id", "title", "description", "agenda_sequence", "raw")),
+        TableSpec(
+            "matter_versions",
+            ("id", "matter_id", "version_key", "version_label", "seq", "text_content", "sections", "raw"),
+            json_columns=("sections", "raw"),
+            change_columns=("version_label", "seq", "text_content", "sections", "raw"),
+        ),
+        TableSpec(
+            "change_events",
+            (
+                "id", "matter_id", "document_id", "old_version", "new_version", "version_seq",
+                "clause_id", "change_type", "summary", "old_text", "new_text", "citations",
+            ),
+            json_columns=("citations",),
+            change_columns=("change_type", "summary", "old_text", "new_text", "citations"),
+        ),
+        TableSpec("blobs", ("sha256", "size"), key="sha256", json_columns=(), change_columns=("size",)),
+        TableSpec(
+            "documents",
+            ("id", "source_type", "source_id", "title", "file_url", "object_path", "text_content", "citations", "raw"),
+            json_columns=("citations", "raw"),
+            change_columns=("title", "file_url", "object_path", "text_content", "citations", "raw"),
+        ),
+        TableSpec("document_blobs", ("document_id", "sha256", "updated_at"), key="document_id", json_columns=(), change_columns=("sha256",)),
+        TableSpec(
+            "document_extract_queue",
+            ("document_id", "object_path", "status", "attempts", "error", "enqueued_at"),
+            key="document_id",
+            json_columns=(),
+            change_columns=(),
+            # A row a worker holds stays claimed (and keeps its attempts); the new object_path is
+            # still recorded, and the worker's finish re-queues the document when it no longer matches.
+            conflict_updates=(
+                ("status", "case when document_extract_queue.status = 'running' then 'running' else excluded.status end"),
+                ("attempts", "case when document_extract_queue.status = 'running' then document_extract_queue.attempts else excluded.attempts end"),
+            ),
+        ),
+    )
+}
+
+
+class BulkUpserter:
+    # Buffers rows per table (last write per id wins), COPYs each batch into a session-private
+    # staging table and merges it with one INSERT ... SELECT ... ON CONFLICT per table.
+    def __init__(self, cur: psycopg.Cursor, batch_size: int | None = None) -> None:
+        self.cur = cur
+        self.batch_size = max(1, batch_size or BATCH_SIZE)
+        self.buffers: dict[str, dict[Any, tuple[Any, ...]]] = {table: {} for table in TABLES}
+        self.written: dict[str, int] = {table: 0 for table in TABLES}
+        self._staged = False
+
+    def add(self, table: str, row: tuple[Any, ...]) -> None:
+        buffer = self.buffers[table]
+        buffer[row[0]] = row
+        if len(buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        if not any(self.buffers.values()):
+            return
+        self._ensure_staging()
+        for table, buffer in self.buffers.items():
+            if buffer:
+                self._merge(TABLES[table], list(buffer.values()))
+                buffer.clear()
+
+    def _ensure_staging(self) -> None:
+        if self._staged:
+            return
+        for spec in TABLES.values():
+            # Temp tables are never WAL-logged and are private to this session, so concurrent
+            # ingests can't see each other's batches. Defaults fill the columns a spec doesn't COPY.
+            self.cur.execute(f"create temp table if not exists {spec.staging} (like {spec.table} including defaults) on commit drop")
+        self._staged = True
+
+    def _merge(self, spec: TableSpec, rows: list[tuple[Any, ...]]) -> None:
+        columns = ", ".join(spec.columns)
+        json_idx = [spec.columns.index(col) for col in spec.json_columns]
+        self.cur.execute(f"truncate {spec.staging}")
+        with self.cur.copy(f"copy {spec.staging} ({columns}) from stdin") as copy:
+            for row in rows:
+                copy.write_row(tuple(Jsonb(value) if idx in json_idx else value for idx, value in enumerate(row)))
+        overrides = dict(spec.conflict_updates)
+        updates = ", ".join(f"{col}={overrides.get(col, f'excluded.{col}')}" for col in spec.columns if col != spec.key)
+        where = ""
+        if spec.change_columns:
+            current = ", ".join(f"{spec.table}.{col}" for col in spec.change_columns)
+            incoming = ", ".join(f"excluded.{col}" for col in spec.change_columns)
+            where = f"where ({current}) is distinct from ({incoming})"
+        self.cur.execute(
+            f"""
+            insert into {spec.table}({columns})
+            select {columns} from {spec.staging}
+            on conflict({spec.key}) do update set {updates}
+            {where}
+            """
+        )
+        self.written[spec.table] += max(self.cur.rowcount, 0)
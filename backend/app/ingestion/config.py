@@ -24,6 +24,7 @@ class SourceConfig(BaseModel):
     provenance: str
     base_url: HttpUrl
     extraction_hints: ExtractionHints
+    timeout_seconds: float | None = Field(default=None, gt=0, description="per-run deadline for this source")
 
 
 class SourcesConfig(BaseModel):
@@ -0,0 +1,284 @@
+from __future__ import annotations
+
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Iterable, Iterator
+
+from psycopg.types.json import Jsonb
+from pypdf import PdfReader
+
+from app.analysis.document_processing import CHUNK_OVERLAP, TextChunk, iter_chunks, page_citations
+from app.analysis.tables import Fragment, extract_tables
+from app.db import bump_generation, get_conn
+from app.search.embeddings import HashingEmbedder, VectorIndex, open_index_for_write
+from app.search.semantic import chunk_key, chunk_prefix
+
+EXTRACT_WORKERS = int(os.getenv("EXTRACT_WORKERS", str(os.cpu_count() or 2)))
+EXTRACT_BATCH_SIZE = int(os.getenv("EXTRACT_BATCH_SIZE", "20"))
+EXTRACT_MAX_ATTEMPTS = int(os.getenv("EXTRACT_MAX_ATTEMPTS", "3"))
+PAGES_PER_TASK = int(os.getenv("EXTRACT_PAGES_PER_TASK", "25"))
+
+# (page number, text, tables) for each page of a range.
+PageResult = tuple[int, str, list[dict[str, Any]]]
+
+
+@dataclass
+class ExtractionResult:
+    processed: int
+    failed: int
+
+
+def iter_pdf_pages(path: str, start: int = 0, stop: int | None = None) -> Iterator[tuple[int, str]]:
+    # Pages are parsed on demand, so a consumer that stops early never parses the rest.
+    reader = PdfReader(path)
+    for idx in range(start, len(reader.pages) if stop is None else stop):
+        yield idx + 1, reader.pages[idx].extract_text() or ""
+
+
+def _decode(operand: Any) -> str:
+    if isinstance(operand, bytes):
+        return operand.decode("latin-1")
+    if isinstance(operand, str):
+        return operand
+    # TJ arrays mix strings with kerning in thousandths of an em; a large negative gap is a space.
+    return "".join(_decode(part) if isinstance(part, (bytes, str)) else (" " if part < -200 else "") for part in operand)
+
+
+def extract_page(page: Any, page_no: int) -> tuple[str, list[dict[str, Any]]]:
+    # One pass over the content stream yields the text and, from the text matrix at each show
+    # operator, the positioned fragments that table detection needs. Widths are estimated at half
+    # an em per character, enough to tell word gaps from column gaps. Operands are decoded
+    # as single-byte text, so pages set in CID fonts simply yield no tables.
+    fragments: list[Fragment] = []
+    font_size = [1.0]
+
+    def visit(op: bytes, args: list[Any], cm: list[float], tm: list[float]) -> None:
+        if op == b"Tf" and len(args) == 2:
+            font_size[0] = float(args[1])
+        elif op in (b"Tj", b"TJ", b"'", b'"') and args:
+            scale = abs(tm[0] * cm[0]) or 1.0
+            size = font_size[0] * scale
+            text = _decode(args[-1])
+            x = tm[4] * cm[0] + tm[5] * cm[2] + cm[4]
+            y = tm[4] * cm[1] + tm[5] * cm[3] + cm[5]
+            fragments.append(Fragment(x, y, len(text) * size * 0.5, size, text))
+
+    text = page.extract_text(visitor_operand_before=visit) or ""
+    return text, [table.to_dict() for table in extract_tables(fragments, page_no)]
+
+
+def _extract_page_range(path: str, start: int, stop: int) -> list[PageResult]:
+    reader = PdfReader(path)
+    return [(idx + 1, *extract_page(reader.pages[idx], idx + 1)) for idx in range(start, stop)]
+
+
+def enqueue_backfill() -> int:
+    # Stored documents with no chunks yet, e.g. extracted before chunking existed. Empty text_content
+    # marks a PDF already extracted to nothing; rows a worker holds are left alone.
+    with get_conn() as conn, conn.cursor() as cur:
+        cur.execute(
+            """
+            insert into document_extract_queue (document_id, object_path)
+            select d.id, d.object_path from documents d
+            where d.object_path is not null
+              and d.text_content is distinct from ''
+              and not exists (select 1 from document_chunks c where c.document_id = d.id)
+            on conflict (document_id) do update
+            set object_path = excluded.object_path, status = 'pending', attempts = 0, error = null, enqueued_at = now()
+            where document_extract_queue.status in ('done', 'failed')
+            """
+        )
+        return cur.rowcount
+
+
+def _claim(batch_size: int) -> list[dict[str, Any]]:
+    with get_conn() as conn, conn.cursor() as cur:
+        cur.execute(
+            """
+            update document_extract_queue q
+            set status = 'running', started_at = now(), attempts = q.attempts + 1
+            where q.document_id in (
+              select document_id from document_extract_queue
+              where status = 'pending'
+                 or (status = 'failed' and attempts < %s)
+                 or (status = 'running' and started_at < now() - interval '30 minutes')
+              order by enqueued_at
+              limit %s
+              for update skip locked
+            )
+            returning q.document_id, q.object_path
+            """,
+            (EXTRACT_MAX_ATTEMPTS, batch_size),
+        )
+        return list(cur.fetchall())
+
+
+def _mark(cur: Any, document_id: str, object_path: str, error: str | None = None) -> None:
+    # Re-ingest may have pointed the row at a new object while this worker held it.
+    cur.execute(
+        """
+        update document_extract_queue
+        set status = case when object_path = %s then %s else 'pending' end, error = %s, finished_at = now()
+        where document_id = %s
+        """,
+        (object_path, "failed" if error else "done", error, document_id),
+    )
+
+
+def _fail(document_id: str, object_path: str, error: str) -> None:
+    with get_conn() as conn, conn.cursor() as cur:
+        _mark(cur, document_id, object_path, error)
+
+
+def _store(document_id: str, object_path: str, pages: Iterable[PageResult], index: VectorIndex, embedder: HashingEmbedder) -> None:
+    # Pages, chunks, tables and vectors are written PAGES_PER_TASK pages at a time as they arrive,
+    # so no document is held whole; text_content is joined server-side from the staged pages.
+    texts: list[tuple[int, str]] = []
+    tables: list[dict[str, Any]] = []
+    chunks: list[TextChunk] = []
+    citations: dict[int, dict[str, int]] = {}
+    written = {"chunks": 0, "tables": 0}
+
+    def recorded() -> Iterator[tuple[int, str]]:
+        for page_no, text, page_tables in pages:
+            if text.strip():
+                texts.append((page_no, text))
+            tables.extend(page_tables)
+            yield page_no, text
+
+    def flush() -> None:
+        with cur.copy("copy extract_pages (page, text) from stdin") as copy:
+            for row in texts:
+                copy.write_row(row)
+        first = written["chunks"]
+        with cur.copy("copy document_chunks (document_id, chunk_index, page, line_start, line_end, char_start, char_end, text) from stdin") as copy:
+            for idx, chunk in enumerate(chunks, start=first):
+                copy.write_row((document_id, idx, chunk.page, chunk.line_start, chunk.line_end, chunk.char_start, chunk.char_end, chunk.text))
+        with cur.copy("copy document_tables (document_id, table_index, page, line_start, line_end, headers, column_types, rows) from stdin") as copy:
+            for idx, table in enumerate(tables, start=written["tables"]):
+                copy.write_row(
+                    (document_id, idx, table["page"], table["line_start"], table["line_end"], Jsonb(table["headers"]), Jsonb(table["column_types"]), Jsonb(table["rows"]))
+                )
+        if chunks:
+            index.add([chunk_key(document_id, idx) for idx in range(first, first + len(chunks))], embedder.embed([chunk.text for chunk in chunks]))
+        for cite in page_citations(chunks):
+            known = citations.setdefault(cite["page"], cite)
+            known["line_start"] = min(known["line_start"], cite["line_start"])
+            known["line_end"] = max(known["line_end"], cite["line_end"])
+        written["chunks"] += len(chunks)
+        written["tables"] += len(tables)
+        texts.clear()
+        tables.clear()
+        chunks.clear()
+
+    with get_conn() as conn, conn.cursor() as cur:
+        cur.execute("create temp table extract_pages (page int not null, text text not null) on commit drop")
+        cur.execute("delete from document_chunks where document_id = %s", (document_id,))
+        cur.execute("delete from document_tables where document_id = %s", (document_id,))
+        for chunk in iter_chunks(recorded(), overlap_chars=CHUNK_OVERLAP):
+            chunks.append(chunk)
+            if len(texts) >= PAGES_PER_TASK:
+                flush()
+        flush()
+        cur.execute(
+            """
+            update documents
+            set text_content = coalesce((select string_agg(text, E'\\n\\n' order by page) from extract_pages), ''), citations = %s
+            where id = %s
+            """,
+            (Jsonb(list(citations.values())), document_id),
+        )
+        _mark(cur, document_id, object_path)
+
+
+class PageWindow:
+    # Page ranges of a claimed batch, submitted in document order with at most `size` in flight.
+    def __init__(self, executor: Executor, paths: list[str], size: int, pages_per_task: int = PAGES_PER_TASK) -> None:
+        self.executor = executor
+        self.size = max(1, size)
+        self._tasks = self._ranges(paths, pages_per_task)
+        self._queue: deque[tuple[int, Future[list[PageResult]] | Exception]] = deque()
+        self._skipped: set[int] = set()
+
+    @staticmethod
+    def _ranges(paths: list[str], pages_per_task: int) -> Iterator[tuple[int, tuple[str, int, int] | Exception]]:
+        for doc, path in enumerate(paths):
+            try:
+                page_count = len(PdfReader(path).pages)
+            except Exception as exc:
+                yield doc, exc
+                continue
+            for start in range(0, page_count, pages_per_task):
+                yield doc, (path, start, min(start + pages_per_task, page_count))
+
+    def _fill(self) -> None:
+        while len(self._queue) < self.size:
+            task = next(self._tasks, None)
+            if task is None:
+                return
+            doc, work = task
+            if doc not in self._skipped:
+                self._queue.append((doc, work if isinstance(work, Exception) else self.executor.submit(_extract_page_range, *work)))
+
+    def pages(self, doc: int) -> Iterator[PageResult]:
+        # Each range handed out frees a slot, so the next ranges (possibly of later documents)
+        # start while this one is being written.
+        while True:
+            self._fill()
+            if not self._queue or self._queue[0][0] != doc:
+                return
+            _, work = self._queue.popleft()
+            if isinstance(work, Exception):
+                raise work
+            yield from work.result()
+
+    def discard(self, doc: int) -> None:
+        self._skipped.add(doc)
+        while self._queue and self._queue[0][0] == doc:
+            _, work = self._queue.popleft()
+            if isinstance(work, Future):
+                work.cancel()
+
+
+def _publish() -> None:
+    # One generation bump per batch rather than per document keeps search caches useful mid-run.
+    with get_conn() as conn, conn.cursor() as cur:
+        bump_generation(cur)
+
+
+def run_extraction(workers: int | None = None, batch_size: int | None = None, max_batches: int | None = None) -> ExtractionResult:
+    processed = failed = batches = 0
+    workers = max(1, workers or EXTRACT_WORKERS)
+    embedder = HashingEmbedder()
+    # spawn: the ingest process holds pool and fetch threads, which must not be forked mid-lock.
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+        while max_batches is None or batches < max_batches:
+            claimed = _claim(batch_size or EXTRACT_BATCH_SIZE)
+            if not claimed:
+                break
+            batches += 1
+            # Two page ranges per worker keep every core busy without queueing the whole batch.
+            window = PageWindow(executor, [row["object_path"] for row in claimed], 2 * workers)
+            stored = 0
+            # The index is written once per batch; a document's old vectors go even if it fails,
+            # since they describe an object that has been replaced.
+            with open_index_for_write(dim=embedder.dim) as index:
+                index.remove_prefixes(chunk_prefix(row["document_id"]) for row in claimed)
+                for doc, row in enumerate(claimed):
+                    try:
+                        _store(row["document_id"], row["object_path"], window.pages(doc), index, embedder)
+                    except Exception as exc:
+                        window.discard(doc)
+                        index.remove_prefixes([chunk_prefix(row["document_id"])])
+                        _fail(row["document_id"], row["object_path"], str(exc) or type(exc).__name__)
+                        failed += 1
+                        continue
+                    stored += 1
+            processed += stored
+            if stored:
+                _publish()
+    return ExtractionResult(processed=processed, failed=failed)
@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Iterable, Iterator, TypeVar
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+FETCH_WORKERS = int(os.getenv("INGEST_FETCH_WORKERS", "8"))
+HOST_RATE_LIMIT = float(os.getenv("INGEST_HOST_RATE_LIMIT", "10"))
+
+
+class HostRateLimiter:
+    def __init__(self, per_second: float) -> None:
+        self.interval = 1.0 / per_second if per_second > 0 else 0.0
+        self._next_slot: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def wait(self, url: str) -> None:
+        if not self.interval:
+            return
+        host = urlsplit(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class ThrottledSession:
+    def __init__(self, session: requests.Session, limiter: HostRateLimiter) -> None:
+        self.session = session
+        self.limiter = limiter
+
+    def get(self, url: str, **kwargs: Any) -> requests.Response:
+        self.limiter.wait(url)
+        return self.session.get(url, **kwargs)
+
+
+class FetchEngine:
+    # Tasks (one per event) run on their own pool and fan requests out via ``submit`` onto a second
+    # pool, so a task blocked on its requests can never starve the workers those requests need.
+    def __init__(self, session: requests.Session | None = None, workers: int | None = None, rate_limit: float | None = None) -> None:
+        self.workers = max(1, workers or FETCH_WORKERS)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_maxsize=self.workers * 2)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+        self.session = ThrottledSession(session, HostRateLimiter(HOST_RATE_LIMIT if rate_limit is None else rate_limit))
+        self._tasks = ThreadPoolExecutor(self.workers, thread_name_prefix="ingest-task")
+        self._requests = ThreadPoolExecutor(self.workers, thread_name_prefix="ingest-fetch")
+
+    def submit(self, fn: Callable[..., R], *args: Any, **kwargs: Any) -> Future[R]:
+        return self._requests.submit(fn, *args, **kwargs)
+
+    def map_ordered(self, fn: Callable[[T], R], items: Iterable[T]) -> Iterator[R]:
+        window: deque[Future[R]] = deque()
+        for item in items:
+            window.append(self._tasks.submit(fn, item))
+            if len(window) >= self.workers * 2:
+                yield window.popleft().result()
+        while window:
+            yield window.popleft().result()
+
+    def close(self) -> None:
+        self._tasks.shutdown(wait=True, cancel_futures=True)
+        self._requests.shutdown(wait=True, cancel_futures=True)
+
+    def __enter__(self) -> FetchEngine:
+        return self
+
+    def __exit__(self, *_exc: object) -> None:
+        self.close()
@@ -0,0 +1,253 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Iterable, Protocol
+
+from app.db import get_conn
+
+INGEST_HASH_STORE = os.getenv("INGEST_HASH_STORE", "postgres")
+INGEST_HASH_STORE_PATH = Path(os.getenv("INGEST_HASH_STORE_PATH", "/tmp/wcc_ingest_hashes.sqlite3"))
+INGEST_HASH_CACHE_SIZE = int(os.getenv("INGEST_HASH_CACHE_SIZE", "200000"))
+SQLITE_BATCH = 500
+
+# (stable_id, payload, content_hash)
+StoredRecord = tuple[str, dict[str, Any], str]
+
+
+class HashStore(Protocol):
+    def get_hashes(self, stable_ids: Iterable[str]) -> dict[str, str]: ...
+
+    def unchanged(self, pairs: list[tuple[str, str]]) -> set[str]: ...
+
+    def upsert_many(self, records: list[StoredRecord]) -> list[bool]: ...
+
+
+def _last_by_id(records: list[StoredRecord]) -> tuple[dict[str, StoredRecord], list[bool | None]]:
+    # A batch may carry the same stable_id twice: only the last occurrence is written, and an earlier
+    # one counts as changed only against the hash that preceded it in the batch.
+    latest: dict[str, StoredRecord] = {}
+    within: list[bool | None] = []
+    for record in records:
+        previous = latest.get(record[0])
+        within.append(None if previous is None else previous[2] != record[2])
+        latest[record[0]] = record
+    return latest, within
+
+
+def _matching(stored: dict[str, str], pairs: list[tuple[str, str]]) -> set[str]:
+    # -> stable_ids whose stored hash equals the given one; stores fill `stored` with one get_hashes call.
+    return {sid for sid, content_hash in pairs if stored.get(sid) == content_hash}
+
+
+def _merge(records: list[StoredRecord], within: list[bool | None], changed: set[str]) -> list[bool]:
+    return [record[0] in changed if flag is None else flag for record, flag in zip(records, within)]
+
+
+@dataclass
+class InMemoryStore:
+    records: dict[str, dict[str, Any]] = field(default_factory=dict)
+
+    def get_hashes(self, stable_ids: Iterable[str]) -> dict[str, str]:
+        return {sid: self.records[sid]["content_hash"] for sid in stable_ids if sid in self.records}
+
+    def unchanged(self, pairs: list[tuple[str, str]]) -> set[str]:
+        return _matching(self.get_hashes({sid for sid, _ in pairs}), pairs)
+
+    def upsert(self, stable_id: str, payload: dict[str, Any], content_hash: str) -> bool:
+        return self.upsert_many([(stable_id, payload, content_hash)])[0]
+
+    def upsert_many(self, records: list[StoredRecord]) -> list[bool]:
+        changed = []
+        for stable_id, payload, content_hash in records:
+            existing = self.records.get(stable_id)
+            if existing and existing["content_hash"] == content_hash:
+                changed.append(False)
+                continue
+            self.records[stable_id] = {"payload": payload, "content_hash": content_hash}
+            changed.append(True)
+        return changed
+
+
+class PostgresHashStore:
+    # One statement per batch: rows whose hash is unchanged are filtered by the conflict clause,
+    # so RETURNING lists exactly the inserted and updated ids.
+    UPSERT_SQL = """
+        insert into ingest_records (stable_id, content_hash, payload)
+        select stable_id, content_hash, payload::jsonb
+        from unnest(%s::text[], %s::text[], %s::text[]) as r(stable_id, content_hash, payload)
+        on conflict (stable_id) do update
+          set content_hash = excluded.content_hash, payload = excluded.payload, updated_at = now()
+          where ingest_records.content_hash is distinct from excluded.content_hash
+        returning stable_id
+    """
+
+    def get_hashes(self, stable_ids: Iterable[str]) -> dict[str, str]:
+        ids = list(stable_ids)
+        if not ids:
+            return {}
+        with get_conn() as conn, conn.cursor() as cur:
+            cur.execute("select stable_id, content_hash from ingest_records where stable_id = any(%s)", (ids,))
+            return {row["stable_id"]: row["content_hash"] for row in cur.fetchall()}
+
+    def unchanged(self, pairs: list[tuple[str, str]]) -> set[str]:
+        return _matching(self.get_hashes({sid for sid, _ in pairs}), pairs)
+
+    def upsert_many(self, records: list[StoredRecord]) -> list[bool]:
+        if not records:
+            return []
+        latest, within = _last_by_id(records)
+        rows = list(latest.values())
+        with get_conn() as conn, conn.cursor() as cur:
+            cur.execute(
+                self.UPSERT_SQL,
+                ([r[0] for r in rows], [r[2] for r in rows], [json.dumps(r[1], default=str) for r in rows]),
+            )
+            changed = {row["stable_id"] for row in cur.fetchall()}
+        return _merge(records, within, changed)
+
+
+class SQLiteHashStore:
+    # Local store for workers without database access. WAL mode lets several processes read
+    # while one writes; a lock serialises this process's threads on the shared connection.
+    def __init__(self, path: Path | str = INGEST_HASH_STORE_PATH) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("pragma journal_mode = wal")
+        self.conn.execute("pragma synchronous = normal")
+        self.conn.execute(
+            "create table if not exists ingest_records (stable_id text primary key, content_hash text not null, payload text not null, updated_at text not null default current_timestamp)"
+        )
+
+    def get_hashes(self, stable_ids: Iterable[str]) -> dict[str, str]:
+        ids = list(stable_ids)
+        found: dict[str, str] = {}
+        with self.lock:
+            for start in range(0, len(ids), SQLITE_BATCH):
+                part = ids[start : start + SQLITE_BATCH]
+                query = f"select stable_id, content_hash from ingest_records where stable_id in ({','.join('?' * len(part))})"
+                found.update(self.conn.execute(query, part).fetchall())
+        return found
+
+    def unchanged(self, pairs: list[tuple[str, str]]) -> set[str]:
+        return _matching(self.get_hashes({sid for sid, _ in pairs}), pairs)
+
+    def upsert_many(self, records: list[StoredRecord]) -> list[bool]:
+        if not records:
+            return []
+        latest, within = _last_by_id(records)
+        stored = self.get_hashes(latest)
+        changed = [r for sid, r in latest.items() if stored.get(sid) != r[2]]
+        with self.lock:
+            self.conn.execute("begin")
+            self.conn.executemany(
+                "insert into ingest_records (stable_id, content_hash, payload) values (?, ?, ?) "
+                "on conflict (stable_id) do update set content_hash = excluded.content_hash, payload = excluded.payload, updated_at = current_timestamp",
+                [(r[0], r[2], json.dumps(r[1], default=str)) for r in changed],
+            )
+            self.conn.execute("commit")
+        return _merge(records, within, {r[0] for r in changed})
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+class HashCache:
+    # stable_id -> 8-byte digest of the content hash (not the 64-char hex string), least recently
+    # used evicted first.
+    def __init__(self, max_entries: int = INGEST_HASH_CACHE_SIZE) -> None:
+        self.max_entries = max_entries
+        self.entries: OrderedDict[str, bytes] = OrderedDict()
+
+    @staticmethod
+    def digest(content_hash: str) -> bytes:
+        return hashlib.blake2b(content_hash.encode(), digest_size=8).digest()
+
+    def matches(self, stable_id: str, content_hash: str) -> bool:
+        digest = self.entries.get(stable_id)
+        if digest is None:
+            return False
+        self.entries.move_to_end(stable_id)
+        return digest == self.digest(content_hash)
+
+    def put(self, stable_id: str, content_hash: str) -> None:
+        self.entries[stable_id] = self.digest(content_hash)
+        self.entries.move_to_end(stable_id)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+
+class CachedHashStore:
+    # Records whose hash the cache already holds never reach the backend; everything else goes
+    # to the backend in one upsert_many call, and the cache learns the result either way.
+    def __init__(self, backend: HashStore, cache: HashCache | None = None) -> None:
+        self.backend = backend
+        self.cache = cache if cache is not None else HashCache()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.lookups = 0
+
+    def get_hashes(self, stable_ids: Iterable[str]) -> dict[str, str]:
+        return self.backend.get_hashes(stable_ids)
+
+    def unchanged(self, pairs: list[tuple[str, str]]) -> set[str]:
+        # Cache first; ids it does not vouch for are checked in one backend call, and matches found
+        # there are cached so the next run skips them without a lookup.
+        with self.lock:
+            known = {sid for sid, content_hash in pairs if self.cache.matches(sid, content_hash)}
+            self.hits += len(known)
+        rest = [(sid, content_hash) for sid, content_hash in pairs if sid not in known]
+        if not rest:
+            return known
+        found = self.backend.unchanged(rest)
+        with self.lock:
+            self.lookups += len(rest)
+            for sid, content_hash in rest:
+                if sid in found:
+                    self.cache.put(sid, content_hash)
+        return known | found
+
+    def upsert(self, stable_id: str, payload: dict[str, Any], content_hash: str) -> bool:
+        return self.upsert_many([(stable_id, payload, content_hash)])[0]
+
+    def upsert_many(self, records: list[StoredRecord]) -> list[bool]:
+        latest, within = _last_by_id(records)
+        with self.lock:
+            cached = {sid for sid, record in latest.items() if self.cache.matches(sid, record[2])}
+            self.hits += len(cached)
+            self.misses += len(latest) - len(cached)
+        pending = [record for sid, record in latest.items() if sid not in cached]
+        written = self.backend.upsert_many(pending)
+        with self.lock:
+            for record in pending:
+                self.cache.put(record[0], record[2])
+        return _merge(records, within, {record[0] for record, changed in zip(pending, written) if changed})
+
+    def stats(self) -> dict[str, Any]:
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "lookups": self.lookups, "hit_rate": round(self.hits / total, 4) if total else 0.0, "size": len(self.cache)}
+
+
+def open_hash_store(backend: str | None = None, path: Path | str | None = None) -> CachedHashStore:
+    kind = backend or INGEST_HASH_STORE
+    if kind == "postgres":
+        store: HashStore = PostgresHashStore()
+    elif kind == "sqlite":
+        store = SQLiteHashStore(path or INGEST_HASH_STORE_PATH)
+    elif kind == "memory":
+        store = InMemoryStore()
+    else:
+        raise ValueError(f"Unknown INGEST_HASH_STORE backend: {kind}")
+    return CachedHashStore(store)
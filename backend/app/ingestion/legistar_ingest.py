@@ -1,19 +1,27 @@
 from __future__ import annotations
 
 import os
-from dataclasses import dataclass
-from datetime import datetime
-from pathlib import Path
+from contextlib import closing
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from functools import partial
 from typing import Any
 
 import requests
 from dateutil.parser import parse as dt_parse
-from pypdf import PdfReader
 
-from app.db import create_job, get_conn, update_job
+from app.db import bump_generation, create_job, get_conn, update_job
+from app.ingestion.bulk_writer import BulkUpserter
+from app.ingestion.fetcher import FetchEngine
+from app.ingestion.matter_cache import MatterCache
+from app.ingestion.matter_versions import MatterVersion, build_version_rows, load_stored_versions
+from app.ingestion.progress import JobProgress
+from app.search.embeddings import embed_texts
+from app.search.semantic import agenda_item_key
+from app.storage.objects import OBJECT_STORAGE_PATH, ObjectStore, hold_ingest_lock
 
 LEGISTAR_BASE = os.getenv("LEGISTAR_BASE", "https://webapi.legistar.com/v1/whatcomwa")
-OBJECT_STORAGE_PATH = Path(os.getenv("OBJECT_STORAGE_PATH", "/tmp/wcc_objects"))
+DOWNLOAD_CHUNK_SIZE = 1 << 16
 
 
 @dataclass
@@ -24,6 +32,32 @@ class IngestResult:
     matters: int
     votes: int
     documents: int
+    matter_versions: int = 0
+
+
+@dataclass
+class DownloadResult:
+    path: str | None
+    sha256: str | None = None
+    size: int | None = None
+    etag: str | None = None
+    last_modified: str | None = None
+    unchanged: bool = False
+
+
+@dataclass
+class FetchedDocument:
+    title: str
+    file_url: str
+    result: DownloadResult
+
+
+@dataclass
+class EventBundle:
+    event: dict[str, Any]
+    items: list[dict[str, Any]]
+    matters: dict[int, dict[str, Any]] = field(default_factory=dict)
+    documents: list[FetchedDocument] = field(default_factory=list)
 
 
 def _paged_get(endpoint: str, params: dict[str, Any] | None = None, session: requests.Session | None = None) -> list[dict[str, Any]]:
@@ -49,64 +83,207 @@ def _paged_get(endpoint: str, params: dict[str, Any] | None = None, session: req
     return rows
 
 
-def _extract_pdf_text(path: Path) -> tuple[str, list[dict[str, int]]]:
-    try:
-        reader = PdfReader(str(path))
-    except Exception:
-        return "", []
-    text_parts: list[str] = []
-    citations: list[dict[str, int]] = []
-    for idx, page in enumerate(reader.pages, start=1):
-        content = page.extract_text() or ""
-        if content.strip():
-            text_parts.append(content)
-            citations.append({"page": idx, "line_start": 1, "line_end": min(8, len(content.splitlines()) or 1)})
-    return "\n\n".join(text_parts), citations
-
-
-def _download_document(url: str, key: str, session: requests.Session) -> tuple[str | None, str, list[dict[str, int]]]:
+def _download_document(url: str, store: ObjectStore, session: requests.Session, stored: dict[str, Any] | None = None) -> DownloadResult:
     if not url:
-        return None, "", []
-    OBJECT_STORAGE_PATH.mkdir(parents=True, exist_ok=True)
-    dest = OBJECT_STORAGE_PATH / f"{key}.pdf"
+        return DownloadResult(None)
+    stored = stored or {}
+    # Validators are only sent when there is a stored object a 304 can point at; otherwise the
+    # request is unconditional so the document is downloaded.
+    headers = {}
+    if stored.get("object_path") and stored.get("etag"):
+        headers["If-None-Match"] = stored["etag"]
+    if stored.get("object_path") and stored.get("last_modified"):
+        headers["If-Modified-Since"] = stored["last_modified"]
     try:
-        r = session.get(url, timeout=60)
-        if r.status_code != 200:
-            return None, "", []
-        dest.write_bytes(r.content)
-        text, citations = _extract_pdf_text(dest)
-        return str(dest), text, citations
+        with closing(session.get(url, timeout=60, stream=True, headers=headers)) as r:
+            if r.status_code == 304 and stored.get("object_path"):
+                return DownloadResult(stored["object_path"], sha256=stored.get("sha256"), etag=stored.get("etag"), last_modified=stored.get("last_modified"), unchanged=True)
+            if r.status_code != 200:
+                return DownloadResult(None)
+            blob = store.put_stream(r.iter_content(DOWNLOAD_CHUNK_SIZE))
+            etag, last_modified = r.headers.get("ETag"), r.headers.get("Last-Modified")
     except Exception:
-        return None, "", []
+        return DownloadResult(None)
+    # Documents stored before the content-addressed layout point at flat files; they are
+    # rewritten once so object_path and document_blobs follow the blob.
+    unchanged = blob.sha256 == stored.get("sha256") and stored.get("object_path") == str(blob.path)
+    return DownloadResult(str(blob.path), sha256=blob.sha256, size=blob.size, etag=etag, last_modified=last_modified, unchanged=unchanged)
 
 
-def run_legistar_ingest(mode: str, source: str = "whatcom_legistar_api", from_date: str | None = None, to_date: str | None = None, session: requests.Session | None = None) -> IngestResult:
-    sess = session or requests.Session()
+def _load_document_validators(cur: Any, meeting_ids: list[int]) -> dict[str, dict[str, Any]]:
+    cur.execute(
+        """
+        select id, object_path, raw->>'sha256' as sha256, raw->>'etag' as etag, raw->>'last_modified' as last_modified
+        from documents
+        where source_type = 'meeting' and source_id = any(%s)
+        """,
+        (meeting_ids,),
+    )
+    return {row["id"]: row for row in cur.fetchall()}
+
+
+def _and_filter(params: dict[str, Any], clause: str) -> None:
+    params["$filter"] = f"{params['$filter']} and {clause}" if params.get("$filter") else clause
+
+
+def _max_modified(rows: list[dict[str, Any]], field: str, current: str | None) -> str | None:
+    values = [value for value in (row.get(field) for row in rows) if value]
+    if current:
+        values.append(current)
+    return max(values, key=dt_parse) if values else None
+
+
+def _load_sync_state(source: str) -> dict[str, Any]:
+    with get_conn() as conn, conn.cursor() as cur:
+        cur.execute("select last_modified, matters_last_modified from source_sync_state where source = %s", (source,))
+        return cur.fetchone() or {}
+
+
+def _matter_row(matter: dict[str, Any]) -> tuple[Any, ...]:
+    return (
+        int(matter["MatterId"]),
+        matter.get("MatterFile"),
+        matter.get("MatterTypeName"),
+        matter.get("MatterName") or "Untitled Matter",
+        matter.get("MatterStatusName"),
+        dt_parse(matter["MatterIntroDate"]) if matter.get("MatterIntroDate") else None,
+        dt_parse(matter["MatterPassedDate"]) if matter.get("MatterPassedDate") else None,
+        matter,
+    )
+
+
+def _fetch_matter(matter_id: int, session: Any) -> dict[str, Any] | None:
+    rows = _paged_get(f"/matters/{matter_id}", session=session)
+    return rows[0] if rows else None
+
+
+def _fetch_matter_versions(matter_id: int, known_keys: set[str], session: Any) -> list[MatterVersion]:
+    fetched: list[MatterVersion] = []
+    for entry in _paged_get(f"/matters/{matter_id}/versions", session=session):
+        key = str(entry.get("Key") or "")
+        if not key or key in known_keys:
+            continue
+        texts = _paged_get(f"/matters/{matter_id}/texts/{key}", session=session)
+        text = texts[0] if texts else {}
+        fetched.append(MatterVersion(key=key, label=str(entry.get("Value") or key), text=text.get("MatterTextPlain") or "", raw=text))
+    return fetched
+
+
+def _write_matter_versions(cur: Any, writer: BulkUpserter, engine: FetchEngine, matter_ids: list[int]) -> int:
+    # Only versions not yet in matter_versions are fetched and diffed against their predecessor.
+    stored_versions = load_stored_versions(cur, matter_ids)
+    version_futures = {
+        matter_id: engine.submit(_fetch_matter_versions, matter_id, set(stored_versions.get(matter_id, {})), engine.session)
+        for matter_id in matter_ids
+    }
+    written = 0
+    for matter_id, future in version_futures.items():
+        version_rows = build_version_rows(matter_id, stored_versions.get(matter_id, {}), future.result())
+        for row in version_rows.versions:
+            writer.add("matter_versions", row)
+        for row in version_rows.change_events:
+            writer.add("change_events", row)
+        written += len(version_rows.versions)
+    return written
+
+
+def _fetch_event_bundle(
+    event: dict[str, Any], engine: FetchEngine, matter_cache: MatterCache, validators: dict[str, dict[str, Any]], store: ObjectStore
+) -> EventBundle:
+    meeting_id = int(event["EventId"])
+    doc_futures = [
+        (
+            title,
+            file_url,
+            engine.submit(_download_document, file_url, store, engine.session, validators.get(f"meeting:{meeting_id}:{title.lower()}")),
+        )
+        for title, file_url in (("Agenda", event.get("EventAgendaFile")), ("Minutes", event.get("EventMinutesFile")))
+        if file_url
+    ]
+    items = _paged_get(f"/events/{meeting_id}/EventItems", session=engine.session)
+    matter_ids = dict.fromkeys(int(item["EventItemMatterId"]) for item in items if item.get("EventItemMatterId"))
+    matter_futures = {matter_id: matter_cache.get(matter_id) for matter_id in matter_ids}
+
+    bundle = EventBundle(event=event, items=items)
+    for matter_id, future in matter_futures.items():
+        matter = future.result()
+        if matter:
+            bundle.matters[matter_id] = matter
+    for title, file_url, future in doc_futures:
+        bundle.documents.append(FetchedDocument(title, file_url, future.result()))
+    return bundle
+
+
+def run_legistar_ingest(
+    mode: str,
+    source: str = "whatcom_legistar_api",
+    from_date: str | None = None,
+    to_date: str | None = None,
+    session: requests.Session | None = None,
+    workers: int | None = None,
+    rate_limit: float | None = None,
+    batch_size: int | None = None,
+) -> IngestResult:
     job_id = create_job(source, mode)
+    engine = FetchEngine(session=session, workers=workers, rate_limit=rate_limit)
+    progress = JobProgress(job_id, update=update_job)
     try:
         params: dict[str, Any] = {}
         if from_date:
-            params["$filter"] = f"EventDate ge datetime'{from_date}T00:00:00'"
+            _and_filter(params, f"EventDate ge datetime'{from_date}T00:00:00'")
         if to_date:
-            right = f"EventDate le datetime'{to_date}T23:59:59'"
-            params["$filter"] = f"{params.get('$filter')} and {right}" if params.get("$filter") else right
+            _and_filter(params, f"EventDate le datetime'{to_date}T23:59:59'")
+
+        # Watermarks only move on unbounded runs: a --from/--to window says nothing about events
+        # outside it. Incremental runs with a watermark fetch only events and matters changed since.
+        bounded = bool(from_date or to_date)
+        state = _load_sync_state(source) if not bounded else {}
+        event_watermark = state.get("last_modified")
+        matter_watermark = state.get("matters_last_modified")
+        changed_matters: list[dict[str, Any]] = []
+        if mode == "incremental" and event_watermark:
+            _and_filter(params, f"EventLastModifiedUtc ge datetime'{event_watermark}'")
+        if mode == "incremental" and matter_watermark:
+            changed_matters = _paged_get(
+                "/matters", params={"$filter": f"MatterLastModifiedUtc ge datetime'{matter_watermark}'"}, session=engine.session
+            )
+        # The matter watermark only moves past matters a /matters query returned: matters fetched for
+        # an event say nothing about unreferenced matters changed before them. Without a watermark
+        # yet, it starts at the newest matter as of now, read before any event is fetched.
+        matter_marks = changed_matters
+        if not bounded and not matter_watermark:
+            matter_marks = _paged_get("/matters", params={"$top": 1, "$orderby": "MatterLastModifiedUtc desc"}, session=engine.session)
+
+        events = _paged_get("/events", params=params, session=engine.session)
+        progress.set_total(len(events))
 
-        events = _paged_get("/events", params=params, session=sess)
-        update_job(job_id, total_items=len(events))
+        meetings = agenda_items = matters = votes = documents = matter_versions = 0
+        embed_items: list[tuple[str, str]] = []
+        written_matters: list[int] = []
+        refreshed: list[tuple[str, str | None, str | None]] = []
 
-        meetings = agenda_items = matters = votes = documents = 0
+        # Fetches fan out across the engine's workers; this loop is the single writer and sees
+        # bundles in event order, so upserts and job progress stay sequential.
         with get_conn() as conn, conn.cursor() as cur:
-            for event in events:
+            # Taken before any download, so object GC can't remove a blob this run reuses.
+            hold_ingest_lock(cur)
+            matter_cache = MatterCache.load(cur, lambda matter_id: engine.submit(_fetch_matter, matter_id, engine.session))
+            matter_cache.prime(changed_matters)
+            validators = _load_document_validators(cur, [int(event["EventId"]) for event in events])
+            store = ObjectStore(OBJECT_STORAGE_PATH)
+            fetch_bundle = partial(_fetch_event_bundle, engine=engine, matter_cache=matter_cache, validators=validators, store=store)
+            writer = BulkUpserter(cur, batch_size=batch_size)
+            for matter in changed_matters:
+                if matter_cache.should_write(matter):
+                    writer.add("matters", _matter_row(matter))
+                    written_matters.append(int(matter["MatterId"]))
+                    matters += 1
+                    progress.advance("matters")
+            for bundle in engine.map_ordered(fetch_bundle, events):
+                event = bundle.event
                 meeting_id = int(event["EventId"])
-                cur.execute(
-                    """
-                    insert into meetings(id, title, body, meeting_date, location, status, agenda_file, minutes_file, raw)
-                    values (%s,%s,%s,%s,%s,%s,%s,%s,%s)
-                    on conflict(id) do update set
-                      title=excluded.title, body=excluded.body, meeting_date=excluded.meeting_date,
-                      location=excluded.location, status=excluded.status, agenda_file=excluded.agenda_file,
-                      minutes_file=excluded.minutes_file, raw=excluded.raw
-                    """,
+                writer.add(
+                    "meetings",
                     (
                         meeting_id,
                         event.get("EventBodyName") or "Whatcom County Council",
@@ -121,19 +298,11 @@ def run_legistar_ingest(mode: str, source: str = "whatcom_legistar_api", from_da
                 )
                 meetings += 1
 
-                event_items = _paged_get(f"/events/{meeting_id}/EventItems", session=sess)
-                for item in event_items:
+                for item in bundle.items:
                     item_id = int(item["EventItemId"])
                     matter_id = item.get("EventItemMatterId")
-                    cur.execute(
-                        """
-                        insert into agenda_items(id, meeting_id, matter_id, title, description, agenda_sequence, raw)
-                        values (%s,%s,%s,%s,%s,%s,%s)
-                        on conflict(id) do update set
-                         meeting_id=excluded.meeting_id, matter_id=excluded.matter_id,
-                         title=excluded.title, description=excluded.description,
-                         agenda_sequence=excluded.agenda_sequence, raw=excluded.raw
-                        """,
+                    writer.add(
+                        "agenda_items",
                         (
                             item_id,
                             meeting_id,
@@ -145,62 +314,117 @@ def run_legistar_ingest(mode: str, source: str = "whatcom_legistar_api", from_da
                         ),
                     )
                     agenda_items += 1
+                    embed_items.append((agenda_item_key(item_id), " ".join(filter(None, (item.get("EventItemTitle"), item.get("EventItemMatterName"))))))
 
-                    if matter_id:
-                        matter_rows = _paged_get(f"/matters/{matter_id}", session=sess)
-                        if matter_rows:
-                            matter = matter_rows[0]
-                            cur.execute(
-                                """
-                                insert into matters(id, file_no, matter_type, title, status, intro_date, passed_date, raw)
-                                values (%s,%s,%s,%s,%s,%s,%s,%s)
-                                on conflict(id) do update set
-                                 file_no=excluded.file_no, matter_type=excluded.matter_type, title=excluded.title,
-                                 status=excluded.status, intro_date=excluded.intro_date, passed_date=excluded.passed_date, raw=excluded.raw
-                                """,
-                                (
-                                    int(matter["MatterId"]),
-                                    matter.get("MatterFile"),
-                                    matter.get("MatterTypeName"),
-                                    matter.get("MatterName") or "Untitled Matter",
-                                    matter.get("MatterStatusName"),
-                                    dt_parse(matter["MatterIntroDate"]) if matter.get("MatterIntroDate") else None,
-                                    dt_parse(matter["MatterPassedDate"]) if matter.get("MatterPassedDate") else None,
-                                    matter,
-                                ),
-                            )
-                            matters += 1
-
-                for title, file_url in (("Agenda", event.get("EventAgendaFile")), ("Minutes", event.get("EventMinutesFile"))):
-                    if not file_url:
+                    matter = bundle.matters.get(int(matter_id)) if matter_id else None
+                    if matter and matter_cache.should_write(matter):
+                        writer.add("matters", _matter_row(matter))
+                        written_matters.append(int(matter["MatterId"]))
+                        matters += 1
+                        progress.advance("matters")
+
+                for doc in bundle.documents:
+                    result = doc.result
+                    documents += 1
+                    doc_id = f"meeting:{meeting_id}:{doc.title.lower()}"
+                    if result.unchanged:
+                        known = validators.get(doc_id) or {}
+                        if (result.etag, result.last_modified) != (known.get("etag"), known.get("last_modified")):
+                            refreshed.append((doc_id, result.etag, result.last_modified))
                         continue
-                    doc_id = f"meeting:{meeting_id}:{title.lower()}"
-                    path, text, citations = _download_document(file_url, doc_id.replace(':', '_'), sess)
-                    cur.execute(
-                        """
-                        insert into documents(id, source_type, source_id, title, file_url, object_path, text_content, citations, raw)
-                        values (%s,'meeting',%s,%s,%s,%s,%s,%s,%s)
-                        on conflict(id) do update set
-                          title=excluded.title, file_url=excluded.file_url, object_path=excluded.object_path,
-                          text_content=excluded.text_content, citations=excluded.citations, raw=excluded.raw
-                        """,
-                        (doc_id, meeting_id, f"{title} - {event.get('EventBodyName')}", file_url, path, text, citations, {"meeting_id": meeting_id}),
+                    raw = {"meeting_id": meeting_id, "sha256": result.sha256, "etag": result.etag, "last_modified": result.last_modified}
+                    # Text is filled in by the extraction stage (cw extract); until then the
+                    # document is searchable by title only.
+                    writer.add(
+                        "documents",
+                        (doc_id, "meeting", meeting_id, f"{doc.title} - {event.get('EventBodyName')}", doc.file_url, result.path, None, [], raw),
                     )
-                    documents += 1
+                    if result.path:
+                        now = datetime.now(timezone.utc)
+                        writer.add("blobs", (result.sha256, result.size))
+                        writer.add("document_blobs", (doc_id, result.sha256, now))
+                        writer.add("document_extract_queue", (doc_id, result.path, "pending", 0, None, now))
 
-                update_job(job_id, processed_items=meetings, failed_items=0)
+                progress.advance("events")
+                progress.advance("items", len(bundle.items))
+                progress.advance("documents", len(bundle.documents))
+                progress.record(**matter_cache.stats())
+                progress.maybe_flush()
 
+            # Matters whose MatterLastModifiedUtc moved may carry new text versions.
+            matter_versions = _write_matter_versions(cur, writer, engine, written_matters)
+
+            writer.flush()
+            if refreshed:
+                # Same bytes under new validators: only the validators move, so the next run's
+                # conditional request matches again.
+                cur.execute(
+                    """
+                    update documents d
+                    set raw = d.raw || jsonb_build_object('etag', v.etag, 'last_modified', v.last_modified)
+                    from unnest(%s::text[], %s::text[], %s::text[]) as v(id, etag, last_modified)
+                    where d.id = v.id
+                    """,
+                    ([r[0] for r in refreshed], [r[1] for r in refreshed], [r[2] for r in refreshed]),
+                )
+            # Same transaction as the rows above: the watermark only advances if they commit.
+            if not bounded:
+                event_watermark = _max_modified(events, "EventLastModifiedUtc", event_watermark)
+                matter_watermark = _max_modified(matter_marks, "MatterLastModifiedUtc", matter_watermark)
             cur.execute(
                 """
-                insert into source_sync_state(source, last_success_at)
-                values (%s, now())
-                on conflict(source) do update set last_success_at = excluded.last_success_at
+                insert into source_sync_state(source, last_success_at, last_modified, matters_last_modified)
+                values (%s, now(), %s, %s)
+                on conflict(source) do update set
+                  last_success_at = excluded.last_success_at,
+                  last_modified = coalesce(excluded.last_modified, source_sync_state.last_modified),
+                  matters_last_modified = coalesce(excluded.matters_last_modified, source_sync_state.matters_last_modified)
                 """,
-                (source,),
+                (source, None if bounded else event_watermark, None if bounded else matter_watermark),
             )
-        update_job(job_id, status="completed", message=f"Ingested {meetings} meetings")
+            bump_generation(cur)
+        # After commit: the vector index is not transactional, and a rerun re-embeds the same keys.
+        embed_texts([(key, text) for key, text in embed_items if text])
+        progress.flush(status="completed", message=f"Ingested {meetings} meetings")
     except Exception as exc:
-        update_job(job_id, status="failed", message=str(exc))
+        # Events the run never reached count as failed, so the job row shows how far it got.
+        progress.fail(max(progress.total_items - progress.stage_counts["events"] - progress.failed_items, 0))
+        progress.flush(status="failed", message=str(exc))
         raise
+    finally:
+        engine.close()
+
+    return IngestResult(
+        job_id=job_id, meetings=meetings, agenda_items=agenda_items, matters=matters, votes=votes, documents=documents, matter_versions=matter_versions
+    )
+
 
-    return IngestResult(job_id=job_id, meetings=meetings, agenda_items=agenda_items, matters=matters, votes=votes, documents=documents)
+def run_matter_version_backfill(
+    session: requests.Session | None = None,
+    workers: int | None = None,
+    rate_limit: float | None = None,
+    batch_size: int | None = None,
+    limit: int | None = None,
+) -> int:
+    # Text versions for stored matters that have none, e.g. ones ingested before versions were tracked.
+    engine = FetchEngine(session=session, workers=workers, rate_limit=rate_limit)
+    try:
+        with get_conn() as conn, conn.cursor() as cur:
+            cur.execute(
+                """
+                select m.id from matters m
+                where not exists (select 1 from matter_versions v where v.matter_id = m.id)
+                order by m.id
+                limit %s
+                """,
+                (limit,),
+            )
+            matter_ids = [int(row["id"]) for row in cur.fetchall()]
+            writer = BulkUpserter(cur, batch_size=batch_size)
+            written = _write_matter_versions(cur, writer, engine, matter_ids)
+            writer.flush()
+            if written:
+                bump_generation(cur)
+    finally:
+        engine.close()
+    return written
@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable
+
+import psycopg
+
+
+class MatterCache:
+    # Run scope: each matter id is fetched once no matter how many agendas reference it.
+    # Across runs: a fetched matter is only rewritten when its MatterLastModifiedUtc differs from
+    # the value stored in matters.raw. Every agenda reference counts as one hit or one miss.
+    def __init__(self, fetch: Callable[[int], Future[dict[str, Any] | None]], stored_modified: dict[int, str | None] | None = None) -> None:
+        self._fetch = fetch
+        self._stored_modified = stored_modified or {}
+        self._futures: dict[int, Future[dict[str, Any] | None]] = {}
+        self._written: set[int] = set()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def load(cls, cur: psycopg.Cursor, fetch: Callable[[int], Future[dict[str, Any] | None]]) -> MatterCache:
+        cur.execute("select id, raw->>'MatterLastModifiedUtc' as last_modified from matters")
+        return cls(fetch, {int(row["id"]): row["last_modified"] for row in cur.fetchall()})
+
+    def get(self, matter_id: int) -> Future[dict[str, Any] | None]:
+        with self._lock:
+            future = self._futures.get(matter_id)
+            if future is None:
+                future = self._futures[matter_id] = self._fetch(matter_id)
+            return future
+
+    def prime(self, matters: list[dict[str, Any]]) -> None:
+        with self._lock:
+            for matter in matters:
+                future: Future[dict[str, Any] | None] = Future()
+                future.set_result(matter)
+                self._futures[int(matter["MatterId"])] = future
+
+    def should_write(self, matter: dict[str, Any]) -> bool:
+        matter_id = int(matter["MatterId"])
+        modified = matter.get("MatterLastModifiedUtc")
+        with self._lock:
+            if matter_id in self._written or (modified is not None and self._stored_modified.get(matter_id) == modified):
+                self.hits += 1
+                return False
+            self._written.add(matter_id)
+            self.misses += 1
+            return True
+
+    def stats(self) -> dict[str, int]:
+        return {"matter_cache_hits": self.hits, "matter_cache_misses": self.misses}
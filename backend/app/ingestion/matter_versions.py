@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass, field
+from typing import Any
+
+import psycopg
+
+from app.analysis.sections import parse_sections
+from app.analysis.semantic_diff import ClauseChange, semantic_diff
+
+
+@dataclass
+class MatterVersion:
+    key: str
+    label: str
+    text: str | None = None
+    raw: dict[str, Any] = field(default_factory=dict)
+    sections: list[dict[str, Any]] | None = None
+    seq: int | None = None
+
+
+@dataclass
+class VersionRows:
+    versions: list[tuple[Any, ...]] = field(default_factory=list)
+    change_events: list[tuple[Any, ...]] = field(default_factory=list)
+
+
+def version_order(label: str) -> tuple[int, Any]:
+    return (0, int(label)) if re.fullmatch(r"\d+", label or "") else (1, label or "")
+
+
+def load_stored_versions(cur: psycopg.Cursor, matter_ids: list[int]) -> dict[int, dict[str, MatterVersion]]:
+    if not matter_ids:
+        return {}
+    cur.execute("select matter_id, version_key, version_label, seq, sections from matter_versions where matter_id = any(%s)", (matter_ids,))
+    stored: dict[int, dict[str, MatterVersion]] = {}
+    for row in cur.fetchall():
+        stored.setdefault(int(row["matter_id"]), {})[row["version_key"]] = MatterVersion(
+            key=row["version_key"], label=row["version_label"], sections=row["sections"], seq=row["seq"]
+        )
+    return stored
+
+
+def _citation(section: dict[str, Any] | None, label: str) -> list[dict[str, Any]]:
+    if not section:
+        return []
+    return [{"version": label, "line_start": section["line_start"], "line_end": section["line_end"]}]
+
+
+def _summary(change: ClauseChange) -> str:
+    if change.change_type == "moved":
+        return f"Section {change.old_clause_id} moved to {change.clause_id}"
+    if change.change_type == "moved_modified":
+        return f"Section {change.old_clause_id} moved to {change.clause_id} and modified ({change.similarity:.0%} similar)"
+    return f"Section {change.clause_id} {change.change_type}"
+
+
+def build_version_rows(matter_id: int, stored: dict[str, MatterVersion], fetched: list[MatterVersion]) -> VersionRows:
+    # New versions are numbered after the highest stored seq (in label order among themselves), so
+    # stored rows and their change events never need renumbering. Each new version is diffed once,
+    # against the version before it in seq; earlier versions' sections come from matter_versions.
+    for version in fetched:
+        version.sections = [s.to_dict() for s in parse_sections(version.text or "")]
+    previous = max(stored.values(), key=lambda v: v.seq or 0, default=None)
+    seq = (previous.seq or 0) if previous else 0
+    rows = VersionRows()
+    for version in sorted((v for v in fetched if v.key not in stored), key=lambda v: version_order(v.label)):
+        seq += 1
+        version.seq = seq
+        rows.versions.append(
+            (f"{matter_id}:{version.key}", matter_id, version.key, version.label, seq, version.text, version.sections, version.raw)
+        )
+        if previous is None:
+            previous = version
+            continue
+        old = {s["id"]: s for s in previous.sections or []}
+        new = {s["id"]: s for s in version.sections or []}
+        changes = semantic_diff({k: s["text"] for k, s in old.items()}, {k: s["text"] for k, s in new.items()})
+        document_id = f"matter:{matter_id}:v{version.key}"
+        for n, change in enumerate(changes):
+            cited = _citation(old.get(change.clause_id), previous.label) if change.change_type == "removed" else _citation(new.get(change.clause_id), version.label)
+            rows.change_events.append(
+                (
+                    f"{matter_id}:{previous.key}:{version.key}:{n}",
+                    matter_id,
+                    document_id,
+                    previous.label,
+                    version.label,
+                    seq,
+                    change.clause_id,
+                    change.change_type,
+                    _summary(change),
+                    change.old_text,
+                    change.new_text,
+                    cited,
+                )
+            )
+        previous = version
+    return rows
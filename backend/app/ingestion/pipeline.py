@@ -1,13 +1,45 @@
 from __future__ import annotations
 
+import math
+import os
+import threading
+import time
+from collections import Counter, defaultdict
 from dataclasses import dataclass, field
 from datetime import datetime
-from typing import Any
+from functools import lru_cache
+from pathlib import Path
+from queue import Empty, Full, Queue
+from typing import Any, Callable
 
-from pydantic import ValidationError
+from pydantic import TypeAdapter, ValidationError
 
+from app.ingestion.adapters.gis import GISAdapter
+from app.ingestion.adapters.legistar_api import LegistarAPIAdapter
+from app.ingestion.adapters.legistar_html import LegistarHTMLFallbackAdapter
+from app.ingestion.adapters.rss import RSSAdapter
 from app.ingestion.base import NormalizedRecord, SourceAdapter
-from app.models.entities import AgendaItem, Document, Meeting, NewsItem
+from app.ingestion.config import SourceConfig, load_sources_config
+from app.ingestion.hash_store import HashStore, InMemoryStore
+from app.ingestion.progress import LatencyHistogram
+from app.models.entities import AgendaItem, BaseEntity, Document, Meeting, NewsItem
+
+SOURCES_CONFIG_PATH = Path(os.getenv("SOURCES_CONFIG_PATH", str(Path(__file__).resolve().parents[3] / "config" / "sources.yaml")))
+PIPELINE_FETCH_WORKERS = int(os.getenv("PIPELINE_FETCH_WORKERS", "16"))
+PIPELINE_PARSE_WORKERS = int(os.getenv("PIPELINE_PARSE_WORKERS", "2"))
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "100"))
+PIPELINE_SOURCE_TIMEOUT = float(os.getenv("PIPELINE_SOURCE_TIMEOUT_SECONDS", "300"))
+PIPELINE_WRITE_BATCH = int(os.getenv("PIPELINE_WRITE_BATCH", "500"))
+PIPELINE_LOOKUP_BACKOFF = int(os.getenv("PIPELINE_LOOKUP_BACKOFF", "8"))
+PIPELINE_STAGES = ("discover", "fetch", "parse", "validate")
+_POLL_SECONDS = 0.05
+
+ENTITY_MODELS: dict[str, type[BaseEntity]] = {
+    "meeting": Meeting,
+    "agenda_item": AgendaItem,
+    "document": Document,
+    "news_item": NewsItem,
+}
 
 
 @dataclass
@@ -18,63 +50,341 @@ class QuarantineRecord:
     timestamp: datetime
 
 
+class IngestionPipeline:
+    # Without a store, hashes live only as long as the pipeline. cw sources passes a persistent one
+    # (open_hash_store, Postgres by default) so a restarted process still recognises accepted records.
+    def __init__(self, store: HashStore | None = None) -> None:
+        self.store: HashStore = store if store is not None else InMemoryStore()
+        self.quarantine: list[QuarantineRecord] = []
+        self._lookup_backoff = 0
+
+    def run_adapter(self, adapter: SourceAdapter) -> dict[str, int]:
+        # Unlike run_adapters, which reports stage failures per source, the first one is re-raised
+        # once the adapter's remaining items have been processed.
+        execution = _PipelineRun(
+            self, {adapter.source_id: adapter}, {adapter.source_id: math.inf}, PIPELINE_FETCH_WORKERS, PIPELINE_PARSE_WORKERS, PIPELINE_QUEUE_SIZE
+        )
+        counts = execution.run()["sources"][adapter.source_id]
+        error = execution.sources[adapter.source_id].error
+        if error is not None:
+            raise error
+        return {"inserted": counts["inserted"], "duplicates": counts["duplicates"], "errors": counts["errors"]}
+
+    def run_sources(
+        self, config_path: str | Path = SOURCES_CONFIG_PATH, only: set[str] | None = None, **options: Any
+    ) -> dict[str, Any]:
+        adapters: dict[str, SourceAdapter] = {}
+        timeouts: dict[str, float] = {}
+        skipped: list[str] = []
+        for source in load_sources_config(config_path).sources:
+            if not source.enabled or (only and source.id not in only):
+                continue
+            adapter = build_adapter(source)
+            if adapter is None:
+                skipped.append(source.id)
+                continue
+            adapters[source.id] = adapter
+            timeouts[source.id] = source.timeout_seconds or PIPELINE_SOURCE_TIMEOUT
+        return self.run_adapters(adapters, timeouts=timeouts, **options) | {"skipped": skipped}
+
+    def run_adapters(
+        self,
+        adapters: dict[str, SourceAdapter],
+        timeouts: dict[str, float] | None = None,
+        fetch_workers: int | None = None,
+        parse_workers: int | None = None,
+        queue_size: int | None = None,
+    ) -> dict[str, Any]:
+        return _PipelineRun(
+            self,
+            adapters,
+            timeouts or {},
+            fetch_workers or PIPELINE_FETCH_WORKERS,
+            parse_workers or PIPELINE_PARSE_WORKERS,
+            queue_size or PIPELINE_QUEUE_SIZE,
+        ).run()
+
+    def _store_many(self, records: list[NormalizedRecord]) -> list[str]:
+        # -> "inserted", "duplicates" or "errors" per record. Records whose hash the store already
+        # holds are duplicates without being validated; the rest are validated in one batch per
+        # record type and the valid ones written in one upsert_many.
+        skipped = self._unchanged(records)
+        pending = [record for record in records if record.stable_id not in skipped]
+        invalid = self._invalid(pending)
+        for index in sorted(invalid):
+            record = pending[index]
+            self.quarantine.append(
+                QuarantineRecord(stable_id=record.stable_id, reason=invalid[index], payload=record.payload, timestamp=datetime.utcnow())
+            )
+        valid = [record for index, record in enumerate(pending) if index not in invalid]
+        flags = self.store.upsert_many([(r.stable_id, r.payload, r.content_hash) for r in valid])
+        if self._lookup_backoff and not all(flags):
+            # Stored hashes are coming back (a re-run): look them up again from the next batch.
+            self._lookup_backoff = 0
+        changed = iter(flags)
+        written = iter(["errors" if index in invalid else "inserted" if next(changed) else "duplicates" for index in range(len(pending))])
+        return ["duplicates" if record.stable_id in skipped else next(written) for record in records]
+
+    def _unchanged(self, records: list[NormalizedRecord]) -> set[str]:
+        # A lookup that finds nothing (a first run, a new source) is not repeated for the next
+        # PIPELINE_LOOKUP_BACKOFF batches: those are validated and written, and upsert_many still
+        # reports their unchanged records as duplicates.
+        if self._lookup_backoff:
+            self._lookup_backoff -= 1
+            return set()
+        # An id that appears with different hashes in one batch is never skipped: the later
+        # occurrence must still be written even if the earlier one matches the store.
+        hashes: dict[str, str | None] = {}
+        for record in records:
+            seen = hashes.setdefault(record.stable_id, record.content_hash)
+            if seen != record.content_hash:
+                hashes[record.stable_id] = None
+        unchanged = self.store.unchanged([(sid, content_hash) for sid, content_hash in hashes.items() if content_hash is not None])
+        if not unchanged:
+            self._lookup_backoff = PIPELINE_LOOKUP_BACKOFF
+        return unchanged
+
+    def _invalid(self, records: list[NormalizedRecord]) -> dict[int, str]:
+        # -> {index: reason}. A failed batch is narrowed to its failing items by the error
+        # locations, which are re-validated alone so the reason reads as for a single record.
+        groups: dict[str, list[int]] = defaultdict(list)
+        for index, record in enumerate(records):
+            if record.record_type in ENTITY_MODELS:
+                groups[record.record_type].append(index)
+        invalid: dict[int, str] = {}
+        for record_type, indices in groups.items():
+            try:
+                _batch_adapter(record_type).validate_python([_entity_input(records[i]) for i in indices], from_attributes=True)
+            except ValidationError as exc:
+                for position in sorted({error["loc"][0] for error in exc.errors(include_url=False)}):
+                    try:
+                        self._validate(records[indices[position]])
+                    except ValidationError as single:
+                        invalid[indices[position]] = str(single)
+        return invalid
+
+    def _validate(self, record: NormalizedRecord) -> None:
+        model = ENTITY_MODELS.get(record.record_type)
+        if model is not None:
+            model.model_validate(_entity_input(record), from_attributes=True)
+
+
+@lru_cache(maxsize=None)
+def _batch_adapter(record_type: str) -> TypeAdapter[list[BaseEntity]]:
+    return TypeAdapter(list[ENTITY_MODELS[record_type]])  # type: ignore[index]
+
+
+def _entity_input(record: NormalizedRecord) -> dict[str, Any]:
+    # Provenance is read straight off the record's attributes (from_attributes) instead of a
+    # per-record dict.
+    return {**record.payload, "canonical_url": record.canonical_url, "provenance": record}
+
+
+def build_adapter(source: SourceConfig) -> SourceAdapter | None:
+    url = str(source.base_url)
+    adapter: SourceAdapter
+    if source.kind == "legistar":
+        adapter = LegistarAPIAdapter(url) if source.extraction_hints.mode == "api" else LegistarHTMLFallbackAdapter(url)
+    elif source.kind == "rss":
+        adapter = RSSAdapter(url, source.name)
+    elif source.kind in ("gis", "zoning"):
+        adapter = GISAdapter(url, source.id)
+    else:
+        return None
+    adapter.source_id = source.id
+    return adapter
+
+
 @dataclass
-class InMemoryStore:
-    records: dict[str, dict[str, Any]] = field(default_factory=dict)
+class _SourceRun:
+    adapter: SourceAdapter
+    started: float
+    deadline: float
+    counts: Counter[str] = field(default_factory=Counter)
+    failures: Counter[str] = field(default_factory=Counter)
+    last_error: str | None = None
+    error: Exception | None = None
+    outstanding: int = 0
+    discovered: bool = False
+    timed_out: bool = False
+    finished: float | None = None
 
-    def upsert(self, stable_id: str, payload: dict[str, Any], content_hash: str) -> bool:
-        existing = self.records.get(stable_id)
-        if existing and existing["content_hash"] == content_hash:
-            return False
-        self.records[stable_id] = {"payload": payload, "content_hash": content_hash}
-        return True
+    @property
+    def active(self) -> bool:
+        return self.finished is None
 
 
-class IngestionPipeline:
-    def __init__(self) -> None:
-        self.store = InMemoryStore()
-        self.quarantine: list[QuarantineRecord] = []
+class _PipelineRun:
+    # discover (one thread per source) -> fetch (wide, I/O bound) -> parse (narrow, CPU bound) ->
+    # validate (a single writer, so the store and quarantine need no locking). Stages are joined by
+    # bounded queues, so a fast discover blocks instead of buffering a whole source in memory.
+    # Each source counts its in-flight items; it finishes when discovery is done and the count
+    # reaches zero, or when its deadline passes, after which its remaining items are dropped.
+    # Threads are daemons: a worker stuck in a timed-out source's I/O is not waited for.
+    def __init__(
+        self,
+        pipeline: IngestionPipeline,
+        adapters: dict[str, SourceAdapter],
+        timeouts: dict[str, float],
+        fetch_workers: int,
+        parse_workers: int,
+        queue_size: int,
+    ) -> None:
+        self.pipeline = pipeline
+        now = time.monotonic()
+        self.sources = {
+            source_id: _SourceRun(adapter, now, now + timeouts.get(source_id, PIPELINE_SOURCE_TIMEOUT)) for source_id, adapter in adapters.items()
+        }
+        self.queues: dict[str, Queue[tuple[str, Any]]] = {stage: Queue(max(1, queue_size)) for stage in PIPELINE_STAGES[1:]}
+        self.workers = {"fetch": max(1, fetch_workers), "parse": max(1, parse_workers), "validate": 1}
+        self.histograms = {stage: LatencyHistogram() for stage in PIPELINE_STAGES}
+        self.condition = threading.Condition()
+        self.stop = threading.Event()
+        self.handlers: dict[str, Callable[[_SourceRun, Any], list[Any]]] = {
+            "fetch": lambda run, item: [run.adapter.fetch(item)],
+            "parse": lambda run, raw: list(run.adapter.link(run.adapter.parse(raw))),
+        }
 
-    def run_adapter(self, adapter: SourceAdapter) -> dict[str, int]:
-        inserted = 0
-        duplicates = 0
-        errors = 0
-        for item in adapter.discover():
-            raw = adapter.fetch(item)
-            records = adapter.link(adapter.parse(raw))
-            for record in records:
+    def run(self) -> dict[str, Any]:
+        started = time.monotonic()
+        threads = [threading.Thread(target=self._discover, args=(source_id,), daemon=True) for source_id in self.sources]
+        workers = [
+            threading.Thread(target=self._work, args=(stage,), daemon=True) for stage, count in self.workers.items() for _ in range(count)
+        ]
+        writer = workers[-1]
+        for thread in threads + workers:
+            thread.start()
+        with self.condition:
+            while True:
+                now = time.monotonic()
+                active = [run for run in self.sources.values() if run.active]
+                for run in active:
+                    if now >= run.deadline:
+                        run.timed_out, run.finished = True, now
+                active = [run for run in active if run.active]
+                if not active:
+                    break
+                self.condition.wait(timeout=min(min(run.deadline for run in active) - now, 1.0))
+        self.stop.set()
+        # The single writer is joined so the store is not touched after run() returns.
+        writer.join()
+        return self._summary(time.monotonic() - started)
+
+    def _observe(self, stage: str, seconds: float) -> None:
+        with self.condition:
+            self.histograms[stage].observe(seconds)
+
+    def _fail(self, run: _SourceRun, stage: str, exc: Exception) -> None:
+        with self.condition:
+            run.failures[stage] += 1
+            run.last_error = f"{stage}: {exc or type(exc).__name__}"
+            if run.error is None:
+                run.error = exc
+
+    def _settle(self, run: _SourceRun, delta: int) -> None:
+        with self.condition:
+            run.outstanding += delta
+            if run.active and run.discovered and run.outstanding <= 0:
+                run.finished = time.monotonic()
+                self.condition.notify_all()
+
+    def _put(self, stage: str, run: _SourceRun, source_id: str, payload: Any) -> bool:
+        # Blocks while the next stage is full (backpressure); gives up once the source is over.
+        while run.active and not self.stop.is_set():
+            try:
+                self.queues[stage].put((source_id, payload), timeout=_POLL_SECONDS)
+                return True
+            except Full:
+                continue
+        return False
+
+    def _forward(self, stage: str, run: _SourceRun, source_id: str, outputs: list[Any]) -> None:
+        # Outputs are counted before they are queued, so the source cannot look finished while
+        # they are in flight.
+        self._settle(run, len(outputs))
+        for payload in outputs:
+            if not self._put(stage, run, source_id, payload):
+                self._settle(run, -1)
+
+    def _discover(self, source_id: str) -> None:
+        run = self.sources[source_id]
+        started = time.monotonic()
+        try:
+            items = list(run.adapter.discover())
+        except Exception as exc:
+            items = []
+            self._fail(run, "discover", exc)
+        self._observe("discover", time.monotonic() - started)
+        self._forward("fetch", run, source_id, items)
+        with self.condition:
+            run.discovered = True
+        self._settle(run, 0)
+
+    def _work(self, stage: str) -> None:
+        queue = self.queues[stage]
+        while not self.stop.is_set():
+            try:
+                batch = [queue.get(timeout=_POLL_SECONDS)]
+            except Empty:
+                continue
+            if stage == "validate":
+                # The writer drains whatever is queued so the store sees one upsert_many per batch.
+                while len(batch) < PIPELINE_WRITE_BATCH:
+                    try:
+                        batch.append(queue.get_nowait())
+                    except Empty:
+                        break
+                self._write(batch)
+                continue
+            source_id, payload = batch[0]
+            run = self.sources[source_id]
+            if run.active:
+                started = time.monotonic()
                 try:
-                    self._validate(record)
-                    changed = self.store.upsert(record.stable_id, record.payload, record.content_hash)
-                    inserted += 1 if changed else 0
-                    duplicates += 0 if changed else 1
-                except ValidationError as exc:
-                    errors += 1
-                    self.quarantine.append(
-                        QuarantineRecord(
-                            stable_id=record.stable_id,
-                            reason=str(exc),
-                            payload=record.payload,
-                            timestamp=datetime.utcnow(),
-                        )
-                    )
-        return {"inserted": inserted, "duplicates": duplicates, "errors": errors}
+                    outputs = self.handlers[stage](run, payload)
+                except Exception as exc:
+                    outputs = []
+                    self._fail(run, stage, exc)
+                self._observe(stage, time.monotonic() - started)
+                if run.active:
+                    self._forward(PIPELINE_STAGES[PIPELINE_STAGES.index(stage) + 1], run, source_id, outputs)
+            self._settle(run, -1)
 
-    def _validate(self, record: NormalizedRecord) -> None:
-        if record.record_type == "meeting":
-            Meeting.model_validate(record.payload | {"canonical_url": record.canonical_url, "provenance": self._prov(record)})
-        elif record.record_type == "agenda_item":
-            AgendaItem.model_validate(record.payload | {"canonical_url": record.canonical_url, "provenance": self._prov(record)})
-        elif record.record_type == "document":
-            Document.model_validate(record.payload | {"canonical_url": record.canonical_url, "provenance": self._prov(record)})
-        elif record.record_type == "news_item":
-            NewsItem.model_validate(record.payload | {"canonical_url": record.canonical_url, "provenance": self._prov(record)})
-
-    @staticmethod
-    def _prov(record: NormalizedRecord) -> dict[str, Any]:
+    def _write(self, batch: list[tuple[str, NormalizedRecord]]) -> None:
+        # Validate histogram observations are per written batch.
+        live = [(self.sources[source_id], record) for source_id, record in batch if self.sources[source_id].active]
+        if live:
+            started = time.monotonic()
+            try:
+                statuses = self.pipeline._store_many([record for _, record in live])
+            except Exception as exc:
+                statuses = []
+                for run in {id(run): run for run, _ in live}.values():
+                    self._fail(run, "validate", exc)
+            self._observe("validate", time.monotonic() - started)
+            for (run, _), status in zip(live, statuses):
+                run.counts[status] += 1
+        for source_id, _ in batch:
+            self._settle(self.sources[source_id], -1)
+
+    def _summary(self, elapsed: float) -> dict[str, Any]:
+        sources = {
+            source_id: {
+                "inserted": run.counts["inserted"],
+                "duplicates": run.counts["duplicates"],
+                "errors": run.counts["errors"],
+                "failures": dict(run.failures),
+                "last_error": run.last_error,
+                "timed_out": run.timed_out,
+                "dropped": max(run.outstanding, 0) if run.timed_out else 0,
+                "elapsed_ms": round(((run.finished or time.monotonic()) - run.started) * 1000, 3),
+            }
+            for source_id, run in self.sources.items()
+        }
         return {
-            "source_id": record.source_id,
-            "content_hash": record.content_hash,
-            "retrieved_at": record.retrieved_at,
-            "robots_policy": record.robots_policy,
+            "sources": sources,
+            "totals": {key: sum(s[key] for s in sources.values()) for key in ("inserted", "duplicates", "errors")},
+            "stages": {stage: histogram.to_dict() for stage, histogram in self.histograms.items()},
+            "workers": dict(self.workers),
+            "elapsed_ms": round(elapsed * 1000, 3),
         }
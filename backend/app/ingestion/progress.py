@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+import os
+import time
+from typing import Any, Callable
+
+from app.db import update_job
+
+PROGRESS_FLUSH_SECONDS = float(os.getenv("INGEST_PROGRESS_FLUSH_SECONDS", "5"))
+PROGRESS_FLUSH_ITEMS = int(os.getenv("INGEST_PROGRESS_FLUSH_ITEMS", "50"))
+
+STAGES = ("events", "items", "matters", "documents")
+
+
+class JobProgress:
+    # Coalesces ingest_jobs counter updates in memory and writes them out at most once per
+    # ``flush_seconds`` or ``flush_items`` processed events, whichever comes first. "events" is
+    # the primary stage: it drives processed_items and the ETA.
+    def __init__(
+        self,
+        job_id: int,
+        update: Callable[..., None] = update_job,
+        flush_seconds: float | None = None,
+        flush_items: int | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.job_id = job_id
+        self.update = update
+        self.flush_seconds = PROGRESS_FLUSH_SECONDS if flush_seconds is None else flush_seconds
+        self.flush_items = max(1, flush_items or PROGRESS_FLUSH_ITEMS)
+        self.clock = clock
+        self.total_items = 0
+        self.failed_items = 0
+        self.stage_counts: dict[str, int] = dict.fromkeys(STAGES, 0)
+        self.extra: dict[str, Any] = {}
+        self._started = clock()
+        self._last_flush = self._started
+        self._unflushed = 0
+
+    def set_total(self, total_items: int) -> None:
+        self.total_items = total_items
+        self.update(self.job_id, total_items=total_items)
+
+    def advance(self, stage: str, count: int = 1) -> None:
+        self.stage_counts[stage] += count
+        if stage == "events":
+            self._unflushed += count
+
+    def fail(self, count: int = 1) -> None:
+        self.failed_items += count
+        self._unflushed += count
+
+    def record(self, **fields: Any) -> None:
+        self.extra.update(fields)
+
+    def throughput(self) -> dict[str, float]:
+        elapsed = max(self.clock() - self._started, 1e-6)
+        return {stage: round(count / elapsed, 3) for stage, count in self.stage_counts.items()}
+
+    def eta_seconds(self) -> int | None:
+        done = self.stage_counts["events"] + self.failed_items
+        if not self.total_items or not done:
+            return None
+        rate = done / max(self.clock() - self._started, 1e-6)
+        return int(max(self.total_items - done, 0) / rate)
+
+    def maybe_flush(self) -> None:
+        if self._unflushed >= self.flush_items or self.clock() - self._last_flush >= self.flush_seconds:
+            self.flush()
+
+    def flush(self, **fields: Any) -> None:
+        self.update(
+            self.job_id,
+            processed_items=self.stage_counts["events"],
+            failed_items=self.failed_items,
+            stage_counts=dict(self.stage_counts),
+            throughput=self.throughput(),
+            eta_seconds=self.eta_seconds(),
+            **self.extra,
+            **fields,
+        )
+        self._last_flush = self.clock()
+        self._unflushed = 0
+
+
+LATENCY_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+
+class LatencyHistogram:
+    # Fixed millisecond buckets; "le" counts are per bucket (not cumulative), with "+Inf" for the rest.
+    # Quantiles are the upper bound of the bucket that contains them.
+    def __init__(self, buckets: tuple[float, ...] = LATENCY_BUCKETS_MS) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe(self, seconds: float) -> None:
+        ms = seconds * 1000
+        index = next((i for i, bound in enumerate(self.buckets) if ms <= bound), len(self.buckets))
+        self.counts[index] += 1
+        self.count += 1
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+
+    def quantile(self, q: float) -> float | None:
+        if not self.count:
+            return None
+        target, seen = q * self.count, 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return float(self.buckets[index]) if index < len(self.buckets) else round(self.max_ms, 3)
+        return round(self.max_ms, 3)
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total_ms / self.count, 3) if self.count else None,
+            "max_ms": round(self.max_ms, 3),
+            "p50_ms": self.quantile(0.5),
+            "p95_ms": self.quantile(0.95),
+            "buckets": {**{str(bound): n for bound, n in zip(self.buckets, self.counts)}, "+Inf": self.counts[-1]},
+        }
@@ -4,12 +4,14 @@ import os
 import threading
 import time
 
+from app.ingestion.extraction import run_extraction
 from app.ingestion.legistar_ingest import run_legistar_ingest
 
 
 def run_once() -> dict[str, int]:
     result = run_legistar_ingest(mode='incremental', source='whatcom_legistar_api')
-    return result.__dict__
+    extraction = run_extraction()
+    return result.__dict__ | {'extracted': extraction.processed, 'extract_failed': extraction.failed}
 
 
 def start_background_scheduler() -> None:
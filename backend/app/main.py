@@ -4,7 +4,7 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.api.routes import router
-from app.db import init_db
+from app.db import close_pool, init_db
 
 app = FastAPI(title='Whatcom Civic Watch')
 
@@ -22,4 +22,9 @@ def startup() -> None:
     init_db()
 
 
+@app.on_event('shutdown')
+def shutdown() -> None:
+    close_pool()
+
+
 app.include_router(router, prefix='/api')
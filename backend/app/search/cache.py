@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime
+from typing import Any, Callable, Protocol
+
+import psycopg
+from psycopg.types.json import Jsonb
+
+from app.db import DB_STATEMENT_TIMEOUT_MS, get_conn
+
+SEARCH_CACHE_SIZE = int(os.getenv("SEARCH_CACHE_SIZE", "512"))
+SEARCH_CACHE_TTL = float(os.getenv("SEARCH_CACHE_TTL_SECONDS", "300"))
+SEARCH_CACHE_BACKEND = os.getenv("SEARCH_CACHE_BACKEND", "memory")
+
+
+class CacheBackend(Protocol):
+    def get(self, key: str, generation: int) -> Any | None: ...
+
+    def set(self, key: str, generation: int, value: Any, ttl: float) -> None: ...
+
+
+def _json_default(value: Any) -> str:
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+class PostgresCacheBackend:
+    # Shared across API workers through the unlogged search_cache table; bump_generation prunes it.
+    def get(self, key: str, generation: int) -> Any | None:
+        with get_conn(DB_STATEMENT_TIMEOUT_MS) as conn, conn.cursor() as cur:
+            cur.execute("select value from search_cache where key = %s and generation = %s and expires_at > now()", (key, generation))
+            row = cur.fetchone()
+        return row["value"] if row else None
+
+    def set(self, key: str, generation: int, value: Any, ttl: float) -> None:
+        payload = Jsonb(value, dumps=lambda obj: json.dumps(obj, default=_json_default))
+        with get_conn(DB_STATEMENT_TIMEOUT_MS) as conn, conn.cursor() as cur:
+            cur.execute(
+                """
+                insert into search_cache(key, generation, value, expires_at)
+                values (%s, %s, %s, now() + make_interval(secs => %s))
+                on conflict(key) do update set generation = excluded.generation, value = excluded.value, expires_at = excluded.expires_at
+                """,
+                (key, generation, payload, ttl),
+            )
+
+
+class SearchCache:
+    # In-process LRU with a TTL; entries are only valid for the data generation they were built from.
+    def __init__(
+        self,
+        max_entries: int = SEARCH_CACHE_SIZE,
+        ttl: float = SEARCH_CACHE_TTL,
+        backend: CacheBackend | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.backend = backend
+        self._clock = clock
+        self._entries: OrderedDict[str, tuple[int, float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.backend_errors = 0
+
+    def get(self, key: str, generation: int) -> Any | None:
+        now = self._clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] == generation and entry[1] > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[2]
+                del self._entries[key]
+        value = None
+        if self.backend is not None:
+            try:
+                value = self.backend.get(key, generation)
+            except psycopg.Error:
+                self.backend_errors += 1
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._store(key, generation, value, now)
+        return value
+
+    def set(self, key: str, generation: int, value: Any) -> None:
+        with self._lock:
+            self._store(key, generation, value, self._clock())
+        if self.backend is not None:
+            try:
+                self.backend.set(key, generation, value, self.ttl)
+            except psycopg.Error:
+                self.backend_errors += 1
+
+    def _store(self, key: str, generation: int, value: Any, now: float) -> None:
+        self._entries[key] = (generation, now + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "backend": type(self.backend).__name__ if self.backend else None,
+            "backend_errors": self.backend_errors,
+        }
+
+
+def search_cache_key(q: str, types: set[str], from_dt: datetime | None, to_dt: datetime | None, **extra: Any) -> str:
+    return json.dumps(
+        {
+            "q": " ".join(q.lower().split()),
+            "types": sorted(types),
+            "from": from_dt.isoformat() if from_dt else None,
+            "to": to_dt.isoformat() if to_dt else None,
+            **extra,
+        },
+        sort_keys=True,
+    )
+
+
+search_cache = SearchCache(backend=PostgresCacheBackend() if SEARCH_CACHE_BACKEND == "postgres" else None)
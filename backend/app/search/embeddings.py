@@ -0,0 +1,299 @@
+from __future__ import annotations
+
+import fcntl
+import json
+import os
+import threading
+import zlib
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterable, Iterator, Sequence
+
+import numpy as np
+
+from app.search.service import tokenize
+
+EMBEDDING_DIM = int(os.getenv("EMBEDDING_DIM", "256"))
+EMBEDDING_INDEX_PATH = Path(os.getenv("EMBEDDING_INDEX_PATH", "/tmp/wcc_embeddings"))
+IVF_NPROBE = int(os.getenv("EMBEDDING_IVF_NPROBE", "8"))
+INITIAL_CAPACITY = 1024
+
+
+class HashingEmbedder:
+    # Signed feature hashing of unigrams and bigrams with sublinear tf, L2-normalised: deterministic,
+    # needs no fitted vocabulary, network or GPU, so ingest and query time always agree.
+    def __init__(self, dim: int = EMBEDDING_DIM) -> None:
+        self.dim = dim
+
+    def _features(self, text: str) -> tuple[np.ndarray, np.ndarray]:
+        tokens = tokenize(text)
+        features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+        if not features:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        hashes = np.fromiter((zlib.crc32(f.encode()) for f in features), dtype=np.int64, count=len(features))
+        idx, counts = np.unique(hashes, return_counts=True)
+        signs = np.where(idx & (1 << 31), -1.0, 1.0).astype(np.float32)
+        return idx % self.dim, signs * (1 + np.log(counts)).astype(np.float32)
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            idx, weights = self._features(text)
+            np.add.at(out[row], idx, weights)
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        np.divide(out, norms, out=out, where=norms > 0)
+        return out
+
+
+class VectorIndex:
+    # Rows of a float32 memmap keyed by index.json. Writers only append: replacing or removing a key
+    # leaves a dead row, so rows an index.json has published are never rewritten and readers can map
+    # the file read-only. Once dead rows outnumber live ones, flush compacts into a new vectors file
+    # and the swapped index.json points at it. An optional IVF coarse quantizer (named in index.json)
+    # limits each query to the nprobe nearest lists.
+    def __init__(self, root: Path | str | None = None, dim: int = EMBEDDING_DIM, writable: bool = False) -> None:
+        self.root = Path(root or EMBEDDING_INDEX_PATH)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.dim = dim
+        self.writable = writable
+        self._retired: list[str] = []
+        for attempt in range(3):
+            try:
+                self._load()
+                break
+            except FileNotFoundError:
+                # A writer swapped index.json and removed the files it used to name; read the new one.
+                if writable or attempt == 2:
+                    raise
+        self._lists: list[np.ndarray] | None = None
+
+    def _load(self) -> None:
+        meta_path = self.root / "index.json"
+        meta = json.loads(meta_path.read_text(encoding="utf-8")) if meta_path.exists() else {"dim": self.dim, "keys": []}
+        if meta["dim"] != self.dim:
+            raise ValueError(f"Embedding index at {self.root} has dim {meta['dim']}, expected {self.dim}")
+        self.keys: list[str | None] = meta["keys"]
+        self.epoch = int(meta.get("epoch", 0))
+        self.vectors_name = meta.get("vectors", "vectors.f32")
+        self.ivf_name: str | None = meta.get("ivf", "ivf.npz" if "ivf" not in meta and (self.root / "ivf.npz").exists() else None)
+        self.rows = {key: row for row, key in enumerate(self.keys) if key is not None}
+        if self.writable:
+            self._matrix = self._open(max(len(self.keys), INITIAL_CAPACITY))
+        elif self.keys:
+            self._matrix = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(len(self.keys), self.dim))
+        else:
+            self._matrix = np.zeros((0, self.dim), dtype=np.float32)
+        self.centroids: np.ndarray | None = None
+        self.assignments = np.full(self._matrix.shape[0], -1, dtype=np.int32)
+        if self.ivf_name:
+            with np.load(self.root / self.ivf_name) as ivf:
+                self.centroids = ivf["centroids"]
+                self.assignments[: len(ivf["assignments"])] = ivf["assignments"]
+
+    @property
+    def vectors_path(self) -> Path:
+        return self.root / self.vectors_name
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def _check_writable(self) -> None:
+        if not self.writable:
+            raise RuntimeError(f"Embedding index at {self.root} is open read-only; use open_index_for_write")
+
+    def _open(self, capacity: int) -> np.memmap:
+        # Only ever grows the file, so read-only maps of its published rows stay valid.
+        path = self.vectors_path
+        size = capacity * self.dim * 4
+        if not path.exists() or path.stat().st_size < size:
+            with open(path, "ab") as fh:
+                fh.truncate(size)
+        return np.memmap(path, dtype=np.float32, mode="r+", shape=(path.stat().st_size // (self.dim * 4), self.dim))
+
+    def _ensure_capacity(self, rows: int) -> None:
+        capacity = self._matrix.shape[0]
+        if rows <= capacity:
+            return
+        self._matrix.flush()
+        self._matrix = self._open(max(rows, capacity * 2))
+        assignments = np.full(self._matrix.shape[0], -1, dtype=np.int32)
+        assignments[:capacity] = self.assignments
+        self.assignments = assignments
+
+    def add(self, keys: Sequence[str], vectors: np.ndarray) -> None:
+        self._check_writable()
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(len(keys), self.dim)
+        start = len(self.keys)
+        for i, key in enumerate(keys):
+            old = self.rows.get(key)
+            if old is not None:
+                self.keys[old] = None
+                self.assignments[old] = -1
+            self.rows[key] = start + i
+            self.keys.append(key)
+        self._ensure_capacity(len(self.keys))
+        self._matrix[start : len(self.keys)] = vectors
+        if self.centroids is not None:
+            self.assignments[start : len(self.keys)] = np.argmax(vectors @ self.centroids.T, axis=1)
+        self._lists = None
+
+    def remove(self, keys: Iterable[str]) -> int:
+        self._check_writable()
+        removed = 0
+        for key in keys:
+            row = self.rows.pop(key, None)
+            if row is None:
+                continue
+            self.keys[row] = None
+            self.assignments[row] = -1
+            removed += 1
+        self._lists = None
+        return removed
+
+    def remove_prefixes(self, prefixes: Iterable[str]) -> int:
+        prefixes = tuple(prefixes)
+        return self.remove([key for key in self.rows if key.startswith(prefixes)]) if prefixes else 0
+
+    def build_ivf(self, nlist: int | None = None, iterations: int = 10, seed: int = 0) -> int:
+        # Spherical k-means over the live rows.
+        self._check_writable()
+        live = np.fromiter(self.rows.values(), dtype=np.int64, count=len(self.rows))
+        if not len(live):
+            return 0
+        nlist = min(nlist or max(1, int(np.sqrt(len(live)))), len(live))
+        data = np.asarray(self._matrix[np.sort(live)])
+        rng = np.random.default_rng(seed)
+        centroids = data[rng.choice(len(data), size=nlist, replace=False)].copy()
+        for _ in range(iterations):
+            labels = np.argmax(data @ centroids.T, axis=1)
+            for c in range(nlist):
+                members = data[labels == c]
+                if len(members):
+                    centroid = members.sum(axis=0)
+                    norm = np.linalg.norm(centroid)
+                    centroids[c] = centroid / norm if norm else centroids[c]
+        self.centroids = centroids.astype(np.float32)
+        self.assignments[:] = -1
+        self.assignments[np.sort(live)] = np.argmax(data @ self.centroids.T, axis=1)
+        self._lists = None
+        return nlist
+
+    def drop_ivf(self) -> None:
+        self._check_writable()
+        self.centroids = None
+        self.assignments[:] = -1
+        self._lists = None
+
+    def _inverted_lists(self) -> list[np.ndarray]:
+        if self._lists is None:
+            n = len(self.keys)
+            order = np.argsort(self.assignments[:n], kind="stable")
+            bounds = np.searchsorted(self.assignments[:n][order], np.arange(len(self.centroids) + 1))
+            self._lists = [order[bounds[c] : bounds[c + 1]] for c in range(len(self.centroids))]
+        return self._lists
+
+    def search(self, queries: np.ndarray, k: int = 10, nprobe: int = IVF_NPROBE) -> list[list[tuple[str, float]]]:
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, self.dim)
+        n = len(self.keys)
+        if not self.rows or k <= 0:
+            return [[] for _ in queries]
+        if self.centroids is None:
+            # Exact: one (n x dim) @ (dim x batch) product for the whole batch.
+            scores = np.asarray(self._matrix[:n]) @ queries.T
+            dead = np.fromiter((key is None for key in self.keys), dtype=bool, count=n)
+            scores[dead] = -np.inf
+            return [self._top(np.arange(n), scores[:, j], k) for j in range(len(queries))]
+        lists = self._inverted_lists()
+        probe = np.argsort(-(queries @ self.centroids.T), axis=1)[:, : max(1, nprobe)]
+        results = []
+        for query, probed in zip(queries, probe):
+            candidates = np.concatenate([lists[c] for c in probed])
+            results.append(self._top(candidates, np.asarray(self._matrix[candidates]) @ query, k))
+        return results
+
+    def _top(self, rows: np.ndarray, scores: np.ndarray, k: int) -> list[tuple[str, float]]:
+        if not len(rows):
+            return []
+        k = min(k, len(rows))
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best], kind="stable")]
+        return [(self.keys[rows[i]], float(scores[i])) for i in best if np.isfinite(scores[i]) and self.keys[rows[i]] is not None]
+
+    def _compact(self) -> None:
+        # Live rows move to a new file; readers keep the old one mapped until they reopen.
+        live = np.fromiter(sorted(self.rows.values()), dtype=np.int64, count=len(self.rows))
+        data = np.asarray(self._matrix[live])
+        assignments = self.assignments[live]
+        self._retired.append(self.vectors_name)
+        self.vectors_name = f"vectors.{self.epoch + 1}.f32"
+        self.keys = [self.keys[row] for row in live]
+        self.rows = {key: row for row, key in enumerate(self.keys)}
+        self._matrix = self._open(max(len(self.keys), INITIAL_CAPACITY))
+        self._matrix[: len(self.keys)] = data
+        self.assignments = np.full(self._matrix.shape[0], -1, dtype=np.int32)
+        self.assignments[: len(self.keys)] = assignments
+        self._lists = None
+
+    def flush(self) -> None:
+        self._check_writable()
+        if len(self.keys) - len(self.rows) > len(self.rows):
+            self._compact()
+        self._matrix.flush()
+        self.epoch += 1
+        if self.ivf_name:
+            self._retired.append(self.ivf_name)
+        self.ivf_name = None
+        if self.centroids is not None:
+            self.ivf_name = f"ivf.{self.epoch}.npz"
+            np.savez(self.root / self.ivf_name, centroids=self.centroids, assignments=self.assignments[: len(self.keys)])
+        meta = {"dim": self.dim, "epoch": self.epoch, "vectors": self.vectors_name, "ivf": self.ivf_name, "keys": self.keys}
+        tmp = self.root / "index.json.tmp"
+        tmp.write_text(json.dumps(meta, separators=(",", ":")), encoding="utf-8")
+        os.replace(tmp, self.root / "index.json")
+        for name in self._retired:
+            (self.root / name).unlink(missing_ok=True)
+        self._retired = []
+
+
+@contextmanager
+def open_index_for_write(root: Path | str | None = None, dim: int = EMBEDDING_DIM) -> Iterator[VectorIndex]:
+    # Ingest, extraction and the API may run in different processes; writers serialise on a lock file.
+    root = Path(root or EMBEDDING_INDEX_PATH)
+    root.mkdir(parents=True, exist_ok=True)
+    with open(root / ".lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        index = VectorIndex(root, dim, writable=True)
+        yield index
+        index.flush()
+
+
+def embed_texts(items: Sequence[tuple[str, str]], remove_prefixes: Iterable[str] = (), root: Path | str | None = None) -> int:
+    embedder = HashingEmbedder()
+    with open_index_for_write(root, embedder.dim) as index:
+        index.remove_prefixes(remove_prefixes)
+        if items:
+            index.add([key for key, _ in items], embedder.embed([text for _, text in items]))
+    return len(items)
+
+
+_reader: tuple[tuple[int, int], VectorIndex] | None = None
+_reader_lock = threading.Lock()
+
+
+def get_index(root: Path | str | None = None) -> VectorIndex:
+    # Read side for the API: reopened whenever a writer has published a new index.json.
+    global _reader
+    root = Path(root or EMBEDDING_INDEX_PATH)
+    meta = root / "index.json"
+    # Writers rename a new index.json into place, so its inode changes on every publish.
+    stat = meta.stat() if meta.exists() else None
+    version = (stat.st_ino, stat.st_mtime_ns) if stat else (0, 0)
+    with _reader_lock:
+        if _reader is None or _reader[0] != version or _reader[1].root != root:
+            _reader = (version, VectorIndex(root))
+        return _reader[1]
+
+
+def semantic_search(query: str, k: int = 20, root: Path | str | None = None) -> list[tuple[str, float]]:
+    index = get_index(root)
+    return index.search(HashingEmbedder(index.dim).embed([query]), k)[0]
@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from datetime import datetime
+from typing import Any, Callable
+
+from app.db import DB_STATEMENT_TIMEOUT_MS, get_conn
+from app.search.postgres import unified_search
+from app.search.semantic import hydrate, semantic_hits
+
+RRF_K = int(os.getenv("HYBRID_RRF_K", "60"))
+LEXICAL_BUDGET_MS = float(os.getenv("HYBRID_LEXICAL_BUDGET_MS", "800"))
+SEMANTIC_BUDGET_MS = float(os.getenv("HYBRID_SEMANTIC_BUDGET_MS", "400"))
+HYBRID_WORKERS = int(os.getenv("HYBRID_WORKERS", "8"))
+
+Retriever = Callable[[], list[dict[str, Any]]]
+
+_executor = ThreadPoolExecutor(max_workers=HYBRID_WORKERS, thread_name_prefix="hybrid")
+
+
+def lexical_retriever(q: str, types: set[str], from_dt: datetime | None, to_dt: datetime | None, limit: int, budget_ms: float) -> Retriever:
+    def run() -> list[dict[str, Any]]:
+        with get_conn() as conn, conn.cursor() as cur:
+            # The server abandons the query once the budget has passed, so a timed-out retriever
+            # doesn't keep a pooled connection busy.
+            cur.execute("select set_config('statement_timeout', %s, true)", (str(int(budget_ms)),))
+            rows = unified_search(cur, q, types, from_dt, to_dt, limit)
+        return [{k: v for k, v in row.items() if not k.startswith('_')} for row in rows]
+
+    return run
+
+
+def semantic_retriever(q: str, types: set[str], from_dt: datetime | None, to_dt: datetime | None, limit: int, budget_ms: float) -> Retriever:
+    deadline = time.perf_counter() + budget_ms / 1000
+
+    def run() -> list[dict[str, Any]]:
+        # The vector search holds no connection. If it used up the budget, nobody is waiting for
+        # the result, so no connection is taken to hydrate it either.
+        hits = semantic_hits(q, limit, types)
+        if time.perf_counter() >= deadline:
+            raise FutureTimeout
+        with get_conn(DB_STATEMENT_TIMEOUT_MS) as conn, conn.cursor() as cur:
+            return hydrate(cur, hits, from_dt, to_dt)[:limit]
+
+    return run
+
+
+def reciprocal_rank_fusion(rankings: dict[str, list[dict[str, Any]]], k: int = RRF_K) -> list[dict[str, Any]]:
+    fused: dict[str, dict[str, Any]] = {}
+    for name, results in rankings.items():
+        for rank, result in enumerate(results, start=1):
+            entry = fused.setdefault(result['id'], result | {'score': 0.0, 'ranks': {}})
+            entry['score'] += 1.0 / (k + rank)
+            entry['ranks'][name] = rank
+    return sorted(fused.values(), key=lambda r: (-r['score'], r['id']))
+
+
+def _timed(retriever: Retriever, deadline: float) -> tuple[float, list[dict[str, Any]]]:
+    # A task that only starts once its budget has passed (queued behind abandoned ones) is dropped
+    # rather than run for a caller that has stopped waiting.
+    start = time.perf_counter()
+    if start >= deadline:
+        raise FutureTimeout
+    results = retriever()
+    return (time.perf_counter() - start) * 1000, results
+
+
+def hybrid_search(retrievers: dict[str, tuple[Retriever, float]], limit: int, k: int = RRF_K) -> dict[str, Any]:
+    # Budgets are measured from the common start: every retriever runs concurrently and whatever
+    # has not answered within its budget is dropped from the fusion instead of delaying it.
+    start = time.perf_counter()
+    futures = {name: _executor.submit(_timed, retriever, start + budget / 1000) for name, (retriever, budget) in retrievers.items()}
+    rankings: dict[str, list[dict[str, Any]]] = {}
+    timings: dict[str, dict[str, Any]] = {}
+    for name, future in futures.items():
+        budget = retrievers[name][1] / 1000
+        try:
+            elapsed, rankings[name] = future.result(timeout=max(0.0, budget - (time.perf_counter() - start)))
+            status = 'ok'
+        except FutureTimeout:
+            future.cancel()
+            elapsed, status = (time.perf_counter() - start) * 1000, 'timeout'
+        except Exception as exc:
+            elapsed, status = (time.perf_counter() - start) * 1000, f'error: {type(exc).__name__}'
+        timings[name] = {'ms': round(elapsed, 1), 'status': status, 'count': len(rankings.get(name, []))}
+    fusion_start = time.perf_counter()
+    results = reciprocal_rank_fusion(rankings, k)[:limit]
+    timings['fusion'] = {'ms': round((time.perf_counter() - fusion_start) * 1000, 1)}
+    timings['total'] = {'ms': round((time.perf_counter() - start) * 1000, 1)}
+    return {'results': results, 'timings': timings, 'partial': any(t.get('status', 'ok') != 'ok' for t in timings.values())}
@@ -0,0 +1,175 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any
+
+import psycopg
+
+from app.db import estimate_rows
+
+DEFAULT_LIMIT = 120
+SEARCH_CURSOR_KEYS = ('score', '_date_key', '_kind', '_key')
+
+
+@dataclass(frozen=True)
+class SearchBranch:
+    kind: str
+    hits: str
+    date_expr: str
+    headline: str
+    citations: list[dict[str, Any]] | None = None
+
+
+# ``hits`` selects (kind, id, title, date, score, chunk) for every match and must not compute headlines;
+# ``headline`` is only evaluated for the rows that make the global top-k.
+BRANCHES: dict[str, SearchBranch] = {
+    "meetings": SearchBranch(
+        kind="meeting",
+        hits="""
+            select 'meeting' as kind, m.id::text as id, m.title, m.meeting_date as date, ts_rank(m.search, q.tsq) as score, null::int as chunk
+            from meetings m cross join q
+            where m.search @@ q.tsq
+        """,
+        date_expr="m.meeting_date",
+        headline="select ts_headline('english', coalesce(x.title,'') || ' ' || coalesce(x.body,''), q.tsq) from meetings x where x.id = top.id::bigint",
+        citations=[{"source": "meeting record"}],
+    ),
+    "agenda_items": SearchBranch(
+        kind="agenda_item",
+        hits="""
+            select 'agenda_item' as kind, ai.id::text as id, ai.title, m.meeting_date as date, ts_rank(ai.search, q.tsq) as score, null::int as chunk
+            from agenda_items ai cross join q
+            left join meetings m on m.id = ai.meeting_id
+            where ai.search @@ q.tsq
+        """,
+        date_expr="m.meeting_date",
+        headline="select ts_headline('english', coalesce(x.title,'') || ' ' || coalesce(x.description,''), q.tsq) from agenda_items x where x.id = top.id::bigint",
+        citations=[{"source": "agenda", "line": 1}],
+    ),
+    "ordinances": SearchBranch(
+        kind="ordinance",
+        hits="""
+            select 'ordinance' as kind, mt.id::text as id, mt.title, coalesce(mt.passed_date, mt.intro_date) as date, ts_rank(mt.search, q.tsq) as score, null::int as chunk
+            from matters mt cross join q
+            where mt.search @@ q.tsq
+        """,
+        date_expr="coalesce(mt.passed_date, mt.intro_date)",
+        headline="select ts_headline('english', coalesce(x.title,'') || ' ' || coalesce(x.status,''), q.tsq) from matters x where x.id = top.id::bigint",
+        citations=[{"source": "matter"}],
+    ),
+    "documents": SearchBranch(
+        kind="document",
+        # Rank by the best matching chunk; documents without a matching chunk (not chunked yet, or
+        # matching on title alone) fall back to documents.search.
+        hits="""
+            select 'document' as kind, d.id, d.title, m.meeting_date as date, h.score, h.chunk
+            from (
+              (select distinct on (c.document_id) c.document_id as id, ts_rank(c.search, q.tsq) as score, c.chunk_index as chunk
+               from document_chunks c cross join q
+               where c.search @@ q.tsq
+               order by c.document_id, score desc, c.chunk_index)
+              union all
+              (select x.id, ts_rank(x.search, q.tsq) as score, null::int as chunk
+               from documents x cross join q
+               where x.search @@ q.tsq
+                 and not exists (select 1 from document_chunks c where c.document_id = x.id and c.search @@ q.tsq))
+            ) h
+            join documents d on d.id = h.id
+            left join meetings m on d.source_type = 'meeting' and m.id = d.source_id
+            where true
+        """,
+        date_expr="m.meeting_date",
+        headline="""select ts_headline('english', coalesce(c.text, concat_ws(' ', x.title, x.text_content)), q.tsq)
+            from documents x left join document_chunks c on c.document_id = x.id and c.chunk_index = top.chunk
+            where x.id = top.id""",
+    ),
+}
+
+
+def _hits_sql(types: set[str], from_dt: datetime | None, to_dt: datetime | None) -> tuple[list[SearchBranch], str]:
+    branches = [branch for name, branch in BRANCHES.items() if name in types]
+    hits = []
+    for branch in branches:
+        sql = branch.hits.strip()
+        if from_dt:
+            sql += f" and {branch.date_expr} >= %(from_dt)s"
+        if to_dt:
+            sql += f" and {branch.date_expr} <= %(to_dt)s"
+        hits.append(sql)
+    return branches, f"""
+        with q as (select plainto_tsquery('english', %(q)s) as tsq),
+        hits as (
+            select *, coalesce(date, '-infinity'::timestamptz) as date_key from (
+            {' union all '.join(hits)}
+            ) h
+        )
+    """
+
+
+def build_search_sql(types: set[str], from_dt: datetime | None, to_dt: datetime | None, after: bool = False) -> str:
+    # Keyset order is (score desc, date desc nulls last, kind, id); ids alone repeat across kinds.
+    branches, hits = _hits_sql(types, from_dt, to_dt)
+    keyset = """
+        where score < %(after_score)s
+           or (score = %(after_score)s and (date_key < %(after_date)s::timestamptz
+           or (date_key = %(after_date)s::timestamptz and (kind, id) > (%(after_kind)s, %(after_id)s))))
+    """ if after else ""
+    headline_cases = "\n".join(f"when '{b.kind}' then ({b.headline})" for b in branches)
+    return f"""
+        {hits},
+        top as (
+            select * from hits {keyset} order by score desc, date_key desc, kind, id limit %(limit)s
+        )
+        select top.kind, top.id, top.title, top.date, top.score, top.date_key::text as date_key,
+          case top.kind {headline_cases} end as snippet,
+          case when top.kind = 'document' then (
+            select coalesce(jsonb_agg(jsonb_build_object(
+              'page', c.page, 'line_start', c.line_start, 'line_end', c.line_end, 'char_start', c.char_start, 'char_end', c.char_end
+            )), '[]'::jsonb)
+            from document_chunks c where c.document_id = top.id and c.chunk_index = top.chunk
+          ) end as citations
+        from top cross join q
+        order by top.score desc, top.date_key desc, top.kind, top.id
+    """
+
+
+def unified_search(
+    cur: psycopg.Cursor,
+    q: str,
+    types: set[str],
+    from_dt: datetime | None = None,
+    to_dt: datetime | None = None,
+    limit: int = DEFAULT_LIMIT,
+    after: list[Any] | None = None,
+) -> list[dict[str, Any]]:
+    if not any(name in BRANCHES for name in types):
+        return []
+    params = {"q": q, "from_dt": from_dt, "to_dt": to_dt, "limit": limit}
+    if after:
+        params.update(zip(("after_score", "after_date", "after_kind", "after_id"), after))
+    cur.execute(build_search_sql(types, from_dt, to_dt, after=bool(after)), params)
+    citations = {branch.kind: branch.citations for branch in BRANCHES.values()}
+    return [
+        {
+            'id': r['id'] if r['kind'] == 'document' else f"{r['kind']}:{r['id']}",
+            'title': r['title'],
+            'type': r['kind'],
+            'date': r['date'],
+            'snippet': r['snippet'],
+            'citations': citations[r['kind']] if citations[r['kind']] is not None else (r['citations'] or []),
+            'score': float(r['score']),
+            '_date_key': r['date_key'],
+            '_kind': r['kind'],
+            '_key': r['id'],
+        }
+        for r in cur.fetchall()
+    ]
+
+
+def estimate_search(cur: psycopg.Cursor, q: str, types: set[str], from_dt: datetime | None = None, to_dt: datetime | None = None) -> int:
+    if not any(name in BRANCHES for name in types):
+        return 0
+    _, hits = _hits_sql(types, from_dt, to_dt)
+    return estimate_rows(cur, f"{hits} select 1 from hits", {"q": q, "from_dt": from_dt, "to_dt": to_dt})
+
@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Any
+
+import psycopg
+
+from app.search.embeddings import semantic_search
+
+AGENDA_PREFIX = "agenda_item:"
+CHUNK_PREFIX = "chunk:"
+# Search types that have vectors, by key prefix.
+TYPE_PREFIXES = {"agenda_items": AGENDA_PREFIX, "documents": CHUNK_PREFIX}
+
+
+def agenda_item_key(item_id: int) -> str:
+    return f"{AGENDA_PREFIX}{item_id}"
+
+
+def chunk_prefix(document_id: str) -> str:
+    return f"{CHUNK_PREFIX}{document_id}:"
+
+
+def chunk_key(document_id: str, chunk_index: int) -> str:
+    return f"{chunk_prefix(document_id)}{chunk_index}"
+
+
+def hydrate(
+    cur: psycopg.Cursor, hits: list[tuple[str, float]], from_dt: datetime | None = None, to_dt: datetime | None = None
+) -> list[dict[str, Any]]:
+    # Vector hits carry only keys; load titles/snippets in one query per kind and keep the
+    # best chunk per document, in hit order. Date bounds apply as in the lexical branches.
+    item_ids = [int(key[len(AGENDA_PREFIX):]) for key, _ in hits if key.startswith(AGENDA_PREFIX)]
+    chunk_refs = [key[len(CHUNK_PREFIX):].rpartition(":") for key, _ in hits if key.startswith(CHUNK_PREFIX)]
+    dates = """
+        and (%(from_dt)s::timestamptz is null or m.meeting_date >= %(from_dt)s)
+        and (%(to_dt)s::timestamptz is null or m.meeting_date <= %(to_dt)s)
+    """
+    rows: dict[str, dict[str, Any]] = {}
+    if item_ids:
+        cur.execute(
+            """
+            select ai.id, ai.title, ai.description, m.meeting_date as date
+            from agenda_items ai left join meetings m on m.id = ai.meeting_id
+            where ai.id = any(%(ids)s)
+            """
+            + dates,
+            {"ids": item_ids, "from_dt": from_dt, "to_dt": to_dt},
+        )
+        for r in cur.fetchall():
+            rows[agenda_item_key(r['id'])] = {
+                'id': f"agenda_item:{r['id']}", 'title': r['title'], 'type': 'agenda_item', 'date': r['date'],
+                'snippet': r['description'] or r['title'], 'citations': [{'source': 'agenda', 'line': 1}],
+            }
+    if chunk_refs:
+        cur.execute(
+            """
+            select c.document_id, c.chunk_index, c.page, c.line_start, c.line_end, c.char_start, c.char_end,
+              left(c.text, 300) as snippet, d.title, m.meeting_date as date
+            from unnest(%(docs)s::text[], %(chunks)s::int[]) as k(document_id, chunk_index)
+            join document_chunks c on c.document_id = k.document_id and c.chunk_index = k.chunk_index
+            join documents d on d.id = c.document_id
+            left join meetings m on d.source_type = 'meeting' and m.id = d.source_id
+            where true
+            """
+            + dates,
+            {"docs": [doc for doc, _, _ in chunk_refs], "chunks": [int(idx) for _, _, idx in chunk_refs], "from_dt": from_dt, "to_dt": to_dt},
+        )
+        for r in cur.fetchall():
+            rows[chunk_key(r['document_id'], r['chunk_index'])] = {
+                'id': r['document_id'], 'title': r['title'], 'type': 'document', 'date': r['date'], 'snippet': r['snippet'],
+                'citations': [{k: r[k] for k in ('page', 'line_start', 'line_end', 'char_start', 'char_end')}],
+            }
+    results: list[dict[str, Any]] = []
+    seen: set[str] = set()
+    for key, score in hits:
+        row = rows.get(key)
+        if row is None or row['id'] in seen:
+            continue
+        seen.add(row['id'])
+        results.append(row | {'score': score})
+    return results
+
+
+def semantic_hits(q: str, k: int = 20, types: set[str] | None = None) -> list[tuple[str, float]]:
+    # Over-fetch: several chunks of one document collapse into a single result. No connection is
+    # needed until the hits are hydrated.
+    hits = semantic_search(q, k * 3)
+    if types is not None:
+        prefixes = tuple(TYPE_PREFIXES[t] for t in types if t in TYPE_PREFIXES)
+        hits = [hit for hit in hits if hit[0].startswith(prefixes)]
+    return hits
@@ -1,6 +1,19 @@
 from __future__ import annotations
 
+import heapq
+import json
+import math
+import re
+from collections import Counter
 from dataclasses import dataclass, field
+from pathlib import Path
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+INDEX_FORMAT_VERSION = 1
+
+
+def tokenize(text: str) -> list[str]:
+    return TOKEN_RE.findall(text.lower())
 
 
 @dataclass
@@ -12,15 +25,102 @@ class SearchDoc:
 
 @dataclass
 class SearchService:
-    docs: list[SearchDoc] = field(default_factory=list)
+    # Inverted index: text is tokenized once at index() time into term -> {doc id: term frequency}
+    # postings, and queries only touch the postings of their own terms.
+    k1: float = 1.2
+    b: float = 0.75
+    docs: dict[str, SearchDoc] = field(default_factory=dict)
+    postings: dict[str, dict[str, int]] = field(default_factory=dict, repr=False)
+    lengths: dict[str, int] = field(default_factory=dict, repr=False)
+    total_length: int = 0
 
     def index(self, doc: SearchDoc) -> None:
-        self.docs.append(doc)
+        if doc.id in self.docs:
+            self.remove(doc.id)
+        counts = Counter(tokenize(doc.text))
+        self.docs[doc.id] = doc
+        self.lengths[doc.id] = sum(counts.values())
+        self.total_length += self.lengths[doc.id]
+        for term, tf in counts.items():
+            self.postings.setdefault(term, {})[doc.id] = tf
+
+    def remove(self, doc_id: str) -> bool:
+        doc = self.docs.pop(doc_id, None)
+        if doc is None:
+            return False
+        self.total_length -= self.lengths.pop(doc_id)
+        for term in set(tokenize(doc.text)):
+            postings = self.postings.get(term)
+            if postings is not None:
+                postings.pop(doc_id, None)
+                if not postings:
+                    del self.postings[term]
+        return True
+
+    def fts(self, query: str, limit: int | None = None) -> list[SearchDoc]:
+        # Every query term must appear; intersect starting from the rarest term.
+        terms = sorted(set(tokenize(query)), key=lambda t: len(self.postings.get(t, ())))
+        if not terms or terms[0] not in self.postings:
+            return []
+        candidates = set(self.postings[terms[0]])
+        for term in terms[1:]:
+            candidates.intersection_update(self.postings.get(term, ()))
+            if not candidates:
+                return []
+        return self._top(self._scores(terms, candidates), limit)
+
+    def semantic(self, query: str, limit: int = 10) -> list[SearchDoc]:
+        terms = set(tokenize(query))
+        return self._top(self._scores(terms), limit)
+
+    def _scores(self, terms: set[str] | list[str], candidates: set[str] | None = None) -> dict[str, float]:
+        n = len(self.docs)
+        avg_length = self.total_length / n if n else 0.0
+        scores: dict[str, float] = {}
+        for term in terms:
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_id, tf in postings.items():
+                if candidates is not None and doc_id not in candidates:
+                    continue
+                norm = self.k1 * (1 - self.b + self.b * self.lengths[doc_id] / avg_length) if avg_length else self.k1
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+        return scores
+
+    def _top(self, scores: dict[str, float], limit: int | None) -> list[SearchDoc]:
+        if limit is None:
+            ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        else:
+            ranked = heapq.nsmallest(limit, scores.items(), key=lambda item: (-item[1], item[0]))
+        return [self.docs[doc_id] for doc_id, _ in ranked]
 
-    def fts(self, query: str) -> list[SearchDoc]:
-        q = query.lower()
-        return [d for d in self.docs if q in d.text.lower()]
+    def save(self, path: str | Path) -> None:
+        payload = {
+            "version": INDEX_FORMAT_VERSION,
+            "k1": self.k1,
+            "b": self.b,
+            "docs": [{"id": d.id, "text": d.text, "metadata": d.metadata} for d in self.docs.values()],
+            "postings": self.postings,
+            "lengths": self.lengths,
+        }
+        target = Path(path)
+        tmp = target.with_name(target.name + ".tmp")
+        tmp.write_text(json.dumps(payload, separators=(",", ":")), encoding="utf-8")
+        tmp.replace(target)
 
-    def semantic(self, query: str) -> list[SearchDoc]:
-        terms = set(query.lower().split())
-        return sorted(self.docs, key=lambda d: -len(terms.intersection(set(d.text.lower().split()))))[:10]
+    @classmethod
+    def load(cls, path: str | Path) -> SearchService:
+        payload = json.loads(Path(path).read_text(encoding="utf-8"))
+        if payload.get("version") != INDEX_FORMAT_VERSION:
+            raise ValueError(f"Unsupported search index version: {payload.get('version')}")
+        lengths = {doc_id: int(length) for doc_id, length in payload["lengths"].items()}
+        return cls(
+            k1=payload["k1"],
+            b=payload["b"],
+            docs={d["id"]: SearchDoc(id=d["id"], text=d["text"], metadata=d["metadata"]) for d in payload["docs"]},
+            postings=payload["postings"],
+            lengths=lengths,
+            total_length=sum(lengths.values()),
+        )
@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import timedelta
+from pathlib import Path
+from typing import Any, Iterable, Iterator
+
+import psycopg
+
+from app.db import get_conn
+
+OBJECT_STORAGE_PATH = Path(os.getenv("OBJECT_STORAGE_PATH", "/tmp/wcc_objects"))
+# Budget books are uploaded by users and referenced by id only, so they live in their own store,
+# outside the document blobs that collect_garbage sweeps.
+BUDGET_BOOK_PATH = Path(os.getenv("BUDGET_BOOK_STORAGE_PATH", str(OBJECT_STORAGE_PATH / "budget-books")))
+GC_GRACE = timedelta(hours=float(os.getenv("OBJECT_GC_GRACE_HOURS", "24")))
+# Ingest holds this advisory lock shared for its writer transaction and GC holds it exclusively,
+# so a blob an in-flight ingest deduplicated onto can't be deleted before its reference commits.
+GC_LOCK_KEY = 0x77636367
+
+
+def hold_ingest_lock(cur: psycopg.Cursor) -> None:
+    cur.execute("select pg_advisory_xact_lock_shared(%s)", (GC_LOCK_KEY,))
+
+
+@dataclass(frozen=True)
+class StoredBlob:
+    sha256: str
+    size: int
+    path: Path
+    created: bool
+
+
+class ObjectStore:
+    # Blobs live at <root>/blobs/ab/cd/<sha256>; identical content is stored once no matter how
+    # many documents reference it. Writes go to <root>/tmp first and are renamed into place.
+    def __init__(self, root: Path | str = OBJECT_STORAGE_PATH) -> None:
+        self.root = Path(root)
+        self.blob_root = self.root / "blobs"
+        self.tmp_root = self.root / "tmp"
+
+    def path_for(self, sha256: str) -> Path:
+        return self.blob_root / sha256[:2] / sha256[2:4] / sha256
+
+    def exists(self, sha256: str) -> bool:
+        return self.path_for(sha256).exists()
+
+    def put_stream(self, chunks: Iterable[bytes]) -> StoredBlob:
+        self.tmp_root.mkdir(parents=True, exist_ok=True)
+        tmp = self.tmp_root / f"{uuid.uuid4().hex}.part"
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            with tmp.open("wb") as fh:
+                for chunk in chunks:
+                    digest.update(chunk)
+                    fh.write(chunk)
+                    size += len(chunk)
+                fh.flush()
+                os.fsync(fh.fileno())
+            sha256 = digest.hexdigest()
+            dest = self.path_for(sha256)
+            if dest.exists():
+                tmp.unlink()
+                return StoredBlob(sha256, size, dest, created=False)
+            dest.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(tmp, dest)
+            return StoredBlob(sha256, size, dest, created=True)
+        finally:
+            tmp.unlink(missing_ok=True)
+
+    def put_bytes(self, body: bytes) -> StoredBlob:
+        return self.put_stream([body])
+
+    def delete(self, sha256: str) -> bool:
+        path = self.path_for(sha256)
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            return False
+        return True
+
+    def iter_blobs(self) -> Iterator[tuple[str, Path]]:
+        if not self.blob_root.exists():
+            return
+        for path in self.blob_root.glob("*/*/*"):
+            if path.is_file():
+                yield path.name, path
+
+    def collect_garbage(self, grace: timedelta = GC_GRACE, dry_run: bool = False) -> dict[str, Any]:
+        # Blob rows with no document_blobs reference are deleted along with their files; files
+        # with no blob row at all (an ingest that never committed) are removed once older than
+        # the grace period. The run is skipped while an ingest holds the lock rather than queueing
+        # behind it, which would also hold up ingests that start later.
+        cutoff = time.time() - grace.total_seconds()
+        query = """
+            select b.sha256 from blobs b
+            where not exists (select 1 from document_blobs r where r.sha256 = b.sha256)
+              and b.created_at < now() - %s
+        """
+        if not dry_run:
+            query = f"delete from blobs where sha256 in ({query}) returning sha256"
+        with get_conn() as conn, conn.cursor() as cur:
+            cur.execute("select pg_try_advisory_xact_lock(%s) as locked", (GC_LOCK_KEY,))
+            if not cur.fetchone()["locked"]:
+                return {"skipped": "ingest running"}
+            cur.execute("select sha256 from blobs")
+            known = {row["sha256"] for row in cur.fetchall()}
+            cur.execute(query, (grace,))
+            unreferenced = [row["sha256"] for row in cur.fetchall()]
+            orphaned = [sha for sha, path in self.iter_blobs() if sha not in known and path.stat().st_mtime < cutoff]
+            stale_tmp = [path for path in self.tmp_root.glob("*.part") if path.stat().st_mtime < cutoff] if self.tmp_root.exists() else []
+            # Files go while the lock is still held: an ingest starting now waits for this commit.
+            if not dry_run:
+                for sha in [*unreferenced, *orphaned]:
+                    self.delete(sha)
+                for path in stale_tmp:
+                    path.unlink(missing_ok=True)
+        return {"unreferenced": len(unreferenced), "orphaned_files": len(orphaned), "stale_tmp": len(stale_tmp)}
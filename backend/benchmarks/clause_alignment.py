@@ -0,0 +1,103 @@
+"""Clause alignment on synthetic code-title rewrites.
+
+    cd backend && python -m benchmarks.clause_alignment --sections 5000
+
+Generates an old document of N sections, then a new version where some sections are
+renumbered (moved), lightly edited, moved and edited, removed or added, and times
+``align_clauses`` against the previous exact-text algorithm.
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import time
+from collections import Counter
+
+from app.analysis.clause_alignment import align_clauses
+
+VOCABULARY = (
+    "the county shall may not any person owner permit zoning district parcel building use "
+    "residential commercial setback height feet review board council director notice hearing "
+    "application fee annual report public street sidewalk maintain within days after before "
+    "approval variance density unit parking lot sign water sewer easement plan map amendment"
+).split()
+
+
+def synthetic_documents(
+    sections: int, seed: int = 7, moved: float = 0.05, edited: float = 0.1, moved_edited: float = 0.05, removed: float = 0.02, added: float = 0.02
+) -> tuple[dict[str, str], dict[str, str], dict[str, int]]:
+    rng = random.Random(seed)
+    old = {f"{i // 100 + 1}.{i % 100 + 1}": " ".join(rng.choices(VOCABULARY, k=rng.randint(25, 80))) for i in range(sections)}
+    new: dict[str, str] = {}
+    expected: Counter[str] = Counter()
+    next_id = sections
+    for clause_id, text in old.items():
+        roll = rng.random()
+        if roll < removed:
+            expected["removed"] += 1
+            continue
+        roll -= removed
+        if roll < moved + moved_edited:
+            if roll >= moved:
+                text = _edit(rng, text)
+            clause_id = f"{next_id // 100 + 1}.{next_id % 100 + 1}"
+            next_id += 1
+            expected["moved" if roll < moved else "moved_modified"] += 1
+        elif roll - moved - moved_edited < edited:
+            text = _edit(rng, text)
+            expected["modified"] += 1
+        new[clause_id] = text
+    for _ in range(int(sections * added)):
+        new[f"{next_id // 100 + 1}.{next_id % 100 + 1}"] = " ".join(rng.choices(VOCABULARY, k=40))
+        next_id += 1
+        expected["added"] += 1
+    return old, new, dict(expected)
+
+
+def _edit(rng: random.Random, text: str) -> str:
+    words = text.split()
+    for _ in range(max(1, len(words) // 25)):
+        words[rng.randrange(len(words))] = rng.choice(VOCABULARY).upper()
+    return " ".join(words)
+
+
+def legacy_diff(old_sections: dict[str, str], new_sections: dict[str, str]) -> Counter[str]:
+    counts: Counter[str] = Counter()
+    old_by_text = {v: k for k, v in old_sections.items()}
+    for new_id, new_text in new_sections.items():
+        if new_id in old_sections:
+            if old_sections[new_id] != new_text:
+                counts["modified"] += 1
+        elif new_text in old_by_text:
+            counts["moved"] += 1
+        else:
+            counts["added"] += 1
+    for old_id, old_text in old_sections.items():
+        if old_id not in new_sections and old_text not in new_sections.values():
+            counts["removed"] += 1
+    return counts
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sections", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--skip-legacy", action="store_true")
+    args = parser.parse_args()
+
+    old, new, expected = synthetic_documents(args.sections, args.seed)
+    print(f"sections: old={len(old)} new={len(new)} expected={expected}")
+
+    start = time.perf_counter()
+    alignments = align_clauses(old, new)
+    elapsed = time.perf_counter() - start
+    print(f"align_clauses: {elapsed:.3f}s {dict(Counter(a.change_type for a in alignments))}")
+
+    if not args.skip_legacy:
+        start = time.perf_counter()
+        counts = legacy_diff(old, new)
+        print(f"legacy exact-text diff: {time.perf_counter() - start:.3f}s {dict(counts)}")
+
+
+if __name__ == "__main__":
+    main()
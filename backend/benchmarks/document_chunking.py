@@ -0,0 +1,105 @@
+"""Chunking throughput on agenda-packet sized documents.
+
+    cd backend && python -m benchmarks.document_chunking --pages 1500
+    cd backend && python -m benchmarks.document_chunking --pdf packet.pdf
+
+Synthetic packets mix staff-report prose, numbered agenda items, pipe tables and exhibit
+pages at roughly 3.5 KB of text per page (a 1,500 page packet is ~5 MB of extracted text).
+Reports MB/s and chunks/s, and the tracemalloc peak for the packet and for one ten times
+smaller to show that chunking memory does not grow with packet size.
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import time
+import tracemalloc
+from typing import Iterator
+
+from app.analysis.document_processing import CHUNK_CHARS, CHUNK_OVERLAP, iter_chunks
+
+WORDS = (
+    "council county ordinance amendment budget fund department staff report recommendation public hearing "
+    "resolution motion approve second vote planning commission zoning parcel permit contract award "
+    "appropriation capital project road facility jail housing shelter water sewer utility grant"
+).split()
+
+
+def _sentence(rng: random.Random) -> str:
+    words = rng.choices(WORDS, k=rng.randint(8, 28))
+    return " ".join(words).capitalize() + rng.choice((".", ".", ".", "?", ";"))
+
+
+def _page(rng: random.Random, page_no: int) -> str:
+    lines: list[str] = [f"AGENDA BILL {page_no}"]
+    while sum(len(line) + 1 for line in lines) < 3500:
+        kind = rng.random()
+        if kind < 0.55:
+            # Prose reflowed at ~90 columns, as pypdf returns it.
+            paragraph = " ".join(_sentence(rng) for _ in range(rng.randint(2, 7)))
+            lines.extend(paragraph[i : i + 90] for i in range(0, len(paragraph), 90))
+            lines.append("")
+        elif kind < 0.8:
+            lines.extend(f"{n}. {_sentence(rng)}" for n in range(1, rng.randint(3, 8)))
+        else:
+            lines.extend(f"{rng.randint(1, 999):03d}-{rng.randint(100, 999)} | {rng.choice(WORDS)} | {rng.randint(1000, 9_999_999):,}" for _ in range(rng.randint(4, 15)))
+    return "\n".join(lines)
+
+
+def synthetic_packet(pages: int, seed: int = 11) -> Iterator[tuple[int, str]]:
+    rng = random.Random(seed)
+    for page_no in range(1, pages + 1):
+        yield page_no, "" if page_no % 50 == 0 else _page(rng, page_no)
+
+
+def measure(pages: Iterator[tuple[int, str]], chunk_chars: int, overlap: int) -> tuple[int, int, float]:
+    size = 0
+
+    def counted() -> Iterator[tuple[int, str]]:
+        nonlocal size
+        for page in pages:
+            size += len(page[1].encode())
+            yield page
+
+    start = time.perf_counter()
+    chunks = sum(1 for _ in iter_chunks(counted(), chunk_chars, overlap))
+    return size, chunks, time.perf_counter() - start
+
+
+def peak_memory(pages: int, chunk_chars: int, overlap: int) -> int:
+    tracemalloc.start()
+    for _ in iter_chunks(synthetic_packet(pages), chunk_chars, overlap):
+        pass
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def _report(label: str, size: int, chunks: int, elapsed: float) -> None:
+    print(f"{label}: {size / 1e6:.1f} MB, {chunks} chunks in {elapsed:.2f}s -> {size / 1e6 / elapsed:.1f} MB/s, {chunks / elapsed:,.0f} chunks/s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=1500)
+    parser.add_argument("--chunk-chars", type=int, default=CHUNK_CHARS)
+    parser.add_argument("--overlap", type=int, default=CHUNK_OVERLAP)
+    parser.add_argument("--pdf", action="append", default=[], help="also time real packets (includes pypdf parsing)")
+    args = parser.parse_args()
+
+    # Pages are generated up front so the timing covers chunking only.
+    packet = list(synthetic_packet(args.pages))
+    _report(f"synthetic {args.pages} pages", *measure(iter(packet), args.chunk_chars, args.overlap))
+    del packet
+    small, large = peak_memory(max(1, args.pages // 10), args.chunk_chars, args.overlap), peak_memory(args.pages, args.chunk_chars, args.overlap)
+    print(f"peak memory: {small / 1e3:.0f} KB at {max(1, args.pages // 10)} pages, {large / 1e3:.0f} KB at {args.pages} pages")
+
+    if args.pdf:
+        from app.ingestion.extraction import iter_pdf_pages
+
+        for path in args.pdf:
+            _report(path, *measure(iter_pdf_pages(path), args.chunk_chars, args.overlap))
+
+
+if __name__ == "__main__":
+    main()
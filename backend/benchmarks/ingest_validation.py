@@ -0,0 +1,117 @@
+"""Ingest validation throughput: per-record model_validate against skip-unchanged + batched TypeAdapters.
+
+    cd backend && python -m benchmarks.ingest_validation --records 50000 --batch 500
+
+Synthetic RSS/GIS-shaped records (news items, meetings, agenda items, documents) are written in
+PIPELINE_WRITE_BATCH sized batches to an in-memory hash store, three times:
+
+  first run    every record is new
+  re-run       the same feed again, every hash already stored
+  10% changed  a re-run where one record in ten carries a new hash
+
+"before" is the previous path (merged dict, provenance dict and model_validate for every record,
+known or not); "after" is IngestionPipeline._store_many, which validates new records with one
+cached TypeAdapter per record type. Validation cost itself is dominated by URL and datetime
+parsing in pydantic-core, so first runs measure level to ~15% slower (a batch keeps its models
+alive until it returns, which the garbage collector pays for). A hash lookup that finds nothing
+backs off for PIPELINE_LOOKUP_BACKOFF batches, so a first run pays for almost no lookups; the gain
+is in not validating records whose hash is already stored.
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable
+
+from app.ingestion.base import NormalizedRecord
+from app.ingestion.hash_store import CachedHashStore, InMemoryStore
+from app.ingestion.pipeline import PIPELINE_WRITE_BATCH, IngestionPipeline
+from app.models.entities import AgendaItem, Document, Meeting, NewsItem
+
+RETRIEVED = datetime(2026, 1, 10, tzinfo=timezone.utc)
+
+
+def _payload(record_type: str, n: int) -> dict[str, Any]:
+    if record_type == "news_item":
+        return {"id": f"news:{n}", "title": f"County approves levy {n}", "snippet": "The council voted 5-2 to place the levy on the ballot.", "publisher": "Cascadia Daily", "published_at": "2026-01-09T18:30:00+00:00"}
+    if record_type == "meeting":
+        return {"id": f"meeting:{n}", "title": "County Council", "meeting_datetime": "2026-01-10T10:00:00+00:00", "location": "Council Chambers", "agenda_status": "Final"}
+    if record_type == "agenda_item":
+        return {"id": f"agenda:{n}", "meeting_id": f"meeting:{n // 20}", "title": f"AB2026-{n:04d} Ordinance amending the budget", "order": n % 20}
+    return {"id": f"document:{n}", "title": f"Staff report {n}", "text": "Staff recommends approval.", "page_count": 4, "citations": [{"page": 1, "line_start": 1, "line_end": 3}]}
+
+
+def synthetic_records(count: int, changed: float = 0.0, seed: int = 5) -> list[NormalizedRecord]:
+    rng = random.Random(seed)
+    types = ("news_item",) * 6 + ("meeting", "agenda_item", "agenda_item", "document")
+    records = []
+    for n in range(count):
+        record_type = types[n % len(types)]
+        content_hash = f"{n:064x}" if rng.random() >= changed else f"{n + count:064x}"
+        records.append(
+            NormalizedRecord(record_type, f"{record_type}:{n}", f"https://example.org/{record_type}/{n}", _payload(record_type, n), "bench", content_hash, RETRIEVED, "allow")
+        )
+    return records
+
+
+def legacy_store_many(pipeline: IngestionPipeline, records: list[NormalizedRecord]) -> None:
+    # The pre-change path, kept here for comparison.
+    models = {"meeting": Meeting, "agenda_item": AgendaItem, "document": Document, "news_item": NewsItem}
+    valid = []
+    for record in records:
+        prov = {"source_id": record.source_id, "content_hash": record.content_hash, "retrieved_at": record.retrieved_at, "robots_policy": record.robots_policy}
+        models[record.record_type].model_validate(record.payload | {"canonical_url": record.canonical_url, "provenance": prov})
+        valid.append((record.stable_id, record.payload, record.content_hash))
+    pipeline.store.upsert_many(valid)
+
+
+def measure(records: list[NormalizedRecord], batch: int, store_many: Callable[[list[NormalizedRecord]], Any]) -> float:
+    start = time.perf_counter()
+    for offset in range(0, len(records), batch):
+        store_many(records[offset : offset + batch])
+    return len(records) / (time.perf_counter() - start)
+
+
+def _pipeline() -> IngestionPipeline:
+    return IngestionPipeline(store=CachedHashStore(InMemoryStore()))
+
+
+def run_before(feed: list[NormalizedRecord], edited: list[NormalizedRecord], batch: int) -> tuple[float, float, float]:
+    pipeline = _pipeline()
+
+    def store_many(records: list[NormalizedRecord]) -> None:
+        legacy_store_many(pipeline, records)
+
+    return measure(feed, batch, store_many), measure(feed, batch, store_many), measure(edited, batch, store_many)
+
+
+def run_after(feed: list[NormalizedRecord], edited: list[NormalizedRecord], batch: int) -> tuple[float, float, float]:
+    pipeline = _pipeline()
+    return measure(feed, batch, pipeline._store_many), measure(feed, batch, pipeline._store_many), measure(edited, batch, pipeline._store_many)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--records", type=int, default=50_000)
+    parser.add_argument("--batch", type=int, default=PIPELINE_WRITE_BATCH)
+    parser.add_argument("--repeat", type=int, default=3, help="best of N, before and after interleaved")
+    args = parser.parse_args()
+
+    feed = synthetic_records(args.records)
+    edited = synthetic_records(args.records, changed=0.1)
+    before = after = (0.0, 0.0, 0.0)
+    for _ in range(args.repeat):
+        before = tuple(map(max, before, run_before(feed, edited, args.batch)))  # type: ignore[assignment]
+        after = tuple(map(max, after, run_after(feed, edited, args.batch)))  # type: ignore[assignment]
+
+    print(f"{args.records:,} records, batches of {args.batch}, records/s (best of {args.repeat})")
+    print(f"{'':8}{'first run':>14}{'re-run':>14}{'10% changed':>14}")
+    for label, rates in (("before", before), ("after", after)):
+        print(f"{label:8}" + "".join(f"{rate:>14,.0f}" for rate in rates))
+    print(f"{'speed-up':8}" + "".join(f"{a / b:>13.1f}x" for a, b in zip(after, before)))
+
+
+if __name__ == "__main__":
+    main()
@@ -2,7 +2,7 @@ import { apiFetch } from '../../../lib/api'
 
 export default async function DocumentDetail({ params }) {
   const id = decodeURIComponent(params.id)
-  const data = await apiFetch(`/documents/${encodeURIComponent(id)}`)
+  const data = await apiFetch(`/documents/${encodeURIComponent(id)}?include=text,tables`)
   const d = data.document
   return <div>
     <h1>{d.title}</h1>
@@ -11,5 +11,10 @@ export default async function DocumentDetail({ params }) {
       <pre style={{whiteSpace:'pre-wrap', maxHeight:500, overflow:'auto'}}>{d.text_content || 'No extracted text available.'}</pre>
       <p>Highlighted citations: {JSON.stringify(d.citations)}</p>
     </div>
+    {(data.tables || []).map((t)=><div className='card' key={t.table_index}>
+      <h2>Table {t.table_index + 1} (page {t.page}, lines {t.line_start}-{t.line_end})</h2>
+      <table><thead><tr>{t.headers.map((h)=><th key={h}>{h}</th>)}</tr></thead>
+        <tbody>{t.rows.map((r,i)=><tr key={i}>{t.headers.map((h)=><td key={h}>{r[h] ?? ''}</td>)}</tr>)}</tbody></table>
+    </div>)}
   </div>
 }
@@ -12,6 +12,9 @@ export default function JobsPage() {
     <div className='list'>{jobs.map((j)=><div key={j.id} className='card'>
       <strong>{j.source}</strong> · {j.mode} · {j.status}
       <div className='muted'>processed {j.processed_items}/{j.total_items}, failed {j.failed_items}, retries {j.retries}</div>
+      {j.status === 'running' && j.eta_seconds != null && <div className='muted'>
+        {j.throughput?.events ?? 0} events/s · ETA {Math.ceil(j.eta_seconds / 60)} min
+      </div>}
     </div>)}</div>
   </div>
 }
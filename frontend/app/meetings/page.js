@@ -8,14 +8,19 @@ export default function MeetingsPage() {
   const [from, setFrom] = useState('')
   const [to, setTo] = useState('')
   const [keyword, setKeyword] = useState('')
+  const [cursor, setCursor] = useState(null)
+  const [total, setTotal] = useState(0)
 
-  async function load() {
+  async function load(after) {
     const params = new URLSearchParams()
     if (from) params.set('from', from)
     if (to) params.set('to', to)
     if (keyword) params.set('keyword', keyword)
+    if (after) params.set('cursor', after)
     const data = await apiFetch(`/meetings?${params.toString()}`)
-    setItems(data.items)
+    setItems(after ? [...items, ...data.items] : data.items)
+    setCursor(data.next_cursor)
+    setTotal(data.estimated_total)
   }
 
   useEffect(() => { load() }, [])
@@ -26,7 +31,7 @@ export default function MeetingsPage() {
       <input type="date" value={from} onChange={(e)=>setFrom(e.target.value)} />
       <input type="date" value={to} onChange={(e)=>setTo(e.target.value)} />
       <input placeholder="keyword" value={keyword} onChange={(e)=>setKeyword(e.target.value)} />
-      <button onClick={load}>Apply Filters</button>
+      <button onClick={()=>load()}>Apply Filters</button>
     </div>
     {items.length === 0 ? <div className="card"><p>No data yet—run backfill.</p><Link href="/admin"><button>Run Backfill</button></Link></div> : null}
     <div className="list">
@@ -36,5 +41,7 @@ export default function MeetingsPage() {
         <p>{m.status}</p>
       </div>)}
     </div>
+    {items.length ? <p className="muted">Showing {items.length} of about {total}</p> : null}
+    {cursor ? <button onClick={()=>load(cursor)}>Load more</button> : null}
   </div>
 }
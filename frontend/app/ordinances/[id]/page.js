@@ -2,9 +2,20 @@ import { apiFetch } from '../../../lib/api'
 
 export default async function OrdinanceDetail({ params }) {
   const data = await apiFetch(`/ordinances/${params.id}`)
+  const diff = data.diff
   return <div>
     <h1>{data.ordinance.title}</h1>
     <div className='card'><h2>Versions</h2><ul>{data.versions.map((v)=><li key={v.id}>{v.title}</li>)}</ul></div>
-    <div className='card'><h2>Diff view</h2><p>{data.diff || 'No diff available yet.'}</p></div>
+    <div className='card'>
+      <h2>Diff view</h2>
+      {diff ? <div>
+        <p className='muted'>Version {diff.old_version} → {diff.new_version}</p>
+        <ul>{diff.changes.map((c, i)=><li key={i}>
+          <strong>{c.summary}</strong>
+          {c.old_text ? <p><del>{c.old_text}</del></p> : null}
+          {c.new_text ? <p><ins>{c.new_text}</ins></p> : null}
+        </li>)}</ul>
+      </div> : <p>No diff available yet.</p>}
+    </div>
   </div>
 }
@@ -6,11 +6,16 @@ import { apiFetch } from '../../lib/api'
 export default function SearchPage() {
   const [q, setQ] = useState('')
   const [results, setResults] = useState([])
+  const [cursor, setCursor] = useState(null)
+  const [total, setTotal] = useState(0)
 
-  async function run() {
+  async function run(after) {
     if (!q.trim()) return
-    const data = await apiFetch(`/search?q=${encodeURIComponent(q)}&types=meetings,agenda_items,ordinances,documents,news`)
-    setResults(data.results)
+    const page = after ? `&cursor=${encodeURIComponent(after)}` : ''
+    const data = await apiFetch(`/search?q=${encodeURIComponent(q)}&types=meetings,agenda_items,ordinances,documents,news${page}`)
+    setResults(after ? [...results, ...data.results] : data.results)
+    setCursor(data.next_cursor)
+    setTotal(data.estimated_total)
   }
 
   const grouped = results.reduce((acc, r) => { (acc[r.type] ||= []).push(r); return acc }, {})
@@ -19,7 +24,7 @@ export default function SearchPage() {
     <h1>Search</h1>
     <div className="card row">
       <input placeholder="Search council history..." value={q} onChange={(e)=>setQ(e.target.value)} onKeyDown={(e)=> e.key === 'Enter' ? run() : null} style={{minWidth:300}}/>
-      <button onClick={run}>Search</button>
+      <button onClick={()=>run()}>Search</button>
     </div>
     {Object.keys(grouped).map((type)=> <div className="card" key={type}>
       <h2>{type}</h2>
@@ -30,5 +35,7 @@ export default function SearchPage() {
         <small>Citations: {JSON.stringify(r.citations)}</small>
       </div>)}
     </div>)}
+    {results.length ? <p className="muted">Showing {results.length} of about {total}</p> : null}
+    {cursor ? <button onClick={()=>run(cursor)}>Load more</button> : null}
   </div>
 }
@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+
+
+def _escape(text: str) -> str:
+    return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+
+def build_pdf(pages: list[list[str | list[tuple[float, str]]]]) -> bytes:
+    """Minimal text PDF. Each page is a list of lines; a line is either a string or a list of (x, text) cells."""
+    objects = ['<< /Type /Catalog /Pages 2 0 R >>', '', '<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>']
+    page_refs = []
+    for lines in pages:
+        ops = ['BT', '/F1 10 Tf']
+        for row, line in enumerate(lines):
+            y = 750 - row * 14
+            for x, text in ([(72.0, line)] if isinstance(line, str) else line):
+                ops.append(f'1 0 0 1 {x} {y} Tm ({_escape(text)}) Tj')
+        ops.append('ET')
+        stream = '\n'.join(ops)
+        objects.append(f'<< /Length {len(stream.encode())} >>\nstream\n{stream}\nendstream')
+        objects.append(f'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>')
+        page_refs.append(f'{len(objects)} 0 R')
+    objects[1] = f'<< /Type /Pages /Kids [{" ".join(page_refs)}] /Count {len(page_refs)} >>'
+
+    out = bytearray(b'%PDF-1.4\n')
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f'{number} 0 obj\n{body}\nendobj\n'.encode()
+    xref = len(out)
+    out += f'xref\n0 {len(objects) + 1}\n0000000000 65535 f \n'.encode()
+    out += ''.join(f'{offset:010d} 00000 n \n' for offset in offsets).encode()
+    out += f'trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n'.encode()
+    return bytes(out)
+
+
+@pytest.fixture(autouse=True)
+def embedding_index(tmp_path, monkeypatch):
+    from app.search import embeddings
+
+    root = tmp_path / 'embeddings'
+    monkeypatch.setattr(embeddings, 'EMBEDDING_INDEX_PATH', root)
+    return root
+
+
+@pytest.fixture
+def make_pdf(tmp_path):
+    def _make(pages, name='doc.pdf') -> Path:
+        path = tmp_path / name
+        path.write_bytes(build_pdf(pages))
+        return path
+
+    return _make
@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import io
+import json
+
+from fastapi.testclient import TestClient
+
+from app.analysis.budget_delta import budget_delta, compare_budgets, iter_lines, parse_amount
+from app.main import app
+
+OLD_CSV = """fund,department,account,amount
+001,Parks,5100,"1,000.00"
+001,Parks,5200,250
+001,Sheriff,6100,5000
+002,Roads,7100,800
+002,Roads,7100,200
+"""
+
+NEW_ROWS = [
+    {"fund": "001", "department": "Parks", "account": "5100", "amount": 1200},
+    {"fund": "001", "department": "Sheriff", "account": "6100", "amount": 5000},
+    {"fund": "001", "department": "Sheriff", "account": "6200", "amount": 300},
+    {"fund": "002", "department": "Roads", "account": "7100", "amount": "(100)"},
+]
+
+
+def _compare(chunk_rows=65536):
+    return compare_budgets(iter_lines(io.StringIO(OLD_CSV)), iter_lines(io.StringIO("\n".join(json.dumps(r) for r in NEW_ROWS))), chunk_rows=chunk_rows)
+
+
+def test_composite_keys_report_added_removed_and_changed_lines():
+    comparison = _compare()
+    lines = {tuple(line["key"].values()): (line["status"], line["delta"]) for line in comparison.lines()}
+    assert lines == {
+        ("001", "Parks", "5100"): ("changed", 200.0),
+        ("001", "Parks", "5200"): ("removed", -250.0),
+        ("001", "Sheriff", "6200"): ("added", 300.0),
+        ("002", "Roads", "7100"): ("changed", -1100.0),
+    }
+    assert comparison.summary() == {
+        "lines": 5, "added": 1, "removed": 1, "changed": 2, "unchanged": 1, "before": 7250.0, "after": 6400.0, "delta": -850.0,
+    }
+
+
+def test_rollups_by_key_prefix_and_chunked_loading_agree():
+    assert _compare(chunk_rows=2).lines() == _compare().lines()
+    by_fund = {row["key"]["fund"]: row for row in _compare(chunk_rows=2).rollup(1)}
+    assert by_fund["001"]["before"] == 6250.0 and by_fund["001"]["after"] == 6500.0
+    assert (by_fund["001"]["added"], by_fund["001"]["removed"], by_fund["001"]["changed"]) == (1, 1, 1)
+    by_department = {tuple(row["key"].values()): row["delta"] for row in _compare().rollup(2)}
+    assert by_department == {("001", "Parks"): -50.0, ("001", "Sheriff"): 300.0, ("002", "Roads"): -1100.0}
+
+
+def test_legacy_budget_delta_keeps_its_original_semantics():
+    old = [{"account": "001-300", "amount": 5}, {"account": "001-100", "amount": 100}, {"account": "001-200", "amount": 40}]
+    new = [
+        {"account": "001-100", "amount": 90},
+        {"account": "001-100", "amount": 150, "provenance": {"doc": "v2"}},
+        {"account": "001-400", "amount": 0},
+        {"account": "001-300", "amount": 900},
+    ]
+    # Last duplicate wins, removed and zero-value added accounts are not reported, input order is kept.
+    assert budget_delta(old, new)["changes"] == [
+        {"account": "001-100", "before": 100.0, "after": 150.0, "delta": 50.0, "provenance": {"doc": "v2"}},
+        {"account": "001-300", "before": 5.0, "after": 900.0, "delta": 895.0, "provenance": {}},
+    ]
+
+
+def test_parse_amount_formats():
+    assert [parse_amount(v) for v in ("$1,234.50", "(20)", "", None, 7)] == [1234.5, -20.0, 0.0, 0.0, 7.0]
+
+
+def test_budget_books_are_streamed_and_compared(monkeypatch, tmp_path):
+    from app.api import routes
+
+    monkeypatch.setattr(routes, "BUDGET_BOOK_PATH", tmp_path)
+    client = TestClient(app)
+    old = client.put("/api/analysis/budget-books", content=OLD_CSV.encode(), headers={"content-type": "text/csv"}).json()["book"]
+    new = client.put("/api/analysis/budget-books", content="\n".join(json.dumps(r) for r in NEW_ROWS).encode()).json()["book"]
+
+    keys = ["fund", "department", "account"]
+    body = client.post("/api/analysis/budget-delta/books", json={"old": old, "new": new, "keys": keys, "rollups": [1, 3], "limit": 2}).json()
+    assert body["summary"]["changed"] == 2
+    assert [line["delta"] for line in body["lines"]] == [-1100.0, 300.0]
+    assert len(body["rollups"]["1"]) == 2 and len(body["rollups"]["3"]) == 5
+
+    assert client.post("/api/analysis/budget-delta/books", json={"old": "../etc", "new": new, "keys": keys}).status_code == 400
+    assert client.post("/api/analysis/budget-delta/books", json={"old": old, "new": new, "keys": keys, "rollups": [4]}).status_code == 400
+    assert client.post("/api/analysis/budget-delta/books", json={"old": old, "new": new}).status_code == 400
+    missing = client.post("/api/analysis/budget-delta/books", json={"old": old, "new": new, "keys": ["Fund"]})
+    assert missing.status_code == 400 and "missing field(s) Fund" in missing.json()["detail"]
+
+    monkeypatch.setattr(routes, "BOOK_MAX_BYTES", 16)
+    assert client.put("/api/analysis/budget-books", content=OLD_CSV.encode()).status_code == 413
+    assert client.put("/api/analysis/budget-books", content=iter([OLD_CSV[:10].encode(), OLD_CSV[10:].encode()])).status_code == 413
+
+
+def test_budget_delta_runs_over_stored_tables(monkeypatch):
+    from contextlib import contextmanager
+
+    from app.api import routes
+
+    stored = {
+        ('budget:v1', 0): [{'Account': '001-100', 'Amount': 100.0}, {'Account': '001-200', 'Amount': 40.0}],
+        ('budget:v2', 2): [{'Account': '001-100', 'Amount': 150.0}],
+    }
+
+    class Cursor:
+        def execute(self, query, params):
+            self.row = {'rows': stored[params]} if params in stored else None
+
+        def fetchone(self):
+            return self.row
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *_):
+            return None
+
+    class Conn:
+        def cursor(self):
+            return Cursor()
+
+    @contextmanager
+    def conn_cm(*_):
+        yield Conn()
+
+    monkeypatch.setattr(routes, 'get_conn', conn_cm)
+    client = TestClient(app)
+    req = {'old': {'document_id': 'budget:v1', 'table_index': 0}, 'new': {'document_id': 'budget:v2', 'table_index': 2}, 'keys': ['Account'], 'amount_field': 'Amount'}
+    body = client.post('/api/analysis/budget-delta/tables', json=req).json()
+    assert [(line['key']['Account'], line['status'], line['delta']) for line in body['lines']] == [('001-100', 'changed', 50.0), ('001-200', 'removed', -40.0)]
+
+    req['new']['table_index'] = 9
+    assert client.post('/api/analysis/budget-delta/tables', json=req).status_code == 404
+
+    # Malformed references are rejected before a connection is taken.
+    monkeypatch.setattr(routes, 'get_conn', None)
+    for bad in ({'table_index': 0}, {'document_id': 'budget:v2', 'table_index': 'second'}, 'budget:v2', None):
+        assert client.post('/api/analysis/budget-delta/tables', json={**req, 'new': bad}).status_code == 400
@@ -0,0 +1,52 @@
+from benchmarks.clause_alignment import synthetic_documents
+
+from app.analysis.clause_alignment import align_clauses, word_diff
+from app.analysis.semantic_diff import semantic_diff
+
+
+def test_moved_and_modified_clause_is_aligned_with_similarity():
+    old = {
+        "2.1": "The owner shall maintain the sidewalk adjacent to the parcel within thirty days of notice",
+        "2.2": "The director shall publish an annual report",
+    }
+    new = {
+        "2.2": "The director shall publish an annual report",
+        "4.3": "The owner shall maintain the sidewalk adjacent to the parcel within sixty days of notice",
+    }
+    (change,) = semantic_diff(old, new)
+    assert change.change_type == "moved_modified"
+    assert (change.old_clause_id, change.clause_id) == ("2.1", "4.3")
+    assert 0.5 <= change.similarity < 1
+    assert change.word_diff == [{"op": "replace", "old_start": 11, "old": "thirty", "new_start": 11, "new": "sixty"}]
+
+
+def test_same_id_rewrite_is_modified_and_unrelated_clauses_are_added_and_removed():
+    old = {"1": "Parking is prohibited on Main Street", "2": "Dogs must be leashed in parks"}
+    new = {"1": "Bicycles may use the bus lane", "3": "Fireworks require a permit"}
+    kinds = {(a.change_type, a.old_id, a.new_id) for a in align_clauses(old, new)}
+    assert kinds == {("modified", "1", "1"), ("added", None, "3"), ("removed", "2", None)}
+
+
+def test_duplicate_boilerplate_moves_pair_one_to_one():
+    old = {"1": "Reserved.", "2": "Reserved.", "3": "Fees are set by resolution"}
+    new = {"5": "Reserved.", "6": "Reserved.", "3": "Fees are set by resolution"}
+    alignments = align_clauses(old, new)
+    assert sorted((a.old_id, a.new_id) for a in alignments) == [("1", "5"), ("2", "6")]
+    assert {a.change_type for a in alignments} == {"moved"}
+
+
+def test_synthetic_rewrite_recovers_planted_changes():
+    old, new, expected = synthetic_documents(1000, seed=3)
+    counts: dict[str, int] = {}
+    for alignment in align_clauses(old, new):
+        counts[alignment.change_type] = counts.get(alignment.change_type, 0) + 1
+    assert counts["moved"] == expected["moved"]
+    assert counts["modified"] == expected["modified"]
+    assert abs(counts["moved_modified"] - expected["moved_modified"]) <= 2
+
+
+def test_word_diff_reports_insertions_and_deletions():
+    assert word_diff("a b c", "a c d") == [
+        {"op": "delete", "old_start": 1, "old": "b", "new_start": 1, "new": ""},
+        {"op": "insert", "old_start": 3, "old": "", "new_start": 2, "new": "d"},
+    ]
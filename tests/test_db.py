@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+from contextlib import contextmanager
+
+from fastapi.testclient import TestClient
+
+from app import db
+from app.main import app
+
+
+class FakePool:
+    max_size = 10
+
+    def __init__(self):
+        self.checkouts = 0
+
+    @contextmanager
+    def connection(self):
+        self.checkouts += 1
+        yield 'conn'
+
+    def get_stats(self):
+        return {'pool_min': 1, 'pool_max': 10, 'pool_size': 6, 'pool_available': 2, 'requests_num': 40}
+
+
+def test_get_conn_borrows_from_process_wide_pool(monkeypatch):
+    pool = FakePool()
+    monkeypatch.setattr(db, '_pool', pool)
+
+    for _ in range(3):
+        with db.get_conn() as conn:
+            assert conn == 'conn'
+
+    assert pool.checkouts == 3
+    assert 'options' not in db._connect_kwargs()
+
+
+def test_statement_timeout_is_scoped_to_the_checkout(monkeypatch):
+    executed = []
+
+    class Conn:
+        def execute(self, query, params):
+            executed.append((query, params))
+
+    class Pool(FakePool):
+        @contextmanager
+        def connection(self):
+            yield Conn()
+
+    monkeypatch.setattr(db, '_pool', Pool())
+    with db.get_conn():
+        pass
+    with db.get_conn(5000):
+        pass
+
+    assert executed == [("select set_config('statement_timeout', %s, true)", ('5000',))]
+
+
+def test_pool_stats_report_saturation(monkeypatch):
+    monkeypatch.setattr(db, '_pool', FakePool())
+
+    stats = db.pool_stats()
+
+    assert list(stats) == ['sync']
+    assert stats['sync']['in_use'] == 4
+    assert stats['sync']['saturation'] == 0.4
+    assert stats['sync']['requests_waiting'] == 0
+
+
+def test_metrics_endpoint_exposes_pool_stats(monkeypatch):
+    import app.api.routes as api_routes
+    import app.main as app_main
+
+    monkeypatch.setattr(app_main, 'init_db', lambda: None)
+    monkeypatch.setattr(api_routes, 'pool_stats', lambda: {'sync': {'saturation': 0.5}})
+    with TestClient(app) as client:
+        response = client.get('/api/metrics')
+
+    assert response.status_code == 200
+    assert response.json()['db_pool'] == {'sync': {'saturation': 0.5}}
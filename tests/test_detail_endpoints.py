@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+from contextlib import contextmanager
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+
+
+def _client(monkeypatch, row):
+    from app.api import http_cache, routes
+    import app.main as app_main
+
+    executed = []
+
+    class Cursor:
+        def execute(self, query, params=None):
+            executed.append((' '.join(query.split()), params))
+
+        def fetchone(self):
+            return row
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *_):
+            return None
+
+    class Conn:
+        def cursor(self):
+            return Cursor()
+
+    @contextmanager
+    def conn_cm(*_):
+        yield Conn()
+
+    monkeypatch.setattr(routes, 'get_conn', conn_cm)
+    monkeypatch.setattr(http_cache, 'current_generation', lambda: 41)
+    monkeypatch.setattr(app_main, 'init_db', lambda: None)
+    return TestClient(app), executed
+
+
+def test_meeting_detail_is_one_query_with_projection_and_etag(monkeypatch):
+    row = {'meeting': {'id': 5, 'title': 'Council'}, 'agenda_items': [], 'documents': [{'id': 'meeting:5:agenda'}], 'votes': []}
+    client, executed = _client(monkeypatch, row)
+
+    resp = client.get('/api/meetings/5')
+    assert resp.status_code == 200
+    assert resp.json() == row
+    assert len(executed) == 1
+    query = executed[0][0]
+    assert 'json_agg' in query and 'select *' not in query
+    assert 'raw' not in query and 'text_content' not in query
+    etag = resp.headers['etag']
+    assert etag.startswith('"g41-')
+
+    again = client.get('/api/meetings/5', headers={'If-None-Match': etag})
+    assert again.status_code == 304
+    assert len(executed) == 1
+
+    with_raw = client.get('/api/meetings/5?include=raw,text')
+    assert with_raw.headers['etag'] != etag
+    assert ', raw' in executed[-1][0] and 'text_content' in executed[-1][0]
+    assert client.get('/api/meetings/5?include=everything').status_code == 400
+
+
+def test_detail_endpoints_404_and_ordinance_shape(monkeypatch):
+    client, _ = _client(monkeypatch, {'document': None})
+    assert client.get('/api/documents/meeting:1:agenda').status_code == 404
+
+    diff = {'old_version': '1', 'new_version': '2', 'changes': [{'clause_id': '3', 'change_type': 'modified'}]}
+    client, executed = _client(monkeypatch, {'ordinance': {'id': 7}, 'versions': [], 'text_versions': [], 'votes': [], 'diff': diff})
+    data = client.get('/api/ordinances/7').json()
+    assert data['diff'] == diff
+    assert 'from change_events' in executed[0][0]
+    assert 'lag(version_label) over (order by seq)' in executed[0][0]
+    assert "'[]'::json" in executed[0][0]
+    assert executed[0][1] == {'id': 7}
@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+import numpy as np
+import pytest
+
+from app.search.embeddings import HashingEmbedder, VectorIndex, embed_texts, open_index_for_write, semantic_search
+
+TOPICS = ['jail facility construction bond', 'housing ordinance rental inspection', 'comprehensive plan growth boundary', 'parks levy trail funding']
+
+
+def test_hashing_embedder_is_deterministic_and_normalised():
+    embedder = HashingEmbedder(dim=64)
+    vectors = embedder.embed(['Jail facility bond', 'jail FACILITY bond', ''])
+    assert vectors.dtype == np.float32
+    assert np.allclose(vectors[0], vectors[1])
+    assert np.isclose(np.linalg.norm(vectors[0]), 1.0)
+    assert not vectors[2].any()
+
+
+def test_vector_index_persists_appends_rows_and_matches_exact_with_ivf(tmp_path):
+    embedder = HashingEmbedder()
+    keys = [f'doc:{i}' for i in range(400)]
+    texts = [f'{TOPICS[i % 4]} item {i}' for i in range(400)]
+    with open_index_for_write(tmp_path) as index:
+        index.add(keys, embedder.embed(texts))
+        index.remove(['doc:0'])
+        index.add(['doc:new'], embedder.embed(['jail facility construction bond item new']))
+
+    reopened = VectorIndex(tmp_path)
+    assert len(reopened) == 400 and reopened.rows['doc:new'] == 400
+    queries = embedder.embed(['rental inspection ordinance', 'trail levy'])
+    exact = reopened.search(queries, k=5)
+    assert all(int(key.split(':')[1]) % 4 == 1 for key, _ in exact[0])
+    assert all(int(key.split(':')[1]) % 4 == 3 for key, _ in exact[1])
+
+    with open_index_for_write(tmp_path) as index:
+        index.build_ivf(nlist=8)
+    approx = VectorIndex(tmp_path).search(queries, k=5, nprobe=8)
+    for got, want in zip(approx, exact):
+        assert [score for _, score in got] == pytest.approx([score for _, score in want])
+
+
+def test_readers_map_read_only_and_keep_their_snapshot_until_reopened(tmp_path):
+    embedder = HashingEmbedder()
+    with open_index_for_write(tmp_path) as index:
+        index.add(['a', 'b', 'c'], embedder.embed(TOPICS[:3]))
+    reader = VectorIndex(tmp_path)
+    assert reader._matrix.mode == 'r'
+    with pytest.raises(RuntimeError):
+        reader.add(['d'], embedder.embed(TOPICS[3:]))
+    before = reader.search(embedder.embed([TOPICS[0]]), k=1)
+
+    with open_index_for_write(tmp_path) as index:
+        index.add(['a'], embedder.embed([TOPICS[3]]))
+        index.remove(['b', 'c'])
+        index.add(['d'], embedder.embed([TOPICS[1]]))
+
+    assert reader.search(embedder.embed([TOPICS[0]]), k=1) == before
+    reopened = VectorIndex(tmp_path)
+    assert reopened.keys == ['a', 'd'] and reopened.vectors_name != reader.vectors_name
+    assert not reader.vectors_path.exists()
+    assert reopened.search(embedder.embed([TOPICS[3]]), k=1)[0][0][0] == 'a'
+
+
+def test_embed_texts_replaces_a_documents_chunks():
+    embed_texts([('chunk:d1:0', 'jail bond'), ('chunk:d1:1', 'housing levy'), ('agenda_item:5', 'jail facility')])
+    embed_texts([('chunk:d1:0', 'parks trail')], remove_prefixes=['chunk:d1:'])
+
+    assert set(VectorIndex().rows) == {'chunk:d1:0', 'agenda_item:5'}
+    assert semantic_search('jail facility', k=1)[0][0] == 'agenda_item:5'
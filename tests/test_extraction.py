@@ -0,0 +1,203 @@
+from __future__ import annotations
+
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+from app.ingestion import extraction
+from app.ingestion.extraction import run_extraction
+
+
+class RecordingCursor:
+    def __init__(self, log):
+        self.log = log
+
+    def execute(self, query, params=None):
+        self.log.append((' '.join(query.split()), params))
+
+    @contextmanager
+    def copy(self, statement):
+        rows = []
+        yield SimpleNamespace(write_row=rows.append)
+        self.log.append((statement, rows))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        return None
+
+
+def recording_conn(log):
+    @contextmanager
+    def conn_cm(*_):
+        yield SimpleNamespace(cursor=lambda: RecordingCursor(log))
+
+    return conn_cm
+
+
+def copied(log, table):
+    return [row for statement, rows in log if statement.startswith(f'copy {table} ') for row in rows]
+
+
+def test_store_chunks_page_ranges_parsed_in_worker_processes(monkeypatch, make_pdf):
+    from app.search.embeddings import HashingEmbedder, VectorIndex
+
+    path = str(make_pdf([['Call to order'], [], ['Budget amendment', 'Fund 001'], ['Adjourn']]))
+    log = []
+    monkeypatch.setattr(extraction, 'get_conn', recording_conn(log))
+
+    with ProcessPoolExecutor(max_workers=2, mp_context=multiprocessing.get_context('spawn')) as pool:
+        window = extraction.PageWindow(pool, [path], size=2, pages_per_task=1)
+        extraction._store('meeting:1:agenda', path, window.pages(0), VectorIndex(writable=True), HashingEmbedder())
+
+    assert [(row[0], row[1]) for row in copied(log, 'extract_pages')] == [(1, 'Call to order'), (3, 'Budget amendment\nFund 001'), (4, 'Adjourn')]
+    chunks = copied(log, 'document_chunks')
+    assert [(row[2], row[3], row[4]) for row in chunks] == [(1, 1, 1), (3, 1, 2), (4, 1, 1)]
+    assert [row[1] for row in chunks] == [0, 1, 2]
+    _, params = next((query, params) for query, params in log if query.startswith('update documents set text_content'))
+    assert params[0].obj[1] == {'page': 3, 'line_start': 1, 'line_end': 2}
+    assert copied(log, 'document_tables') == []
+
+
+def test_run_extraction_streams_documents_and_marks_failures(monkeypatch, make_pdf, tmp_path):
+    good = make_pdf([['Public hearing on jail facility'], [], ['Second reading']], name='good.pdf')
+    batches = [[{'document_id': 'meeting:1:agenda', 'object_path': str(good)}, {'document_id': 'meeting:1:minutes', 'object_path': str(tmp_path / 'missing.pdf')}], []]
+    log = []
+    published = []
+    monkeypatch.setattr(extraction, 'get_conn', recording_conn(log))
+    monkeypatch.setattr(extraction, '_claim', lambda batch_size: batches.pop(0))
+    monkeypatch.setattr(extraction, '_publish', lambda: published.append(True))
+    monkeypatch.setattr(extraction, 'PAGES_PER_TASK', 1)
+
+    result = run_extraction(workers=1)
+
+    assert (result.processed, result.failed) == (1, 1)
+    # One page per flush: pages are staged and chunked as they arrive.
+    assert [len(rows) for statement, rows in log if statement.startswith('copy extract_pages ')] == [1, 1, 0]
+    assert [row[0] for row in copied(log, 'extract_pages')] == [1, 3]
+    assert [(row[1], row[2]) for row in copied(log, 'document_chunks')] == [(0, 1), (1, 3)]
+    update, params = next((query, params) for query, params in log if query.startswith('update documents set text_content'))
+    assert "string_agg(text, E'\\n\\n' order by page) from extract_pages" in update
+    assert [c['page'] for c in params[0].obj] == [1, 3]
+    marks = [params for query, params in log if query.startswith('update document_extract_queue')]
+    assert [(p[1], p[3]) for p in marks] == [('done', 'meeting:1:agenda'), ('failed', 'meeting:1:minutes')]
+    assert published == [True]
+
+    from app.search.embeddings import VectorIndex
+
+    assert list(VectorIndex().rows) == ['chunk:meeting:1:agenda:0', 'chunk:meeting:1:agenda:1']
+
+
+def test_page_window_bounds_ranges_in_flight_and_skips_discarded_documents(make_pdf):
+    paths = [str(make_pdf([['a'], ['b'], ['c']], name=f'{n}.pdf')) for n in range(3)]
+    submitted = []
+    in_flight = []
+
+    class Executor:
+        def submit(self, fn, path, start, stop):
+            in_flight.append(len(window._queue))
+            future = Future()
+            future.set_result([(page + 1, f'{paths.index(path)}:{page}', []) for page in range(start, stop)])
+            submitted.append((paths.index(path), start))
+            return future
+
+    window = extraction.PageWindow(Executor(), paths, size=2, pages_per_task=1)
+    first = window.pages(0)
+    next(first)
+    assert submitted == [(0, 0), (0, 1)]
+    next(first)
+    window.discard(0)
+    assert [text for _, text, _ in window.pages(1)] == ['1:0', '1:1', '1:2']
+    assert [text for _, text, _ in window.pages(2)] == ['2:0', '2:1', '2:2']
+    assert max(in_flight) < 2
+
+
+def test_failed_document_requeues_when_its_object_changed_while_claimed(monkeypatch):
+    log = []
+    monkeypatch.setattr(extraction, 'get_conn', recording_conn(log))
+    extraction._fail('meeting:1:agenda', '/objects/ab/cd/old', 'bad xref')
+
+    query, params = log[-1]
+    assert query.startswith("update document_extract_queue set status = case when object_path = %s then %s else 'pending' end")
+    assert params == ('/objects/ab/cd/old', 'failed', 'bad xref', 'meeting:1:agenda')
+
+
+def test_backfill_queues_unchunked_documents_without_resetting_claimed_rows(monkeypatch):
+    from contextlib import contextmanager
+
+    executed = []
+
+    class Cursor:
+        rowcount = 7
+
+        def execute(self, query, params=None):
+            executed.append(' '.join(query.split()))
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *_):
+            return None
+
+    class Conn:
+        def cursor(self):
+            return Cursor()
+
+    @contextmanager
+    def conn_cm(*_):
+        yield Conn()
+
+    monkeypatch.setattr(extraction, 'get_conn', conn_cm)
+    assert extraction.enqueue_backfill() == 7
+
+    (query,) = executed
+    assert query.startswith('insert into document_extract_queue (document_id, object_path) select d.id, d.object_path from documents d')
+    assert 'not exists (select 1 from document_chunks c where c.document_id = d.id)' in query
+    assert query.endswith("where document_extract_queue.status in ('done', 'failed')")
+
+
+def test_chunk_pages_splits_on_lines_within_pages():
+    from app.analysis.document_processing import chunk_pages
+
+    text, chunks = chunk_pages([(1, 'WHEREAS the council\nfinds that\nhousing'), (2, '   '), (3, 'Section 1\nSection 2')], chunk_chars=32)
+
+    assert [(c.page, c.line_start, c.line_end) for c in chunks] == [(1, 1, 2), (1, 3, 3), (3, 1, 2)]
+    assert all(text[c.char_start : c.char_end] == c.text for c in chunks)
+
+
+def test_iter_chunks_packs_sentences_with_overlap_and_exact_spans():
+    from app.analysis.document_processing import chunk_pages
+
+    page = 'The council met. It approved the budget! Was it wise? Nobody knows.\n\nSecond paragraph starts here. It has two sentences.\nA third line.'
+    text, chunks = chunk_pages([(4, page)], chunk_chars=60, overlap_chars=20)
+
+    assert [c.text for c in chunks] == [
+        'The council met. It approved the budget! Was it wise?',
+        'Was it wise? Nobody knows.\n\nSecond paragraph starts here.',
+        'It has two sentences.\nA third line.',
+    ]
+    assert [(c.page, c.line_start, c.line_end) for c in chunks] == [(4, 1, 1), (4, 1, 3), (4, 3, 4)]
+    assert all(text[c.char_start : c.char_end] == c.text for c in chunks)
+
+
+def test_iter_chunks_consumes_pages_lazily():
+    from app.analysis.document_processing import iter_chunks
+
+    consumed = []
+
+    def pages():
+        for page_no in range(1, 1000):
+            consumed.append(page_no)
+            yield page_no, f'Page {page_no} text.'
+
+    first = next(iter_chunks(pages(), chunk_chars=100, overlap_chars=0))
+    assert first.page == 1 and consumed == [1]
+
+
+def test_process_document_text_cites_form_feed_pages():
+    from app.analysis.document_processing import process_document_text
+
+    extracted = process_document_text('Call to order.\fBudget hearing.\nFund 001.')
+    assert extracted.citations == [{'page': 1, 'line_start': 1, 'line_end': 1}, {'page': 2, 'line_start': 1, 'line_end': 2}]
@@ -0,0 +1,154 @@
+from __future__ import annotations
+
+from datetime import datetime, timezone
+
+from app.ingestion.base import NormalizedRecord
+from app.ingestion.hash_store import CachedHashStore, HashCache, InMemoryStore, PostgresHashStore, SQLiteHashStore
+from app.ingestion.pipeline import IngestionPipeline
+
+
+def test_sqlite_store_survives_reopen_and_reports_changes(tmp_path):
+    path = tmp_path / 'hashes.sqlite3'
+    store = SQLiteHashStore(path)
+    assert store.upsert_many([('a', {'n': 1}, 'h1'), ('b', {'n': 2}, 'h2'), ('a', {'n': 1}, 'h1')]) == [True, True, False]
+    store.close()
+
+    reopened = SQLiteHashStore(path)
+    assert reopened.upsert_many([('a', {'n': 1}, 'h1'), ('b', {'n': 3}, 'h3'), ('c', {}, 'h4')]) == [False, True, True]
+    assert reopened.get_hashes(['a', 'b', 'missing']) == {'a': 'h1', 'b': 'h3'}
+
+
+def test_cache_short_circuits_backend_for_known_hashes():
+    calls = []
+
+    class Backend(InMemoryStore):
+        def upsert_many(self, records):
+            calls.append([r[0] for r in records])
+            return super().upsert_many(records)
+
+    store = CachedHashStore(Backend(), HashCache(max_entries=2))
+    assert store.upsert_many([('a', {}, 'h1'), ('b', {}, 'h2')]) == [True, True]
+    assert store.upsert_many([('a', {}, 'h1'), ('b', {}, 'changed')]) == [False, True]
+    assert calls == [['a', 'b'], ['b']]
+    store.upsert_many([('c', {}, 'h3')])
+    assert 'a' not in store.cache.entries  # least recently used entry evicted at max_entries
+    assert store.stats()['hits'] == 1
+
+
+def test_cache_keeps_the_last_hash_of_an_id_repeated_in_a_batch():
+    store = CachedHashStore(InMemoryStore())
+    store.upsert_many([('a', {}, 'h1')])
+    assert store.upsert_many([('a', {}, 'edited'), ('a', {}, 'h1')]) == [False, True]
+    assert store.get_hashes(['a']) == {'a': 'h1'}
+
+
+def test_postgres_store_checks_a_batch_in_one_statement(monkeypatch):
+    from contextlib import contextmanager
+
+    from app.ingestion import hash_store
+
+    executed = []
+
+    class Cursor:
+        def execute(self, query, params):
+            executed.append(params)
+
+        def fetchall(self):
+            return [{'stable_id': 'new'}]
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *_):
+            return None
+
+    class Conn:
+        def cursor(self):
+            return Cursor()
+
+    @contextmanager
+    def conn_cm():
+        yield Conn()
+
+    monkeypatch.setattr(hash_store, 'get_conn', conn_cm)
+    changed = PostgresHashStore().upsert_many([('old', {}, 'h1'), ('new', {'t': 'x'}, 'h2')])
+    assert changed == [False, True]
+    assert executed == [(['old', 'new'], ['h1', 'h2'], ['{}', '{"t": "x"}'])]
+
+
+def meeting_record(n: int, content_hash: str | None = None) -> NormalizedRecord:
+    payload = {'id': f'meeting:{n}', 'title': 'County Council', 'meeting_datetime': '2026-01-10T10:00:00+00:00', 'agenda_status': 'Final'}
+    return NormalizedRecord('meeting', f'meeting:{n}', 'https://example.org', payload, 'test', content_hash or f'hash{n}', datetime.now(timezone.utc), 'allow')
+
+
+def test_pipeline_recognises_records_after_restart(tmp_path):
+    path = tmp_path / 'hashes.sqlite3'
+    first = IngestionPipeline(store=CachedHashStore(SQLiteHashStore(path)))
+    assert first._store_many([meeting_record(1), meeting_record(2)]) == ['inserted', 'inserted']
+
+    restarted = IngestionPipeline(store=CachedHashStore(SQLiteHashStore(path)))
+    assert restarted._store_many([meeting_record(1), meeting_record(2, content_hash='edited')]) == ['duplicates', 'inserted']
+
+
+def test_unchanged_checks_cache_then_backend_once():
+    lookups = []
+
+    class Backend(InMemoryStore):
+        def get_hashes(self, stable_ids):
+            lookups.append(sorted(stable_ids))
+            return super().get_hashes(stable_ids)
+
+    backend = Backend()
+    backend.upsert_many([('a', {}, 'h1'), ('b', {}, 'h2')])
+    store = CachedHashStore(backend)
+    assert store.unchanged([('a', 'h1'), ('b', 'edited'), ('c', 'h3')]) == {'a'}
+    assert store.unchanged([('a', 'h1'), ('b', 'h2')]) == {'a', 'b'}
+    assert lookups == [['a', 'b', 'c'], ['b']]
+    assert store.stats()['hits'] == 1
+
+
+def test_pipeline_skips_validation_for_known_hashes_and_batches_the_rest(monkeypatch):
+    store = CachedHashStore(InMemoryStore())
+    store.upsert_many([(r.stable_id, r.payload, r.content_hash) for r in (meeting_record(1), meeting_record(2))])
+    pipeline = IngestionPipeline(store=store)
+    # Only items a batch reports as failing are validated again on their own.
+    singles = []
+    validate = pipeline._validate
+    monkeypatch.setattr(pipeline, '_validate', lambda record: singles.append(record.stable_id) or validate(record))
+
+    # Same hash as stored: accepted as a duplicate without validating the (now invalid) payload.
+    known = meeting_record(1)
+    known.payload.pop('meeting_datetime')
+    broken = meeting_record(3)
+    broken.payload['unexpected'] = True
+    statuses = pipeline._store_many([known, meeting_record(2, content_hash='edited'), broken, meeting_record(4)])
+    assert statuses == ['duplicates', 'inserted', 'errors', 'inserted']
+    assert [q.stable_id for q in pipeline.quarantine] == ['meeting:3']
+    assert pipeline.quarantine[0].reason.startswith('1 validation error for Meeting')
+    assert singles == ['meeting:3']
+
+
+def test_pipeline_backs_off_lookups_that_find_nothing_until_duplicates_return(monkeypatch):
+    from app.ingestion import pipeline as pipeline_module
+
+    monkeypatch.setattr(pipeline_module, 'PIPELINE_LOOKUP_BACKOFF', 5)
+    pipeline = IngestionPipeline(store=CachedHashStore(InMemoryStore()))
+    lookups = []
+    unchanged = pipeline.store.unchanged
+    monkeypatch.setattr(pipeline.store, 'unchanged', lambda pairs: lookups.append(len(pairs)) or unchanged(pairs))
+
+    for n in range(1, 4):
+        assert pipeline._store_many([meeting_record(n)]) == ['inserted']
+    assert lookups == [1]
+    # A re-run during the backoff is still counted as duplicates and turns lookups back on.
+    assert pipeline._store_many([meeting_record(1)]) == ['duplicates']
+    assert lookups == [1]
+    assert pipeline._store_many([meeting_record(2)]) == ['duplicates']
+    assert lookups == [1, 1]
+
+
+def test_pipeline_writes_an_id_repeated_with_different_hashes():
+    pipeline = IngestionPipeline(store=CachedHashStore(InMemoryStore()))
+    pipeline._store_many([meeting_record(1)])
+    assert pipeline._store_many([meeting_record(1, content_hash='edited'), meeting_record(1)]) == ['duplicates', 'inserted']
+    assert pipeline.store.get_hashes(['meeting:1']) == {'meeting:1': 'hash1'}
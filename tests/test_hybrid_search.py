@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import threading
+import time
+
+import pytest
+
+from app.search.hybrid import hybrid_search, reciprocal_rank_fusion
+
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    fused = reciprocal_rank_fusion(
+        {
+            'lexical': [{'id': 'meeting:1', 'title': 'Budget'}, {'id': 'ordinance:7', 'title': 'Jail'}],
+            'semantic': [{'id': 'ordinance:7', 'title': 'Jail'}, {'id': 'doc:3', 'title': 'Packet'}],
+        },
+        k=60,
+    )
+    assert [r['id'] for r in fused] == ['ordinance:7', 'meeting:1', 'doc:3']
+    assert fused[0]['ranks'] == {'lexical': 2, 'semantic': 1}
+    assert fused[0]['score'] == 1 / 62 + 1 / 61
+
+
+def test_hybrid_search_returns_partial_results_when_a_retriever_blows_its_budget():
+    release = threading.Event()
+
+    def slow():
+        release.wait(2)
+        return [{'id': 'late'}]
+
+    try:
+        response = hybrid_search(
+            {'lexical': (lambda: [{'id': 'meeting:1'}], 500), 'semantic': (slow, 50), 'broken': (lambda: 1 / 0, 500)},
+            limit=10,
+        )
+    finally:
+        release.set()
+
+    assert [r['id'] for r in response['results']] == ['meeting:1']
+    assert response['partial']
+    assert response['timings']['lexical']['status'] == 'ok'
+    assert response['timings']['semantic']['status'] == 'timeout'
+    assert response['timings']['broken']['status'] == 'error: ZeroDivisionError'
+    assert response['timings']['total']['ms'] < 500
+
+
+def test_semantic_retriever_applies_type_and_date_filters(monkeypatch):
+    from contextlib import contextmanager
+    from datetime import datetime
+
+    from app.search import hybrid, semantic
+
+    executed = []
+
+    class Cursor:
+        def execute(self, query, params):
+            executed.append((query, params))
+
+        def fetchall(self):
+            return [{'document_id': 'meeting:4:agenda', 'chunk_index': 0, 'page': 1, 'line_start': 1, 'line_end': 2, 'char_start': 0, 'char_end': 40, 'snippet': 'jail bond', 'title': 'Agenda', 'date': None}]
+
+    class Conn:
+        @contextmanager
+        def cursor(self):
+            yield Cursor()
+
+    steps = []
+
+    @contextmanager
+    def conn_cm(*args):
+        steps.append(('conn', *args))
+        yield Conn()
+
+    def search(q, k):
+        steps.append(('search', k))
+        return [('agenda_item:9', 0.9), ('chunk:meeting:4:agenda:0', 0.8)]
+
+    monkeypatch.setattr(hybrid, 'get_conn', conn_cm)
+    monkeypatch.setattr(semantic, 'semantic_search', search)
+    from_dt = datetime(2024, 1, 1)
+    results = hybrid.semantic_retriever('jail', {'documents', 'meetings'}, from_dt, None, 10, 500)()
+
+    assert [r['id'] for r in results] == ['meeting:4:agenda']
+    # The vector search runs before a connection is taken, which carries the API statement timeout.
+    assert steps == [('search', 30), ('conn', hybrid.DB_STATEMENT_TIMEOUT_MS)]
+    ((query, params),) = executed
+    assert 'join document_chunks c' in query
+    assert 'm.meeting_date >= %(from_dt)s' in query
+    assert params['from_dt'] == from_dt and params['to_dt'] is None
+
+
+def test_expired_semantic_work_takes_no_connection(monkeypatch):
+    from app.search import hybrid, semantic
+
+    def no_conn(*_):
+        raise AssertionError('connection taken after the budget passed')
+
+    monkeypatch.setattr(hybrid, 'get_conn', no_conn)
+    monkeypatch.setattr(semantic, 'semantic_search', lambda q, k: [('agenda_item:9', 0.9)])
+    response = hybrid_search({'semantic': (hybrid.semantic_retriever('jail', {'agenda_items'}, None, None, 10, 0), 0)}, limit=10)
+    assert response['timings']['semantic']['status'] == 'timeout'
+
+
+def test_work_queued_past_its_budget_is_dropped(monkeypatch):
+    from concurrent.futures import ThreadPoolExecutor
+
+    from app.search import hybrid
+
+    monkeypatch.setattr(hybrid, '_executor', ThreadPoolExecutor(max_workers=1))
+    release = threading.Event()
+    started = threading.Event()
+    ran = []
+
+    def stuck():
+        started.set()
+        release.wait(2)
+        return []
+
+    hybrid_search({'stuck': (stuck, 20)}, limit=10)
+    started.wait(2)
+    # Queued behind the abandoned retriever; by the time a worker frees up its budget is gone.
+    future = hybrid._executor.submit(hybrid._timed, lambda: ran.append(True) or [], time.perf_counter() + 0.01)
+    time.sleep(0.05)
+    release.set()
+    with pytest.raises(TimeoutError):
+        future.result(timeout=2)
+    assert ran == []
@@ -47,14 +47,19 @@ class FakeCursor:
 
     def execute(self, query, params=None):
         q = query.lower()
-        if 'from meetings' in q:
-            self._rows = [{'id': 22, 'title': 'Housing Ordinance Hearing', 'date': None, 'score': 0.5, 'snippet': 'Housing <b>ordinance</b> hearing'}]
+        if q.startswith('explain'):
+            self._rows = [{'QUERY PLAN': [{'Plan': {'Plan Rows': 1}}]}]
+        elif 'from meetings' in q:
+            self._rows = [{'kind': 'meeting', 'id': '22', 'title': 'Housing Ordinance Hearing', 'date': None, 'date_key': '-infinity', 'score': 0.5, 'snippet': 'Housing <b>ordinance</b> hearing'}]
         else:
             self._rows = []
 
     def fetchall(self):
         return self._rows
 
+    def fetchone(self):
+        return self._rows[0] if self._rows else None
+
     def __enter__(self):
         return self
 
@@ -68,7 +73,7 @@ class FakeConn:
 
 
 @contextmanager
-def fake_conn_cm():
+def fake_conn_cm(*_):
     yield FakeConn()
 
 
@@ -77,6 +82,7 @@ def test_search_endpoint_returns_real_shape(monkeypatch):
     import app.main as app_main
 
     monkeypatch.setattr(routes, 'get_conn', fake_conn_cm)
+    monkeypatch.setattr(routes, 'current_generation', lambda: 1)
     monkeypatch.setattr(app_main, 'init_db', lambda: None)
     client = TestClient(app)
     resp = client.get('/api/search?q=ordinance&types=meetings')
@@ -85,3 +91,94 @@ def test_search_endpoint_returns_real_shape(monkeypatch):
     assert data['results']
     assert data['results'][0]['title'] == 'Housing Ordinance Hearing'
     assert data['results'][0]['citations']
+    assert data['next_cursor'] is None
+    assert data['estimated_total'] == 1
+    assert '_date_key' not in data['results'][0]
+
+
+def test_search_cache_hit_does_not_borrow_a_connection(monkeypatch):
+    from app.api import routes
+    import app.main as app_main
+
+    checkouts = []
+
+    def counting_conn_cm(*args):
+        checkouts.append(args)
+        return fake_conn_cm(*args)
+
+    monkeypatch.setattr(routes, 'get_conn', counting_conn_cm)
+    monkeypatch.setattr(routes, 'current_generation', lambda: 7)
+    monkeypatch.setattr(app_main, 'init_db', lambda: None)
+    client = TestClient(app)
+    first = client.get('/api/search?q=cache+hit+probe&types=meetings').json()
+    assert len(checkouts) == 1
+    assert client.get('/api/search?q=cache+hit+probe&types=meetings').json() == first
+    assert len(checkouts) == 1
+
+
+def test_unified_search_ranks_in_one_query_with_top_k_headlines():
+    from datetime import datetime
+
+    from app.search.postgres import build_search_sql, unified_search
+
+    sql = build_search_sql({'meetings', 'agenda_items', 'ordinances', 'documents'}, datetime(2024, 1, 1), None)
+    hits, _, outer = sql.partition('top as (')
+    assert hits.count(' as kind,') == 4
+    assert 'ts_headline' not in hits
+    assert outer.count('ts_headline') == 4
+    assert hits.count('>= %(from_dt)s') == 4
+    assert '<= %(to_dt)s' not in sql
+    assert 'coalesce(mt.passed_date, mt.intro_date) >= %(from_dt)s' in hits
+    assert 'from document_chunks c' in hits
+    assert 'text_content is null' not in hits
+    assert 'not exists (select 1 from document_chunks c where c.document_id = x.id and c.search @@ q.tsq)' in hits
+    assert 'c.chunk_index = top.chunk' in outer
+
+    cur = FakeCursor()
+    calls = []
+    cur.execute = lambda query, params=None: calls.append(params)
+    assert unified_search(cur, 'ordinance', {'news'}) == []
+    assert calls == []
+
+
+def test_meetings_keyset_pagination_round_trips_cursor(monkeypatch):
+    from app.api import routes
+    import app.main as app_main
+
+    executed = []
+
+    class MeetingsCursor(FakeCursor):
+        def execute(self, query, params=None):
+            executed.append((query, params))
+            if query.startswith('explain'):
+                self._rows = [{'QUERY PLAN': [{'Plan': {'Plan Rows': 5000}}]}]
+            else:
+                self._rows = [
+                    {'id': 9 - i, 'title': f'Meeting {i}', 'meeting_date': None, '_date_key': f'2024-01-0{9 - i} 00:00:00+00'}
+                    for i in range(params['limit'])
+                ]
+
+    class MeetingsConn:
+        def cursor(self):
+            return MeetingsCursor()
+
+    @contextmanager
+    def conn_cm(*_):
+        yield MeetingsConn()
+
+    monkeypatch.setattr(routes, 'get_conn', conn_cm)
+    monkeypatch.setattr(app_main, 'init_db', lambda: None)
+    client = TestClient(app)
+
+    first = client.get('/api/meetings?limit=2').json()
+    assert [m['id'] for m in first['items']] == [9, 8]
+    assert '_date_key' not in first['items'][0]
+    assert first['estimated_total'] == 5000
+    assert 'count(' not in executed[-1][0]
+
+    client.get(f"/api/meetings?limit=2&cursor={first['next_cursor']}")
+    query, params = executed[-2]
+    assert '< (%(after_date)s::timestamptz, %(after_id)s)' in query
+    assert (params['after_date'], params['after_id']) == ('2024-01-08 00:00:00+00', 8)
+
+    assert client.get('/api/meetings?cursor=not-a-cursor').status_code == 400
@@ -0,0 +1,550 @@
+from __future__ import annotations
+
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+from app.ingestion import legistar_ingest
+from app.ingestion.fetcher import HostRateLimiter
+from app.ingestion.legistar_ingest import LEGISTAR_BASE, run_legistar_ingest, run_matter_version_backfill
+from app.ingestion.progress import JobProgress
+from app.storage import objects
+from app.storage.objects import ObjectStore
+
+
+class FakeResponse:
+    def __init__(self, payload, code=200, content=b'', headers=None):
+        self._payload = payload
+        self.status_code = code
+        self.content = content
+        self.headers = headers or {}
+
+    def iter_content(self, chunk_size):
+        for start in range(0, len(self.content), chunk_size):
+            yield self.content[start:start + chunk_size]
+
+    def close(self):
+        return None
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise RuntimeError('http error')
+
+    def json(self):
+        return self._payload
+
+
+class LegistarSession:
+    def __init__(self, events, items, matters, delays=None, changed_matters=None, versions=None, texts=None):
+        self.events = events
+        self.items = items
+        self.matters = matters
+        self.changed_matters = changed_matters or []
+        self.versions = versions or {}
+        self.texts = texts or {}
+        self.delays = delays or {}
+        self.calls: list[str] = []
+        self.params: dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    def get(self, url, **kwargs):
+        with self._lock:
+            self.calls.append(url)
+            self.params[url.removeprefix(LEGISTAR_BASE)] = kwargs.get('params', {})
+        path = url.removeprefix(LEGISTAR_BASE)
+        time.sleep(self.delays.get(path, 0))
+        if not url.startswith(LEGISTAR_BASE):
+            return FakeResponse(None, code=404)
+        if kwargs.get('params', {}).get('$skip', 0):
+            return FakeResponse([])
+        if path == '/events':
+            return FakeResponse(self.events)
+        if path == '/matters':
+            return FakeResponse(self.changed_matters)
+        if path.startswith('/events/'):
+            return FakeResponse(self.items.get(int(path.split('/')[2]), []))
+        if path.endswith('/versions'):
+            return FakeResponse(self.versions.get(int(path.split('/')[2]), []))
+        if '/texts/' in path:
+            return FakeResponse(self.texts[(int(path.split('/')[2]), path.split('/')[4])])
+        if path.startswith('/matters/'):
+            return FakeResponse(self.matters[int(path.split('/')[2])])
+        return FakeResponse([])
+
+
+class RecordingCopy:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def write_row(self, row):
+        self.rows.append(row)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        return None
+
+
+class RecordingCursor:
+    rowcount = 0
+
+    def __init__(self, log, results):
+        self.log = log
+        self.results = results
+        self._rows = []
+
+    def copy(self, statement):
+        rows: list[tuple] = []
+        self.log.append((statement, rows))
+        return RecordingCopy(rows)
+
+    def execute(self, query, params=None):
+        normalized = ' '.join(query.split()).lower()
+        self.log.append((normalized, params))
+        self._rows = next((rows for prefix, rows in self.results.items() if normalized.startswith(prefix)), [])
+
+    def fetchall(self):
+        return self._rows
+
+    def fetchone(self):
+        return self._rows[0] if self._rows else None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        return None
+
+
+class RecordingConn:
+    def __init__(self, log, results):
+        self.log = log
+        self.results = results
+
+    def cursor(self):
+        return RecordingCursor(self.log, self.results)
+
+
+def patch_db(monkeypatch, results=None):
+    log: list[tuple[str, tuple]] = []
+    jobs: list[dict] = []
+
+    results = {'update data_generation': [{'generation': 1}], **(results or {})}
+
+    @contextmanager
+    def fake_conn():
+        yield RecordingConn(log, results)
+
+    monkeypatch.setattr(legistar_ingest, 'get_conn', fake_conn)
+    monkeypatch.setattr(legistar_ingest, 'create_job', lambda source, mode: 7)
+    monkeypatch.setattr(legistar_ingest, 'update_job', lambda job_id, **kw: jobs.append(kw))
+    return log, jobs
+
+
+def written_ids(log, table):
+    return [row[0] for statement, rows in log if statement.startswith(f'copy stage_{table} ') for row in rows]
+
+
+def test_ingest_fans_out_fetches_but_writes_in_event_order(monkeypatch, tmp_path):
+    log, jobs = patch_db(monkeypatch)
+    monkeypatch.setattr(legistar_ingest, 'OBJECT_STORAGE_PATH', tmp_path)
+    session = LegistarSession(
+        events=[{'EventId': i, 'EventBodyName': 'County Council', 'EventAgendaFile': f'https://files.example/{i}.pdf'} for i in (1, 2, 3)],
+        items={
+            1: [{'EventItemId': 11, 'EventItemMatterId': 500}, {'EventItemId': 12, 'EventItemMatterId': 500}],
+            2: [{'EventItemId': 21}],
+            3: [{'EventItemId': 31, 'EventItemMatterId': 501}],
+        },
+        matters={500: [{'MatterId': 500, 'MatterName': 'Housing'}], 501: [{'MatterId': 501, 'MatterName': 'Budget'}]},
+        delays={'/events/1/EventItems': 0.2},
+    )
+
+    result = run_legistar_ingest(mode='backfill', session=session, workers=4, rate_limit=0)
+
+    assert written_ids(log, 'meetings') == [1, 2, 3]
+    assert written_ids(log, 'agenda_items') == [11, 12, 21, 31]
+    assert (result.meetings, result.agenda_items, result.documents) == (3, 4, 3)
+    assert jobs[-1]['processed_items'] == 3
+    assert jobs[-1]['status'] == 'completed'
+    assert session.calls.count(f'{LEGISTAR_BASE}/matters/500') == 1
+
+
+def test_failed_run_marks_job_failed_with_unprocessed_events(monkeypatch, tmp_path):
+    _log, jobs = patch_db(monkeypatch)
+    monkeypatch.setattr(legistar_ingest, 'OBJECT_STORAGE_PATH', tmp_path)
+
+    def broken_validators(cur, meeting_ids):
+        raise RuntimeError('documents table unavailable')
+
+    monkeypatch.setattr(legistar_ingest, '_load_document_validators', broken_validators)
+    session = LegistarSession(events=[{'EventId': i} for i in (1, 2, 3)], items={}, matters={})
+
+    with pytest.raises(RuntimeError):
+        run_legistar_ingest(mode='backfill', session=session, workers=2, rate_limit=0)
+
+    assert jobs[-1]['status'] == 'failed'
+    assert jobs[-1]['message'] == 'documents table unavailable'
+    assert (jobs[-1]['processed_items'], jobs[-1]['failed_items']) == (0, 3)
+
+
+def test_host_rate_limiter_spaces_requests_per_host():
+    limiter = HostRateLimiter(per_second=20)
+    started = time.monotonic()
+    for _ in range(3):
+        limiter.wait('https://webapi.legistar.com/v1/whatcomwa/events')
+    limiter.wait('https://files.example/agenda.pdf')
+    elapsed = time.monotonic() - started
+    assert 0.09 <= elapsed < 0.3
+
+
+def test_matter_cache_dedupes_fetches_and_skips_unchanged_matters(monkeypatch):
+    stored = [{'id': 500, 'last_modified': '2024-03-01T10:00:00'}]
+    log, jobs = patch_db(monkeypatch, {"select id, raw->>'matterlastmodifiedutc'": stored})
+    session = LegistarSession(
+        events=[{'EventId': 1}, {'EventId': 2}],
+        items={
+            1: [{'EventItemId': 11, 'EventItemMatterId': 500}, {'EventItemId': 12, 'EventItemMatterId': 501}],
+            2: [{'EventItemId': 21, 'EventItemMatterId': 500}, {'EventItemId': 22, 'EventItemMatterId': 501}],
+        },
+        matters={
+            500: [{'MatterId': 500, 'MatterName': 'Housing', 'MatterLastModifiedUtc': '2024-03-01T10:00:00'}],
+            501: [{'MatterId': 501, 'MatterName': 'Budget', 'MatterLastModifiedUtc': '2024-05-01T10:00:00'}],
+        },
+    )
+
+    result = run_legistar_ingest(mode='incremental', session=session, workers=2, rate_limit=0)
+
+    assert sum(1 for url in session.calls if url.removeprefix(LEGISTAR_BASE + '/matters/').isdigit()) == 2
+    assert [url for url in session.calls if url.endswith('/versions')] == [f'{LEGISTAR_BASE}/matters/501/versions']
+    assert written_ids(log, 'matters') == [501]
+    assert result.matters == 1
+    progress = [j for j in jobs if 'processed_items' in j][-1]
+    assert (progress['matter_cache_hits'], progress['matter_cache_misses']) == (3, 1)
+
+
+def test_bulk_writer_batches_rows_and_merges_in_foreign_key_order(monkeypatch):
+    log, _jobs = patch_db(monkeypatch)
+    session = LegistarSession(
+        events=[{'EventId': i} for i in range(1, 6)],
+        items={i: [{'EventItemId': i * 10, 'EventItemMatterId': 900}] for i in range(1, 6)},
+        matters={900: [{'MatterId': 900, 'MatterName': 'Comprehensive Plan'}]},
+    )
+
+    run_legistar_ingest(mode='backfill', session=session, workers=2, rate_limit=0, batch_size=2)
+
+    copies = [statement.split()[1] for statement, _rows in log if statement.startswith('copy ')]
+    assert copies == [
+        'stage_meetings', 'stage_matters', 'stage_agenda_items',
+        'stage_meetings', 'stage_agenda_items',
+        'stage_meetings', 'stage_agenda_items',
+        'stage_agenda_items',
+    ]
+    merges = [query for query, _params in log if query.startswith('insert into meetings(')]
+    assert merges and all('is distinct from (excluded.raw)' in q for q in merges)
+    assert written_ids(log, 'meetings') == [1, 2, 3, 4, 5]
+
+
+def test_table_specs_copy_every_required_column_and_staging_keeps_defaults(monkeypatch):
+    import re
+
+    from app import db
+    from app.ingestion.bulk_writer import TABLES, BulkUpserter
+
+    schema = []
+
+    class SchemaCursor:
+        def execute(self, query, params=None):
+            schema.append(query)
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *_):
+            return None
+
+    @contextmanager
+    def schema_conn(*_):
+        yield SimpleNamespace(cursor=SchemaCursor)
+
+    monkeypatch.setattr(db, 'get_conn', schema_conn)
+    db.init_db()
+    ddl = '\n'.join(schema)
+    for spec in TABLES.values():
+        body = re.search(rf'create table if not exists {spec.table} \((.*?)\n\s*\);', ddl, re.S).group(1)
+        required = set()
+        for line in body.splitlines():
+            line = line.strip().rstrip(',')
+            name = line.split(' ', 1)[0]
+            if not line or name in ('primary', 'unique', 'constraint'):
+                continue
+            if ('not null' in line or 'primary key' in line) and not any(word in line for word in ('default', 'generated', 'serial')):
+                required.add(name)
+        assert required <= set(spec.columns), (spec.table, required - set(spec.columns))
+
+    log = []
+    BulkUpserter(RecordingCursor(log, {}))._ensure_staging()
+    assert all('including defaults' in query for query, _ in log)
+
+
+def test_job_progress_coalesces_updates_and_reports_throughput():
+    now = [0.0]
+    updates: list[dict] = []
+    progress = JobProgress(7, update=lambda job_id, **kw: updates.append(kw), flush_seconds=10, flush_items=3, clock=lambda: now[0])
+    progress.set_total(10)
+
+    for _ in range(5):
+        now[0] += 1
+        progress.advance('events')
+        progress.advance('items', 4)
+        progress.maybe_flush()
+    now[0] += 10
+    progress.maybe_flush()
+
+    assert [u.get('processed_items') for u in updates] == [None, 3, 5]
+    assert updates[1]['stage_counts']['items'] == 12
+    assert updates[1]['throughput']['events'] == 1.0
+    assert updates[1]['eta_seconds'] == 7
+
+
+def test_incremental_run_filters_on_watermarks_and_advances_them(monkeypatch):
+    state = [{'last_modified': '2024-05-01T00:00:00', 'matters_last_modified': '2024-04-01T00:00:00'}]
+    log, _jobs = patch_db(monkeypatch, {'select last_modified, matters_last_modified': state})
+    session = LegistarSession(
+        events=[{'EventId': 9, 'EventLastModifiedUtc': '2024-05-02T08:30:00.5'}],
+        items={9: [{'EventItemId': 90, 'EventItemMatterId': 700}]},
+        matters={},
+        changed_matters=[
+            {'MatterId': 700, 'MatterName': 'Jail facility', 'MatterLastModifiedUtc': '2024-05-02T09:00:00'},
+            {'MatterId': 701, 'MatterName': 'Fee schedule', 'MatterLastModifiedUtc': '2024-04-20T09:00:00'},
+        ],
+    )
+
+    result = run_legistar_ingest(mode='incremental', session=session, workers=2, rate_limit=0)
+
+    assert "EventLastModifiedUtc ge datetime'2024-05-01T00:00:00'" in session.params['/events']['$filter']
+    assert "MatterLastModifiedUtc ge datetime'2024-04-01T00:00:00'" in session.params['/matters']['$filter']
+    assert not any(url.removeprefix(LEGISTAR_BASE + '/matters/').isdigit() for url in session.calls)
+    assert written_ids(log, 'matters') == [700, 701]
+    assert result.matters == 2
+    sync = [params for query, params in log if query.startswith('insert into source_sync_state')]
+    assert sync == [('whatcom_legistar_api', '2024-05-02T08:30:00.5', '2024-05-02T09:00:00')]
+    queries = [query for query, _ in log]
+    assert queries.index('update data_generation set generation = generation + 1, updated_at = now() returning generation') > queries.index(
+        next(q for q in queries if q.startswith('insert into source_sync_state'))
+    )
+
+
+def test_matter_watermark_ignores_matters_fetched_for_events(monkeypatch):
+    # 702 is fetched through an agenda item and is newer than anything /matters returned; moving
+    # the watermark past it would skip unreferenced matters changed in between.
+    state = [{'last_modified': '2024-05-01T00:00:00', 'matters_last_modified': '2024-04-01T00:00:00'}]
+    log, _jobs = patch_db(monkeypatch, {'select last_modified, matters_last_modified': state})
+    session = LegistarSession(
+        events=[{'EventId': 9, 'EventLastModifiedUtc': '2024-05-02T08:30:00'}],
+        items={9: [{'EventItemId': 90, 'EventItemMatterId': 702}]},
+        matters={702: {'MatterId': 702, 'MatterName': 'Road levy', 'MatterLastModifiedUtc': '2024-06-01T00:00:00'}},
+        changed_matters=[{'MatterId': 701, 'MatterName': 'Fee schedule', 'MatterLastModifiedUtc': '2024-04-20T09:00:00'}],
+    )
+
+    run_legistar_ingest(mode='incremental', session=session, workers=2, rate_limit=0)
+
+    assert written_ids(log, 'matters') == [701, 702]
+    sync = [params for query, params in log if query.startswith('insert into source_sync_state')]
+    assert sync == [('whatcom_legistar_api', '2024-05-02T08:30:00', '2024-04-20T09:00:00')]
+
+
+def test_first_run_starts_the_matter_watermark_at_the_newest_matter(monkeypatch):
+    log, _jobs = patch_db(monkeypatch)
+    session = LegistarSession(
+        events=[{'EventId': 9, 'EventLastModifiedUtc': '2024-05-02T08:30:00'}],
+        items={9: [{'EventItemId': 90, 'EventItemMatterId': 702}]},
+        matters={702: {'MatterId': 702, 'MatterName': 'Road levy', 'MatterLastModifiedUtc': '2024-06-01T00:00:00'}},
+        changed_matters=[{'MatterId': 703, 'MatterName': 'Zoning', 'MatterLastModifiedUtc': '2024-05-30T00:00:00'}],
+    )
+
+    run_legistar_ingest(mode='incremental', session=session, workers=2, rate_limit=0)
+
+    assert session.params['/matters'] == {'$top': 1, '$skip': 0, '$orderby': 'MatterLastModifiedUtc desc'}
+    assert written_ids(log, 'matters') == [702]
+    sync = [params for query, params in log if query.startswith('insert into source_sync_state')]
+    assert sync == [('whatcom_legistar_api', '2024-05-02T08:30:00', '2024-05-30T00:00:00')]
+
+
+def test_bounded_backfill_leaves_watermarks_untouched(monkeypatch):
+    log, _jobs = patch_db(monkeypatch)
+    session = LegistarSession(events=[{'EventId': 1, 'EventLastModifiedUtc': '2024-05-02T08:30:00'}], items={}, matters={})
+
+    run_legistar_ingest(mode='backfill', from_date='2020-01-01', session=session, workers=1, rate_limit=0)
+
+    assert "EventLastModifiedUtc" not in session.params['/events']['$filter']
+    sync = [params for query, params in log if query.startswith('insert into source_sync_state')]
+    assert sync == [('whatcom_legistar_api', None, None)]
+
+
+def test_new_matter_text_versions_are_diffed_once_against_stored_predecessor(monkeypatch):
+    stored_v1 = [{'matter_id': 700, 'version_key': '11', 'version_label': '1', 'seq': 1, 'sections': [
+        {'id': '1', 'text': 'Fees are set at $10.', 'line_start': 1, 'line_end': 1},
+        {'id': '2', 'text': 'This ordinance takes effect immediately.', 'line_start': 2, 'line_end': 2},
+    ]}]
+    state = [{'last_modified': '2024-05-01T00:00:00', 'matters_last_modified': '2024-04-01T00:00:00'}]
+    log, _jobs = patch_db(monkeypatch, {'select last_modified, matters_last_modified': state, 'select matter_id, version_key': stored_v1})
+    session = LegistarSession(
+        events=[],
+        items={},
+        matters={},
+        changed_matters=[{'MatterId': 700, 'MatterName': 'Fee schedule', 'MatterLastModifiedUtc': '2024-05-02T09:00:00'}],
+        versions={700: [{'Key': '11', 'Value': '1'}, {'Key': '12', 'Value': '2'}]},
+        texts={(700, '12'): {'MatterTextPlain': 'Section 1. Fees are set at $15.\nSection 2. This ordinance takes effect immediately.\nSection 3. Repealer.'}},
+    )
+
+    result = run_legistar_ingest(mode='incremental', session=session, workers=2, rate_limit=0)
+
+    assert result.matter_versions == 1
+    assert f'{LEGISTAR_BASE}/matters/700/texts/11' not in session.calls
+    assert written_ids(log, 'matter_versions') == ['700:12']
+    events = next(rows for statement, rows in log if 'copy stage_change_events' in statement)
+    assert [(row[6], row[7], row[11].obj) for row in events] == [
+        ('1', 'modified', [{'version': '2', 'line_start': 1, 'line_end': 1}]),
+        ('3', 'added', [{'version': '2', 'line_start': 3, 'line_end': 3}]),
+    ]
+    assert {row[0] for row in events} == {'700:11:12:0', '700:11:12:1'}
+    assert {row[5] for row in events} == {2}
+    # change_events.created_at is left to its default, which the staging table must carry.
+    assert ('create temp table if not exists stage_change_events (like change_events including defaults) on commit drop', None) in log
+
+
+def test_version_backfill_fetches_matters_without_stored_versions(monkeypatch):
+    log, _jobs = patch_db(monkeypatch, {'select m.id from matters m': [{'id': 800}]})
+    session = LegistarSession(
+        events=[],
+        items={},
+        matters={},
+        versions={800: [{'Key': '21', 'Value': '1'}]},
+        texts={(800, '21'): {'MatterTextPlain': 'Section 1. Fees are set at $10.'}},
+    )
+
+    assert run_matter_version_backfill(session=session, workers=2, rate_limit=0) == 1
+
+    select = next(query for query, _ in log if query.startswith('select m.id from matters m'))
+    assert 'not exists (select 1 from matter_versions v where v.matter_id = m.id)' in select
+    assert written_ids(log, 'matter_versions') == ['800:21']
+    assert any(query.startswith('update data_generation') for query, _ in log)
+
+
+def test_new_versions_are_numbered_after_stored_ones_even_when_labelled_earlier():
+    from app.ingestion.matter_versions import MatterVersion, build_version_rows
+
+    stored = {'12': MatterVersion(key='12', label='2', seq=1, sections=[{'id': '1', 'text': 'Fees are $15.', 'line_start': 1, 'line_end': 1}])}
+    fetched = [
+        MatterVersion(key='13', label='3', text='Section 1. Fees are $20.'),
+        MatterVersion(key='11', label='1', text='Section 1. Fees are $10.'),
+    ]
+
+    rows = build_version_rows(700, stored, fetched)
+
+    assert [(row[2], row[4]) for row in rows.versions] == [('11', 2), ('13', 3)]
+    assert sorted({(row[0].rsplit(':', 1)[0], row[5]) for row in rows.change_events}) == [('700:11:13', 3), ('700:12:11', 2)]
+
+
+class PdfSession:
+    def __init__(self, body, etag='"v1"'):
+        self.body = body
+        self.etag = etag
+        self.headers_seen: list[dict] = []
+
+    def get(self, url, **kwargs):
+        headers = kwargs.get('headers', {})
+        self.headers_seen.append(headers)
+        if headers.get('If-None-Match') == self.etag:
+            return FakeResponse(None, code=304)
+        return FakeResponse(None, content=self.body, headers={'ETag': self.etag, 'Last-Modified': 'Tue, 02 Apr 2024 10:00:00 GMT'})
+
+
+def test_document_download_skips_rewrite_when_content_hash_matches(monkeypatch, tmp_path):
+    monkeypatch.setattr(legistar_ingest, 'DOWNLOAD_CHUNK_SIZE', 4)
+    store = ObjectStore(tmp_path)
+    session = PdfSession(b'%PDF-1.4 agenda packet', etag='"v1"')
+
+    first = legistar_ingest._download_document('https://files.example/a.pdf', store, session)
+    assert not first.unchanged
+    assert Path(first.path).read_bytes() == b'%PDF-1.4 agenda packet'
+    mtime = Path(first.path).stat().st_mtime_ns
+
+    session.etag = '"v2"'
+    stored = {'object_path': first.path, 'sha256': first.sha256, 'etag': '"v1"', 'last_modified': first.last_modified}
+    second = legistar_ingest._download_document('https://files.example/a.pdf', store, session, stored)
+
+    assert second.unchanged and second.sha256 == first.sha256
+    assert session.headers_seen[-1] == {'If-None-Match': '"v1"', 'If-Modified-Since': 'Tue, 02 Apr 2024 10:00:00 GMT'}
+    assert Path(first.path).stat().st_mtime_ns == mtime
+    assert [sha for sha, _path in store.iter_blobs()] == [first.sha256]
+
+
+def test_document_download_not_modified_reuses_stored_object(tmp_path):
+    stored = {'object_path': str(tmp_path / 'blobs' / 'ab' / 'cd' / 'abcd'), 'sha256': 'abcd', 'etag': '"v1"', 'last_modified': None}
+
+    result = legistar_ingest._download_document('https://files.example/a.pdf', ObjectStore(tmp_path), PdfSession(b'', etag='"v1"'), stored)
+
+    assert result.unchanged and result.path == stored['object_path'] and result.sha256 == 'abcd'
+
+
+def test_document_download_without_stored_object_is_unconditional(tmp_path):
+    stored = {'object_path': None, 'sha256': None, 'etag': '"v1"', 'last_modified': 'Tue, 02 Apr 2024 10:00:00 GMT'}
+    session = PdfSession(b'%PDF-1.4 minutes', etag='"v1"')
+
+    result = legistar_ingest._download_document('https://files.example/m.pdf', ObjectStore(tmp_path), session, stored)
+
+    assert session.headers_seen == [{}]
+    assert result.path and Path(result.path).read_bytes() == b'%PDF-1.4 minutes'
+
+
+def test_unchanged_document_persists_refreshed_validators(monkeypatch, tmp_path):
+    blob = ObjectStore(tmp_path).put_stream([b'%PDF-1.4'])
+    stored = [{'id': 'meeting:4:agenda', 'object_path': str(blob.path), 'sha256': blob.sha256, 'etag': '"v1"', 'last_modified': None}]
+    log, _jobs = patch_db(monkeypatch, {'select id, object_path': stored})
+    monkeypatch.setattr(legistar_ingest, 'OBJECT_STORAGE_PATH', tmp_path)
+
+    class Session(LegistarSession):
+        def get(self, url, **kwargs):
+            if url.startswith('https://files.example/'):
+                return FakeResponse(None, content=b'%PDF-1.4', headers={'ETag': '"v2"', 'Last-Modified': 'Wed, 03 Apr 2024 10:00:00 GMT'})
+            return super().get(url, **kwargs)
+
+    session = Session(events=[{'EventId': 4, 'EventAgendaFile': 'https://files.example/4.pdf'}], items={}, matters={})
+    run_legistar_ingest(mode='backfill', session=session, workers=1, rate_limit=0)
+
+    assert written_ids(log, 'documents') == []
+    updates = [params for query, params in log if query.startswith('update documents d set raw')]
+    assert updates == [(['meeting:4:agenda'], ['"v2"'], ['Wed, 03 Apr 2024 10:00:00 GMT'])]
+
+
+def test_downloaded_documents_are_queued_for_extraction(monkeypatch, tmp_path):
+    log, _jobs = patch_db(monkeypatch)
+    monkeypatch.setattr(legistar_ingest, 'OBJECT_STORAGE_PATH', tmp_path)
+
+    class Session(LegistarSession):
+        def get(self, url, **kwargs):
+            if url.startswith('https://files.example/'):
+                return FakeResponse(None, content=b'%PDF-1.4')
+            return super().get(url, **kwargs)
+
+    session = Session(events=[{'EventId': 4, 'EventAgendaFile': 'https://files.example/4.pdf'}], items={}, matters={})
+    run_legistar_ingest(mode='backfill', session=session, workers=1, rate_limit=0)
+
+    assert log.index(('select pg_advisory_xact_lock_shared(%s)', (objects.GC_LOCK_KEY,))) < log.index(next(entry for entry in log if entry[0].startswith('copy stage_blobs ')))
+    documents = [row for statement, rows in log if statement.startswith('copy stage_documents ') for row in rows]
+    assert documents[0][0] == 'meeting:4:agenda' and documents[0][6] is None
+    sha = written_ids(log, 'blobs')[0]
+    assert documents[0][5] == str(ObjectStore(tmp_path).path_for(sha))
+    # blobs.created_at is left to its default, which the staging table must carry.
+    assert ('create temp table if not exists stage_blobs (like blobs including defaults) on commit drop', None) in log
+    assert next(statement for statement, _ in log if statement.startswith('copy stage_blobs ')) == 'copy stage_blobs (sha256, size) from stdin'
+    assert [row[:2] for statement, rows in log if statement.startswith('copy stage_document_blobs ') for row in rows] == [('meeting:4:agenda', sha)]
+    assert written_ids(log, 'document_extract_queue') == ['meeting:4:agenda']
+    merge = next(query for query, _ in log if query.startswith('insert into document_extract_queue('))
+    assert "status=case when document_extract_queue.status = 'running' then 'running' else excluded.status end" in merge
@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+import os
+from contextlib import contextmanager
+from datetime import timedelta
+
+from app.storage import objects
+from app.storage.objects import ObjectStore
+
+
+def test_put_stream_shards_by_hash_and_dedupes(tmp_path):
+    store = ObjectStore(tmp_path)
+
+    first = store.put_stream([b'%PDF-1.4 ', b'agenda'])
+    second = store.put_bytes(b'%PDF-1.4 agenda')
+
+    assert first.created and not second.created
+    assert first.path == second.path == tmp_path / 'blobs' / first.sha256[:2] / first.sha256[2:4] / first.sha256
+    assert first.size == 15
+    assert list(store.tmp_root.iterdir()) == []
+
+
+def test_collect_garbage_removes_unreferenced_and_orphaned_blobs(monkeypatch, tmp_path):
+    store = ObjectStore(tmp_path)
+    kept = store.put_bytes(b'kept')
+    unreferenced = store.put_bytes(b'unreferenced')
+    orphan = store.put_bytes(b'orphan')
+    fresh_orphan = store.put_bytes(b'fresh')
+    old = 1_000_000
+    for blob in (kept, unreferenced, orphan):
+        os.utime(blob.path, (old, old))
+
+    class Cursor:
+        def execute(self, query, params=None):
+            if query.startswith('select pg_try_advisory_xact_lock'):
+                self.rows = [{'locked': True}]
+                return
+            self.rows = [{'sha256': kept.sha256}, {'sha256': unreferenced.sha256}] if query.startswith('select sha256') else [{'sha256': unreferenced.sha256}]
+            assert 'delete from blobs' in query or query.startswith('select sha256')
+
+        def fetchall(self):
+            return self.rows
+
+        def fetchone(self):
+            return self.rows[0]
+
+    class Conn:
+        def cursor(self):
+            @contextmanager
+            def _cursor():
+                yield Cursor()
+            return _cursor()
+
+    @contextmanager
+    def fake_conn():
+        yield Conn()
+
+    monkeypatch.setattr(objects, 'get_conn', fake_conn)
+    result = store.collect_garbage(grace=timedelta(hours=1))
+
+    assert result == {'unreferenced': 1, 'orphaned_files': 1, 'stale_tmp': 0}
+    assert {sha for sha, _path in store.iter_blobs()} == {kept.sha256, fresh_orphan.sha256}
+
+
+def test_collect_garbage_skips_while_an_ingest_holds_the_lock(monkeypatch, tmp_path):
+    store = ObjectStore(tmp_path)
+    blob = store.put_bytes(b'being ingested')
+    os.utime(blob.path, (1_000_000, 1_000_000))
+    executed = []
+
+    class Cursor:
+        def execute(self, query, params=None):
+            executed.append(query)
+
+        def fetchone(self):
+            return {'locked': False}
+
+    class Conn:
+        def cursor(self):
+            @contextmanager
+            def _cursor():
+                yield Cursor()
+            return _cursor()
+
+    @contextmanager
+    def fake_conn():
+        yield Conn()
+
+    monkeypatch.setattr(objects, 'get_conn', fake_conn)
+
+    assert store.collect_garbage(grace=timedelta(hours=1)) == {'skipped': 'ingest running'}
+    assert executed == ['select pg_try_advisory_xact_lock(%s) as locked']
+    assert store.exists(blob.sha256)
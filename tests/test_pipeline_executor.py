@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+import threading
+import time
+from datetime import datetime, timezone
+
+import pytest
+
+from app.ingestion import pipeline as pipeline_module
+from app.ingestion.base import DiscoveredItem, NormalizedRecord, RawFetch
+from app.ingestion.pipeline import IngestionPipeline
+
+
+class FakeAdapter:
+    def __init__(self, source_id: str, items: int = 5, fetch_delay: float = 0.0, invalid: int = 0, hang: threading.Event | None = None) -> None:
+        self.source_id = source_id
+        self.items = items
+        self.fetch_delay = fetch_delay
+        self.invalid = invalid
+        self.hang = hang
+        self.active = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+
+    def discover(self):
+        return [DiscoveredItem(f'{self.source_id}:{n}', f'https://example.org/{n}', {'n': n}) for n in range(self.items)]
+
+    def fetch(self, item):
+        with self.lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        if self.hang:
+            self.hang.wait(5)
+        time.sleep(self.fetch_delay)
+        with self.lock:
+            self.active -= 1
+        return RawFetch(body=str(item.metadata['n']).encode(), headers={}, robots_policy='allow')
+
+    def parse(self, raw):
+        n = int(raw.body)
+        payload = {'id': f'meeting:{self.source_id}:{n}', 'title': 'County Council', 'agenda_status': 'Final'}
+        if n >= self.invalid:
+            payload['meeting_datetime'] = '2026-01-10T10:00:00+00:00'
+        return [
+            NormalizedRecord('meeting', payload['id'], 'https://example.org', payload, self.source_id, f'hash{n}', datetime.now(timezone.utc), 'allow')
+        ]
+
+    def link(self, records):
+        return records
+
+
+def test_sources_run_concurrently_with_wide_fetch_and_histograms():
+    slow_a, slow_b = FakeAdapter('a', items=6, fetch_delay=0.1), FakeAdapter('b', items=6, fetch_delay=0.1, invalid=2)
+    pipeline = IngestionPipeline()
+
+    started = time.monotonic()
+    summary = pipeline.run_adapters({'a': slow_a, 'b': slow_b}, fetch_workers=12, parse_workers=1, queue_size=2)
+    elapsed = time.monotonic() - started
+
+    assert elapsed < 0.6  # 12 fetches of 0.1s run side by side, not back to back
+    assert slow_a.peak > 1
+    assert summary['sources']['a'] | {'elapsed_ms': 0} == {
+        'inserted': 6, 'duplicates': 0, 'errors': 0, 'failures': {}, 'last_error': None, 'timed_out': False, 'dropped': 0, 'elapsed_ms': 0,
+    }
+    assert (summary['sources']['b']['inserted'], summary['sources']['b']['errors']) == (4, 2)
+    assert len(pipeline.quarantine) == 2
+    counts = {stage: h['count'] for stage, h in summary['stages'].items()}
+    assert (counts['discover'], counts['fetch'], counts['parse']) == (2, 12, 12)
+    assert 1 <= counts['validate'] <= 12  # one observation per written batch
+    assert summary['stages']['fetch']['p50_ms'] >= 100
+    assert sum(summary['stages']['fetch']['buckets'].values()) == 12
+
+
+def test_slow_source_times_out_without_stalling_the_rest():
+    hang = threading.Event()
+    try:
+        stuck, quick = FakeAdapter('stuck', items=3, hang=hang), FakeAdapter('quick', items=3)
+        started = time.monotonic()
+        summary = IngestionPipeline().run_adapters({'stuck': stuck, 'quick': quick}, timeouts={'stuck': 0.2, 'quick': 5})
+        assert time.monotonic() - started < 1
+    finally:
+        hang.set()
+    assert summary['sources']['stuck']['timed_out'] and summary['sources']['stuck']['inserted'] == 0
+    assert summary['sources']['quick']['inserted'] == 3 and not summary['sources']['quick']['timed_out']
+
+
+def test_stage_failures_are_counted_per_source():
+    class Broken(FakeAdapter):
+        def discover(self):
+            raise RuntimeError('feed unavailable')
+
+    summary = IngestionPipeline().run_adapters({'broken': Broken('broken'), 'ok': FakeAdapter('ok', items=1)})
+    assert summary['sources']['broken']['failures'] == {'discover': 1}
+    assert summary['sources']['broken']['last_error'] == 'discover: feed unavailable'
+    assert summary['totals']['inserted'] == 1
+
+
+def test_run_adapter_raises_the_first_stage_failure_after_the_remaining_items():
+    class Flaky(FakeAdapter):
+        def fetch(self, item):
+            if item.metadata['n'] == 1:
+                raise ConnectionError('reset by peer')
+            return super().fetch(item)
+
+    pipeline = IngestionPipeline()
+    with pytest.raises(ConnectionError, match='reset by peer'):
+        pipeline.run_adapter(Flaky('flaky', items=3))
+    assert sorted(pipeline.store.records) == ['meeting:flaky:0', 'meeting:flaky:2']
+
+
+def test_run_sources_reads_enabled_sources_from_config(tmp_path, monkeypatch):
+    config = tmp_path / 'sources.yaml'
+    config.write_text(
+        """
+sources:
+  - {id: feed, name: Feed, kind: rss, cadence: "* * * * *", provenance: x, base_url: "https://example.org/feed", timeout_seconds: 3,
+     extraction_hints: {mode: rss, parser: feedparser}}
+  - {id: disabled, name: Disabled, kind: rss, enabled: false, cadence: "* * * * *", provenance: x, base_url: "https://example.org/off",
+     extraction_hints: {mode: rss, parser: feedparser}}
+  - {id: refs, name: Refs, kind: zotero, cadence: "* * * * *", provenance: x, base_url: "https://example.org/refs",
+     extraction_hints: {mode: api, parser: zotero}}
+"""
+    )
+    built = []
+    real_build = pipeline_module.build_adapter
+
+    def fake_build(source):
+        built.append((source.id, type(real_build(source)).__name__ if real_build(source) else None))
+        return FakeAdapter(source.id, items=2) if source.kind == 'rss' else None
+
+    monkeypatch.setattr(pipeline_module, 'build_adapter', fake_build)
+    summary = IngestionPipeline().run_sources(config)
+
+    assert built == [('feed', 'RSSAdapter'), ('refs', None)]
+    assert summary['skipped'] == ['refs']
+    assert summary['sources']['feed']['inserted'] == 2
+
+
+def test_pipeline_defaults_to_an_in_memory_hash_store():
+    from app.ingestion.hash_store import InMemoryStore
+
+    assert isinstance(IngestionPipeline().store, InMemoryStore)
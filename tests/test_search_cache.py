@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+from datetime import datetime
+
+from app.search.cache import SearchCache, search_cache_key
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_search_cache_is_lru_ttl_and_generation_scoped():
+    clock = Clock()
+    cache = SearchCache(max_entries=2, ttl=60, clock=clock)
+    cache.set('budget', 1, {'results': ['b']})
+    cache.set('jail', 1, {'results': ['j']})
+    assert cache.get('budget', 1) == {'results': ['b']}
+
+    cache.set('ordinance', 1, {'results': ['o']})
+    assert cache.get('jail', 1) is None
+    assert cache.get('budget', 2) is None
+
+    clock.now = 61
+    assert cache.get('ordinance', 1) is None
+    assert cache.stats() | {'size': None} == {'size': None, 'hits': 1, 'misses': 3, 'hit_rate': 0.25, 'backend': None, 'backend_errors': 0}
+
+
+def test_search_cache_reads_through_shared_backend():
+    class Backend:
+        def __init__(self):
+            self.rows = {}
+
+        def get(self, key, generation):
+            return self.rows.get((key, generation))
+
+        def set(self, key, generation, value, ttl):
+            self.rows[(key, generation)] = value
+
+    backend = Backend()
+    SearchCache(backend=backend).set('budget', 3, {'results': []})
+    other_worker = SearchCache(backend=backend)
+
+    assert other_worker.get('budget', 3) == {'results': []}
+    assert other_worker.get('budget', 4) is None
+
+
+def test_search_cache_key_normalizes_query_and_types():
+    day = datetime(2024, 1, 1)
+    assert search_cache_key('  Comprehensive   PLAN ', {'meetings', 'documents'}, day, None) == search_cache_key('comprehensive plan', {'documents', 'meetings'}, day, None)
+    assert search_cache_key('budget', {'meetings'}, day, None) != search_cache_key('budget', {'meetings'}, None, None)
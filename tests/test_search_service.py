@@ -0,0 +1,45 @@
+from __future__ import annotations
+
+from app.search.service import SearchDoc, SearchService
+
+
+def _service() -> SearchService:
+    service = SearchService()
+    service.index(SearchDoc(id='m1', text='Council adopts budget amendment for the jail facility', metadata={'type': 'meeting'}))
+    service.index(SearchDoc(id='m2', text='Budget hearing: budget, budget and more budget talk', metadata={'type': 'meeting'}))
+    service.index(SearchDoc(id='n1', text='Housing ordinance update from the county council', metadata={'type': 'news'}))
+    return service
+
+
+def test_fts_requires_all_terms_and_ranks_with_bm25():
+    service = _service()
+    assert [d.id for d in service.fts('budget')] == ['m2', 'm1']
+    assert [d.id for d in service.fts('Budget JAIL')] == ['m1']
+    assert service.fts('budget housing') == []
+    assert service.fts('zoning') == []
+    assert [d.id for d in service.fts('council', limit=1)] == ['n1']
+
+
+def test_semantic_ranks_partial_matches_and_index_updates_incrementally():
+    service = _service()
+    assert [d.id for d in service.semantic('housing budget council')][0] in {'n1', 'm1'}
+    assert {d.id for d in service.semantic('housing budget')} == {'m1', 'm2', 'n1'}
+
+    assert service.remove('m2')
+    assert not service.remove('m2')
+    assert 'talk' not in service.postings
+    service.index(SearchDoc(id='n1', text='Zoning variance approved', metadata={'type': 'news'}))
+    assert service.fts('housing') == []
+    assert [d.id for d in service.fts('zoning')] == ['n1']
+
+
+def test_index_round_trips_through_disk(tmp_path):
+    service = _service()
+    path = tmp_path / 'index.json'
+    service.save(path)
+
+    loaded = SearchService.load(path)
+
+    assert [d.id for d in loaded.fts('budget')] == [d.id for d in service.fts('budget')]
+    assert loaded.docs['n1'].metadata == {'type': 'news'}
+    assert loaded.total_length == service.total_length
@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+from app.analysis.tables import Fragment, extract_tables, parse_cell
+from app.ingestion import extraction
+from app.search.embeddings import HashingEmbedder, VectorIndex
+
+
+def test_parse_cell_types():
+    assert [parse_cell(v) for v in ('$1,250.00', '(75)', '12.5%', '01/15/2025', 'March 1, 2025', 'Fund 001', '')] == [
+        ('currency', 1250.0),
+        ('number', -75.0),
+        ('percent', 12.5),
+        ('date', '2025-01-15'),
+        ('date', '2025-03-01'),
+        ('text', 'Fund 001'),
+        ('empty', None),
+    ]
+
+
+def test_extraction_detects_layout_tables_with_headers_and_types(monkeypatch, make_pdf):
+    path = make_pdf(
+        [
+            ['Call to order'],
+            [
+                'Exhibit A - Fee schedule',
+                [(72, 'Permit'), (250, 'Fee'), (400, 'Effective')],
+                [(72, 'Building permit'), (250, '$1,250.00'), (400, '01/15/2025')],
+                [(72, 'Sign permit'), (250, '$75'), (400, '2025-03-01')],
+                [(72, 'Demolition'), (400, '2025-04-01')],
+                'Fees are due at application.',
+            ],
+        ]
+    )
+
+    copies = []
+
+    class Cursor:
+        def execute(self, query, params=None):
+            return None
+
+        @contextmanager
+        def copy(self, statement):
+            rows = []
+            yield SimpleNamespace(write_row=rows.append)
+            copies.append((statement, rows))
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *_):
+            return None
+
+    @contextmanager
+    def conn_cm(*_):
+        yield SimpleNamespace(cursor=Cursor)
+
+    monkeypatch.setattr(extraction, 'get_conn', conn_cm)
+
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as pool:
+        window = extraction.PageWindow(pool, [str(path)], size=2, pages_per_task=1)
+        extraction._store('meeting:1:agenda', str(path), window.pages(0), VectorIndex(writable=True), HashingEmbedder())
+
+    tables = [row for statement, rows in copies if statement.startswith('copy document_tables ') for row in rows]
+    assert len(tables) == 1
+    _, index, page, line_start, line_end, headers, column_types, rows = tables[0]
+    assert (index, page, line_start, line_end) == (0, 2, 2, 5)
+    assert headers.obj == ['Permit', 'Fee', 'Effective']
+    assert column_types.obj == ['text', 'currency', 'date']
+    assert rows.obj == [
+        {'Permit': 'Building permit', 'Fee': 1250.0, 'Effective': '2025-01-15'},
+        {'Permit': 'Sign permit', 'Fee': 75.0, 'Effective': '2025-03-01'},
+        {'Permit': 'Demolition', 'Fee': None, 'Effective': '2025-04-01'},
+    ]
+
+
+def test_right_aligned_numbers_and_split_words_share_columns():
+    def row(y, *cells):
+        return [Fragment(x, y, len(text) * 5.0, 10.0, text) for x, text in cells]
+
+    fragments = [
+        *row(700, (72, 'Account'), (300, 'Amount')),
+        *row(686, (72, '001-100'), (110, 'Parks'), (290, '1,200,000')),
+        *row(672, (72, '001-200'), (110, 'Roads'), (315, '850')),
+    ]
+    (table,) = extract_tables(fragments, page=3)
+    assert table.headers == ['Account', 'Amount']
+    assert table.rows == [{'Account': '001-100 Parks', 'Amount': 1200000.0}, {'Account': '001-200 Roads', 'Amount': 850.0}]
+
+
+def test_prose_is_not_a_table():
+    fragments = [Fragment(72, 700 - 14 * i, 300, 10, 'A paragraph line of ordinary prose.') for i in range(5)]
+    assert extract_tables(fragments, page=1) == []